@@ -1,10 +1,25 @@
-import json
 import os
+import random
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import streamlit as st
+
+from evaluation.assembly import ALL_SUBJECTS, assemble_test, recent_question_ids, save_assembled
+from evaluation.attempts import build_review_test, get_attempt_index, update_attempts
+from evaluation.grading import grade_essays
+from evaluation.item_analysis import update_stats
+from evaluation.mcq_evaluator import final_score, grade_mcq, package_essays
+from evaluation.render_model import get_render_model
+from generators.batch import FINISHED, create_job, get_job, pdfs_in_folder, unfinished_jobs
+from generators.generate_package import InvalidPackageError, build_package, write_package
+from generators.validate_schema import package_file_errors, startup_report
+from storage.loader import cache_stats
+from storage.packfile import load_package_view
+from storage.registry import get_registry
+from storage.submissions import get_store, get_writer
+from storage.timing import start_rerun, timed
 # from openai import OpenAI  # Uncomment when ready to use GPT generation
 
 # -------------------------------
@@ -12,15 +27,13 @@ import streamlit as st
 # -------------------------------
 BASE_DIR = Path(__file__).resolve().parent
 DB_DIR = BASE_DIR / "database"
-RESULTS_DIR = BASE_DIR / "results" / "user_submissions"
 PROMPT_FILE = BASE_DIR / "config" / "prompts" / "generate_questions.txt"
 
-os.makedirs(RESULTS_DIR, exist_ok=True)
-
 # --- Initialize OpenAI client (commented out for now) ---
 # client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 st.set_page_config(page_title="Question Bank Generator & Test Simulator", layout="wide")
+rerun_timer = start_rerun("app")
 st.title("📘 Question Bank Generator & Test Simulator")
 
 # -------------------------------
@@ -34,97 +47,239 @@ def load_prompt() -> str:
     with open(PROMPT_FILE, "r", encoding="utf-8") as f:
         return f.read()
 
-def generate_questions_from_pdf(pdf_path: str, package_id: str, source: str, level: str, subject: str) -> Dict:
+def generate_questions_from_pdf(pdf_bytes: bytes, package_id: str, source: str, level: str, subject: str) -> Dict:
     """Simulated version of GPT-based question generation (placeholder)."""
-    import fitz  # PyMuPDF
-
-    # Keep context extraction in place for future GPT integration while ensuring
-    # file handles are always released.
-    with fitz.open(pdf_path) as doc:
-        text = "".join(page.get_text("text") for page in doc)
-
     # Placeholder generation (OpenAI disabled)
     st.warning("⚠️ GPT generation is currently disabled. Using a sample placeholder instead.")
-    return {
-        "package_id": package_id,
-        "source": source,
-        "level": level,
-        "mcqs": [],
-        "essay": [
-            {
-                "id": f"{package_id}_essay1",
-                "prompt": f"Write an essay discussing key ideas of {subject}.",
-                "expected_keywords": ["example", "placeholder", "essay"],
-                "rubric": {
-                    "total_points": 100,
-                    "criteria": [
-                        {"keyword": "example", "weight": 40, "description": "Mentions example concept"},
-                        {"keyword": "placeholder", "weight": 40, "description": "Mentions placeholder concept"},
-                        {"keyword": "essay", "weight": 20, "description": "Mentions essay structure"},
-                    ],
-                    "grading_notes": "This is a placeholder rubric until OpenAI is re-enabled."
-                },
-            },
-            {
-                "id": f"{package_id}_essay2",
-                "prompt": f"Explain the importance of theoretical understanding in {subject}.",
-                "expected_keywords": ["theory", "understanding", "concept"],
-                "rubric": {
-                    "total_points": 100,
-                    "criteria": [
-                        {"keyword": "theory", "weight": 40, "description": "Mentions theoretical aspects"},
-                        {"keyword": "understanding", "weight": 30, "description": "Shows comprehension"},
-                        {"keyword": "concept", "weight": 30, "description": "Explains key concepts"},
-                    ],
-                    "grading_notes": "Placeholder rubric for essay 2."
-                },
-            },
-        ],
-        "source_text_chars": len(text),
-    }
+    return build_package(pdf_bytes, package_id, source, level, subject)
 
 def save_json(data: Dict, subject: str, package_id: str):
     """Save generated JSON file to database folder."""
-    out_dir = DB_DIR / subject / package_id
-    out_dir.mkdir(parents=True, exist_ok=True)
-    with open(out_dir / "package.json", "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
-    st.success(f"✅ Saved package.json to {out_dir}")
+    try:
+        out_file, report = write_package(data, subject, package_id)
+    except InvalidPackageError as exc:
+        st.error("❌ Package not saved: it does not match the package schema.\n"
+                 + "\n".join(f"- `{problem}`" for problem in exc.problems))
+        return
+    st.success(f"✅ Saved package.json to {out_file.parent}")
+    warn_near_duplicates(report)
+
+def warn_near_duplicates(report: Dict):
+    """Flag questions that near-duplicate questions in other packages."""
+    if report:
+        lines = [
+            f"- `{qid}` ~ " + ", ".join(f"`{s}/{p}/{other}` ({sim:.0%})" for (s, p, other), sim in hits[:3])
+            for qid, hits in report.items()
+        ]
+        st.warning(f"⚠️ {len(report)} question(s) look like near-duplicates of existing ones:\n" + "\n".join(lines))
+
+def render_batch_job(job_id: str):
+    """Progress of a batch job: polled while it runs, drawn once when it has stopped."""
+    job = get_job(job_id)
+    if job is None:
+        return
+    if job.is_running():
+        poll_batch_job(job_id)
+    else:
+        batch_job_table(job)
+
+@st.fragment(run_every=1.0)
+def poll_batch_job(job_id: str):
+    """Redraw a running job once a second; a full rerun once it stops ends the polling."""
+    job = get_job(job_id)
+    batch_job_table(job)
+    if not job.is_running():
+        st.rerun()
+
+def batch_job_table(job):
+    """Progress bar, per-file table and the cancel/resume button of one job."""
+    job_id = job.job_id
+    files = job.files()
+    progress = job.progress()
+    finished = sum(progress[status] for status in FINISHED)
+    st.progress(finished / max(progress["total"], 1),
+                text=f"Job `{job_id}` · {progress['done']} done · {progress['running']} running · "
+                     f"{progress['queued']} queued · {progress['failed']} failed · {progress['cancelled']} cancelled")
+    st.dataframe(
+        [{
+            "PDF": entry["name"],
+            "Package": entry["package_id"],
+            "Status": entry["status"],
+            "Seconds": round(entry["seconds"], 2) if entry["seconds"] is not None else None,
+            "Questions": entry["questions"],
+            "Near duplicates": entry["near_duplicates"],
+            "Error": entry["error"] or "",
+        } for entry in files],
+        use_container_width=True,
+    )
+    if job.is_running():
+        st.button("⏹️ Cancel batch", key=f"cancel:{job_id}", on_click=job.cancel)
+    elif progress["done"] < progress["total"]:
+        st.button("▶️ Resume batch", key=f"resume:{job_id}", on_click=job.start)
+
+def current_user() -> Optional[str]:
+    """User id entered in the sidebar (None when taking tests anonymously)."""
+    return (st.session_state.get("user_id") or "").strip() or None
 
 def load_packages(subject: str) -> List[str]:
-    """List available packages for a given subject."""
-    subject_dir = DB_DIR / subject
-    if not subject_dir.exists():
-        return []
-    return sorted(
-        pkg for pkg in os.listdir(subject_dir)
-        if not pkg.startswith(".") and (subject_dir / pkg).is_dir()
-    )
+    """List available packages for a given subject (from the catalog)."""
+    return get_registry().packages(subject)
+
+def test_answers(state_key: str, model: Dict) -> Dict:
+    """Answers for one test, kept in session state across pages and reruns."""
+    all_answers = st.session_state.setdefault("test_answers", {})
+    if state_key not in all_answers:
+        all_answers[state_key] = {"mcq": dict(model["default_answers"]), "essay": {}}
+    return all_answers[state_key]
+
+def remember_answer(answers: Dict, kind: str, question_id: str, widget_key: str):
+    """Widget callback: copy a widget value into the persistent answer dict."""
+    answers[kind][question_id] = st.session_state[widget_key]
+
+@st.fragment
+@timed("app.render_mcq_page")
+def render_mcq_page(model: Dict, answers: Dict, state_key: str, page_size: int):
+    """Render one page of MCQs; answering or paging reruns only this fragment."""
+    mcqs = model["mcqs"]
+    page_count = max(1, -(-len(mcqs) // page_size))
+    page_key = f"{state_key}:page"
+    page = min(st.session_state.get(page_key, 0), page_count - 1)
+
+    for q in mcqs[page * page_size:(page + 1) * page_size]:
+        widget_key = f"{state_key}:{q['id']}"
+        current = answers["mcq"].get(q["id"])
+        with st.expander(q["title"]):
+            st.radio(
+                "Choose answer:",
+                q["keys"],
+                index=q["keys"].index(current) if current in q["keys"] else None,
+                format_func=q["labels"].get,
+                key=widget_key,
+                on_change=remember_answer,
+                args=(answers, "mcq", q["id"], widget_key),
+            )
+
+    if page_count > 1:
+        prev_col, info_col, next_col = st.columns([1, 2, 1])
+        info_col.caption(f"Page {page + 1} of {page_count} · {len(mcqs)} questions")
+        # Callbacks run before the fragment rerun, so the new page renders at once.
+        prev_col.button("⬅️ Previous", disabled=page == 0, key=f"{page_key}:prev",
+                        on_click=st.session_state.__setitem__, args=(page_key, page - 1))
+        next_col.button("Next ➡️", disabled=page >= page_count - 1, key=f"{page_key}:next",
+                        on_click=st.session_state.__setitem__, args=(page_key, page + 1))
+
+@st.fragment
+@timed("app.render_essays")
+def render_essays(model: Dict, answers: Dict, state_key: str):
+    """Render essay prompts; edits rerun only this fragment."""
+    for essay in model["essays"]:
+        widget_key = f"{state_key}:essay:{essay['id']}"
+        with st.expander(essay["title"]):
+            st.write(essay["prompt"])
+            st.text_area(
+                f"Your response for Essay {essay['index']}:",
+                value=answers["essay"].get(essay["id"], ""),
+                key=widget_key,
+                height=250,
+                on_change=remember_answer,
+                args=(answers, "essay", essay["id"], widget_key),
+            )
+
+def take_test(subject: str, package_id: str, package: Dict, version: str, page_size: int):
+    """Render a test, then grade and store the submission."""
+    # Precompiled per package version; answers live in session state
+    # so paging and fragment reruns never lose them.
+    model = get_render_model(subject, package_id, version, package)
+    state_key = f"{subject}/{package_id}/{version[:12]}"
+    answers = test_answers(state_key, model)
+
+    # --- MCQ Section ---
+    mcqs = package.get("mcqs", [])
+    if mcqs:
+        st.markdown("### Multiple Choice Questions")
+        render_mcq_page(model, answers, state_key, page_size)
+    else:
+        st.info("📘 This package contains only essay questions (no MCQs).")
 
-def grade_mcq(mcq_data, user_answers):
-    """Compute MCQ score."""
-    total, correct = len(mcq_data), 0
-    for q in mcq_data:
-        if user_answers.get(q["id"]) == q.get("correct_option"):
-            correct += 1
-    return correct, total
-
-def grade_essay(essay_data, user_text):
-    """Keyword-based essay scoring."""
-    score = 0
-    matched = []
-    rubric = essay_data.get("rubric", {"criteria": [], "total_points": 100})
-    for crit in rubric["criteria"]:
-        if crit["keyword"].lower() in user_text.lower():
-            score += crit["weight"]
-            matched.append(crit["keyword"])
-    return score, rubric["total_points"], matched
+    # --- Essay Section ---
+    st.markdown("### Essay Question(s)")
+    essays = package_essays(package)
+    render_essays(model, answers, state_key)
+
+    # --- Submit and Grade ---
+    if st.button("Submit Answers"):
+        user_mcq_answers = dict(answers["mcq"])
+        user_essay_answers = {e["id"]: answers["essay"].get(e["id"], "") for e in model["essays"]}
+
+        # --- Grade MCQs ---
+        if mcqs:
+            mcq_correct, mcq_total = grade_mcq(mcqs, user_mcq_answers)
+        else:
+            mcq_correct, mcq_total = 0, 0
+
+        # --- Grade Essays ---
+        essay_results = grade_essays(essays, user_essay_answers)
+        total_essay_score = essay_results["essay_score"]
+        total_possible = essay_results["essay_total"]
+        for essay_id, result in essay_results["per_essay"]:
+            matched = result.matched
+            st.info(f"Essay {essay_id}: {result.score}/{result.total} ({', '.join(matched) if matched else 'No matches'})")
+
+        # --- Compute Total Score ---
+        total_score = final_score(mcq_correct, mcq_total, total_essay_score, total_possible)
+
+        # --- Display Results ---
+        st.success(f"MCQ: {mcq_correct}/{mcq_total}")
+        st.success(f"Essay Total: {total_essay_score}/{total_possible}")
+        st.metric("Final Score", f"{total_score:.1f} / 100")
+
+        # --- Save Results ---
+        result_data = {
+            "timestamp": datetime.now().isoformat(),
+            "user_id": current_user(),
+            "subject": subject,
+            "package_id": package_id,
+            "mcq_score": mcq_correct,
+            "mcq_total": mcq_total,
+            "essay_score": total_essay_score,
+            "essay_total": total_possible,
+            "final_score": total_score,
+            "matched_keywords": essay_results["matched_keywords"],
+            "essay_matches": essay_results["essay_matches"],
+            "user_answers": user_mcq_answers,
+            "user_essay_answers": user_essay_answers
+        }
+        # Queued for the group-commit writer, which folds each committed batch
+        # into the materialized item statistics and the per-user attempt index.
+        writer = get_writer()
+        writer.add_commit_hook(update_stats)
+        writer.add_commit_hook(update_attempts)
+        pending = writer.submit(result_data)
+        try:
+            st.success(f"✅ Results saved (submission `{pending.result(timeout=10)}`)")
+        except TimeoutError:
+            st.info("⏳ Results queued; they will appear in the viewers shortly.")
+        except Exception as exc:
+            st.error(f"❌ Could not save results: {exc}")
 
 # -------------------------------
 # APP SECTIONS
 # -------------------------------
 mode = st.sidebar.radio("Select Mode", ["🏗️ Generate Question Bank", "🧩 Take Test"])
 
+_stats = cache_stats()
+st.sidebar.caption(
+    f"Package cache: {_stats['hits']} hits / {_stats['misses']} misses · "
+    f"{_stats['entries']} files, {_stats['bytes'] / 1024:.0f} KB"
+)
+
+# Schema check of the whole bank, once per process; verdicts are cached by content hash.
+_invalid = startup_report(DB_DIR)
+if _invalid:
+    with st.sidebar.expander(f"⚠️ {len(_invalid)} package(s) fail schema validation"):
+        for _path, _errors in _invalid.items():
+            st.markdown(f"**{os.path.relpath(_path, DB_DIR)}**\n" + "\n".join(f"- `{e}`" for e in _errors))
+
 # -------------------------------
 # MODE 1: GENERATE QUESTION BANK
 # -------------------------------
@@ -133,30 +288,55 @@ if mode == "🏗️ Generate Question Bank":
 
     subject = st.text_input("Subject name (e.g., machine_vision):")
     level = st.selectbox("Select difficulty level:", ["introductory", "undergraduate", "advanced_undergraduate", "graduate"])
-    package_id = st.text_input("Package ID (e.g., pkg26):")
-    pdf_file = st.file_uploader("Upload PDF file", type=["pdf"])
+    batch_mode = st.toggle("📚 Batch: many PDFs at once")
+
+    if batch_mode:
+        pdf_files = st.file_uploader("Upload PDF files", type=["pdf"], accept_multiple_files=True)
+        folder = st.text_input("…or a folder of PDFs on the server:")
+        prefix = st.text_input("Package ID prefix (package IDs come from the file names):")
+        workers = st.slider("Parallel workers", min_value=1, max_value=16, value=4)
+
+        sources = [(f.name, f.getvalue()) for f in pdf_files or []]
+        if folder.strip():
+            if os.path.isdir(folder.strip()):
+                sources += pdfs_in_folder(folder.strip())
+            else:
+                st.error(f"❌ Folder not found: {folder}")
+        if subject and sources and st.button(f"🚀 Generate {len(sources)} package(s)"):
+            job = create_job(subject, level, sources, prefix=prefix, workers=workers)
+            st.session_state["batch_job"] = job.job_id
+
+        if "batch_job" in st.session_state:
+            render_batch_job(st.session_state["batch_job"])
+
+        resumable = [job for job in unfinished_jobs() if job.job_id != st.session_state.get("batch_job")]
+        if resumable:
+            with st.expander(f"⏸️ {len(resumable)} unfinished batch job(s)"):
+                for job in resumable:
+                    progress = job.progress()
+                    c1, c2 = st.columns([3, 1])
+                    c1.write(f"`{job.job_id}` · {job.state['subject']} · {progress['done']}/{progress['total']} done")
+                    if c2.button("▶️ Resume", key=f"resume-old:{job.job_id}"):
+                        job.start(workers)
+                        st.session_state["batch_job"] = job.job_id
+                        st.rerun()
+
+    package_id = "" if batch_mode else st.text_input("Package ID (e.g., pkg26):")
+    pdf_file = None if batch_mode else st.file_uploader("Upload PDF file", type=["pdf"])
 
     if pdf_file and subject and package_id:
-        pdf_path = BASE_DIR / "temp.pdf"
-        with open(pdf_path, "wb") as f:
-            f.write(pdf_file.getvalue())
-
         if st.button("🚀 Generate Questions"):
-            try:
-                result = generate_questions_from_pdf(
-                    pdf_path=str(pdf_path),
-                    package_id=package_id,
-                    source=pdf_file.name,
-                    level=level,
-                    subject=subject,
-                )
-                if result:
-                    save_json(result, subject, package_id)
-                    st.json(result)
-            finally:
-                # Avoid stale temp files between runs.
-                if pdf_path.exists():
-                    pdf_path.unlink()
+            # The upload is parsed in memory, so concurrent users never share a temp file.
+            result = generate_questions_from_pdf(
+                pdf_bytes=pdf_file.getvalue(),
+                package_id=package_id,
+                source=pdf_file.name,
+                level=level,
+                subject=subject,
+            )
+            if result:
+                save_json(result, subject, package_id)
+                st.json(result)
 
 # -------------------------------
 # MODE 2: TAKE TEST
@@ -164,110 +344,89 @@ if mode == "🏗️ Generate Question Bank":
 elif mode == "🧩 Take Test":
     st.header("🧠 Take a Test")
 
-    subjects = [d for d in os.listdir(DB_DIR) if os.path.isdir(DB_DIR / d)]
+    page_size = st.sidebar.number_input("Questions per page", min_value=1, max_value=100, value=10)
+    test_source = st.sidebar.radio("Test source", ["📦 Package", "🎲 Assembled from bank", "🔁 Review my mistakes"])
+    st.sidebar.text_input("👤 User ID", key="user_id", help="Tags your submissions so mistakes can be reviewed later.")
+    user_id = current_user()
+
+    registry = get_registry()
+    # Throttled mtime scan; only changed package files are re-parsed.
+    registry.refresh()
+    subjects = registry.subjects()
     if not subjects:
         st.warning("⚠️ No subjects found in the database folder.")
-    else:
+    elif test_source == "📦 Package":
         subject = st.selectbox("Select subject:", subjects)
         packages = load_packages(subject)
 
         if packages:
             package_id = st.selectbox("Select package:", packages)
-            package_file = DB_DIR / subject / package_id / "package.json"
-
-            if package_file.exists():
-                with open(package_file, "r", encoding="utf-8") as f:
-                    package = json.load(f)
-
-                st.subheader(
-                    f"📦 {package.get('package_id', package_id)} — {package.get('source', 'Unknown source')}"
-                )
-                st.markdown(f"**Level:** {package.get('level', 'Unknown')}")
-
-                # --- MCQ Section ---
-                user_mcq_answers = {}
-                mcqs = package.get("mcqs", [])
-                if mcqs:
-                    st.markdown("### Multiple Choice Questions")
-                    for q in mcqs:
-                        with st.expander(f"Q: {q['question']}"):
-                            options_formatted = [f"{key}. {value}" for key, value in q["options"].items()]
-                            selected = st.radio("Choose answer:", options_formatted, key=q["id"])
-                            user_mcq_answers[q["id"]] = selected.split(".")[0].strip()
-                else:
-                    st.info("📘 This package contains only essay questions (no MCQs).")
-
-                # --- Essay Section ---
-                st.markdown("### Essay Question(s)")
-                essays = package.get("essay", [])
-                if isinstance(essays, dict):
-                    essays = [essays]
-
-                user_essay_answers = {}
-                for idx, essay in enumerate(essays, start=1):
-                    with st.expander(f"Essay {idx}: {essay['id']}"):
-                        st.write(essay["prompt"])
-                        response_key = f"essay_response_{idx}"
-                        user_essay_answers[essay["id"]] = st.text_area(
-                            f"Your response for Essay {idx}:",
-                            key=response_key,
-                            height=250
-                        )
-
-                # --- Submit and Grade ---
-                if st.button("Submit Answers"):
-                    # --- Grade MCQs ---
-                    if mcqs:
-                        mcq_correct, mcq_total = grade_mcq(mcqs, user_mcq_answers)
-                    else:
-                        mcq_correct, mcq_total = 0, 0
-
-                    # --- Grade Essays ---
-                    total_essay_score = 0
-                    total_possible = 0
-                    all_matched = []
-
-                    for essay in essays:
-                        user_text = user_essay_answers.get(essay["id"], "")
-                        essay_score, essay_total, matched = grade_essay(essay, user_text)
-                        total_essay_score += essay_score
-                        total_possible += essay_total
-                        all_matched.extend(matched)
-                        st.info(f"Essay {essay['id']}: {essay_score}/{essay_total} ({', '.join(matched) if matched else 'No matches'})")
-
-                    # --- Compute Total Score ---
-                    essay_percent = total_essay_score / total_possible if total_possible else 0
-                    if mcq_total > 0:
-                        mcq_percent = mcq_correct / mcq_total
-                        total_score = (mcq_percent * 50) + (essay_percent * 50)
-                    else:
-                        total_score = essay_percent * 100
-
-                    # --- Display Results ---
-                    st.success(f"MCQ: {mcq_correct}/{mcq_total}")
-                    st.success(f"Essay Total: {total_essay_score}/{total_possible}")
-                    st.metric("Final Score", f"{total_score:.1f} / 100")
-
-                    # --- Save Results ---
-                    result_data = {
-                        "timestamp": datetime.now().isoformat(),
-                        "subject": subject,
-                        "package_id": package_id,
-                        "mcq_score": mcq_correct,
-                        "mcq_total": mcq_total,
-                        "essay_score": total_essay_score,
-                        "essay_total": total_possible,
-                        "final_score": total_score,
-                        "matched_keywords": all_matched,
-                        "user_answers": user_mcq_answers,
-                        "user_essay_answers": user_essay_answers
-                    }
-                    out_file = RESULTS_DIR / f"{subject}_{package_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-                    with open(out_file, "w", encoding="utf-8") as f:
-                        json.dump(result_data, f, indent=2)
-                    st.success(f"✅ Results saved to {out_file}")
-
+            entry = registry.get(subject, package_id)
+            package = load_package_view(subject, package_id) if entry else None
+            problems = package_file_errors(DB_DIR / entry["path"]) if package is not None else []
+
+            if problems:
+                st.error("❌ This package does not match the package schema and cannot be taken:\n"
+                         + "\n".join(f"- `{problem}`" for problem in problems))
+            elif package is not None:
+                st.subheader(f"📦 {entry['declared_id']} — {entry['source']}")
+                st.markdown(f"**Level:** {entry['level']}")
+                take_test(subject, package_id, package, entry["sha256"], page_size)
             else:
                 st.error("❌ Selected package file not found.")
         else:
             st.warning("⚠️ No packages found for this subject.")
+    elif test_source == "🔁 Review my mistakes":
+        if not user_id:
+            st.info("👤 Enter your user ID in the sidebar to review questions you missed.")
+        else:
+            index = get_attempt_index()
+            index.update()
+            summary = index.summary(user_id)
+            st.caption(
+                f"{summary['questions']} question(s) attempted · {summary['attempts']} attempts · "
+                f"{summary['correct']} correct · {summary['open_mistakes']} still to review"
+            )
+            scope = st.selectbox("Review questions from:", ["🌐 Whole bank"] + subjects)
+            subject = None if scope == "🌐 Whole bank" else scope
+            n_review = st.number_input("Questions", min_value=1, max_value=200, value=20)
+            if st.button("🔁 Build Review Test"):
+                review = build_review_test(user_id, subject, int(n_review))
+                if review is None:
+                    st.session_state.pop("review_test", None)
+                    st.success("🎉 No open mistakes here — nothing to review.")
+                else:
+                    save_assembled(review, subject)
+                    st.session_state["review_test"] = (subject or ALL_SUBJECTS, review)
+
+            if "review_test" in st.session_state:
+                test_subject, review = st.session_state["review_test"]
+                st.subheader(f"🔁 {review['package_id']} — {review['source']}")
+                take_test(test_subject, review["package_id"], review, review["package_id"], page_size)
+    else:
+        scope = st.selectbox("Draw questions from:", ["🌐 Whole bank"] + subjects)
+        subject = None if scope == "🌐 Whole bank" else scope
+        c1, c2, c3 = st.columns(3)
+        n_mcqs = c1.number_input("MCQs", min_value=0, max_value=500, value=20)
+        n_essays = c2.number_input("Essays", min_value=0, max_value=20, value=1)
+        seed = c3.number_input("Seed", min_value=0, value=st.session_state.setdefault("assembly_seed", random.randrange(10 ** 6)))
+        exclude_recent = st.checkbox("Skip questions from my recent tests", value=True)
+
+        if st.button("🎲 Assemble Test"):
+            recent = recent_question_ids(get_store(), subject, user_id=user_id) if exclude_recent else set()
+            assembled = assemble_test(subject, int(n_mcqs), int(n_essays), int(seed), exclude=recent)
+            save_assembled(assembled, subject)
+            st.session_state["assembled_test"] = (subject or ALL_SUBJECTS, assembled)
+
+        if "assembled_test" in st.session_state:
+            test_subject, assembled = st.session_state["assembled_test"]
+            info = assembled["assembly"]
+            st.subheader(f"🎲 {assembled['package_id']} — {assembled['source']}")
+            st.caption(
+                f"Seed {info['seed']} · stratified by {', '.join(info['strata'])} · "
+                f"pool {info['pool_mcqs']} MCQs / {info['pool_essays']} essays · "
+                f"{info['reused_recent']} recently seen question(s) reused"
+            )
+            take_test(test_subject, assembled["package_id"], assembled, assembled["package_id"], page_size)
+
+rerun_timer.finish()
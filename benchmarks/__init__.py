@@ -0,0 +1 @@
+"""Benchmark harness: synthetic question banks and submissions at scale."""
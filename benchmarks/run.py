@@ -0,0 +1,383 @@
+"""
+Benchmark the app's hot paths on synthetic data.
+
+    python -m benchmarks.run --scale small                # table + comparison with the saved baseline
+    python -m benchmarks.run --scale small --save-baseline
+    python -m benchmarks.run --questions 20000 --submissions 200000 --output bench.json
+    python -m benchmarks.run --scale small --check        # exit 1 on regressions
+
+Generated banks and submission stores are kept under .cache/bench/ and
+reused while the parameters match. Results are JSON (median/min seconds per
+benchmark plus per-item cost); baselines live in benchmarks/baselines/ and
+are compared on best-of-N times, which are far less noisy than means.
+"""
+import argparse
+import ast
+import json
+import platform
+import random
+import shutil
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.synthetic import DATA_VERSION, fill_store, make_essay_answer, write_bank
+from evaluation.essay_grader import grade_essay
+from evaluation.grading import grade_essays_batch
+from evaluation.mcq_evaluator import grade_mcq, package_essays
+from generators.merge_packages import merge_exam_packages
+from storage.loader import JsonCache
+from storage.packfile import CompiledPackage, compile_package
+from storage.search import SearchIndex
+from storage.submissions import SubmissionStore
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+WORK_DIR = BASE_DIR / ".cache" / "bench"
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+RESULT_VERSION = 1
+
+SCALES = {
+    "tiny": {"questions": 10, "submissions": 10},
+    "small": {"questions": 1_000, "submissions": 10_000},
+    "medium": {"questions": 10_000, "submissions": 100_000},
+    "large": {"questions": 100_000, "submissions": 1_000_000},
+}
+
+# Viewer pages whose table builders are benchmarked (functions are lifted out
+# of the page source so the Streamlit UI code never runs).
+VIEWER_PAGES = {
+    "view_results": BASE_DIR / "pages" / "01_View_Results.py",
+    "view_results_expanded": BASE_DIR / "pages" / "3_📊_View_Results_Expanded.py",
+}
+
+# A best-of-N time this much slower than the baseline counts as a regression,
+# as long as it is also at least MIN_REGRESSION_S slower in absolute terms.
+DEFAULT_TOLERANCE = 0.25
+MIN_REGRESSION_S = 0.001
+# Page builders run on at most this many (package, submission) pairs.
+MAX_VIEW_SAMPLES = 200
+# Semantic essay grading is benchmarked as classes of this size answering a package.
+CLASS_SIZE = 30
+MAX_CLASS_PACKAGES = 20
+
+
+def page_functions(page_file: Path, names) -> Dict[str, Callable]:
+    """Load selected top-level functions from a Streamlit page without running its UI."""
+    tree = ast.parse(Path(page_file).read_text(encoding="utf-8"))
+    body = [
+        node for node in tree.body
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+        or (isinstance(node, ast.FunctionDef) and node.name in names)
+    ]
+    namespace: Dict = {}
+    exec(compile(ast.Module(body=body, type_ignores=[]), str(page_file), "exec"), namespace)
+    return {name: namespace[name] for name in names if name in namespace}
+
+
+# -------------------------------
+# DATA
+# -------------------------------
+def prepare(work_dir: Path, questions: int, submissions: int, mcqs_per_package: int,
+            seed: int, verbose: bool = True) -> Dict:
+    """Generate (or reuse) the synthetic bank and submission store."""
+    params = {"questions": questions, "submissions": submissions,
+              "mcqs_per_package": mcqs_per_package, "seed": seed, "data_version": DATA_VERSION}
+    marker = work_dir / "params.json"
+    db_dir, store_file = work_dir / "database", work_dir / "submissions.sqlite3"
+
+    try:
+        reuse = json.loads(marker.read_text(encoding="utf-8")) == params
+    except (OSError, ValueError):
+        reuse = False
+
+    if not reuse:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        work_dir.mkdir(parents=True)
+        start = time.perf_counter()
+        pairs = write_bank(db_dir, questions, mcqs_per_package=mcqs_per_package, seed=seed)
+        packages = {pair: _read(db_dir / pair[0] / pair[1] / "package.json") for pair in pairs}
+        fill_store(SubmissionStore(store_file), packages, submissions, seed=seed)
+        marker.write_text(json.dumps(params), encoding="utf-8")
+        if verbose:
+            print(f"Generated {questions} questions / {submissions} submissions "
+                  f"in {time.perf_counter() - start:.1f}s -> {work_dir}", file=sys.stderr)
+
+    files = sorted(db_dir.glob("*/*/package.json"))
+    return {
+        "params": params,
+        "db_dir": db_dir,
+        "files": files,
+        "packages": {(f.parent.parent.name, f.parent.name): _read(f) for f in files},
+        "store": SubmissionStore(store_file),
+    }
+
+
+def _read(path: Path) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# -------------------------------
+# TIMING
+# -------------------------------
+def measure(fn: Callable[[], int], repeat: int) -> Dict:
+    """Run `fn` `repeat` times; `fn` returns the number of items it processed."""
+    timings, items = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = fn()
+        timings.append(time.perf_counter() - start)
+    median = statistics.median(timings)
+    return {
+        "items": items,
+        "repeat": repeat,
+        "median_s": median,
+        "min_s": min(timings),
+        "mean_s": statistics.fmean(timings),
+        "per_item_us": median / items * 1e6 if items else None,
+    }
+
+
+def run_benchmarks(data: Dict, repeat: int = 5, only: Optional[List[str]] = None) -> Dict[str, Dict]:
+    files, packages, store = data["files"], data["packages"], data["store"]
+    rng = random.Random(data["params"]["seed"])
+    benches: Dict[str, Callable[[], int]] = {}
+
+    # Package loading through the JSON cache, cold and warm.
+    def load_cold():
+        cache = JsonCache(max_bytes=1 << 40)
+        for f in files:
+            cache.load(f)
+        return len(files)
+
+    warm_cache = JsonCache(max_bytes=1 << 40)
+    for f in files:
+        warm_cache.load(f)
+
+    def load_warm():
+        for f in files:
+            warm_cache.load(f)
+        return len(files)
+
+    benches["load_package_cold"] = load_cold
+    benches["load_package_warm"] = load_warm
+
+    # The same packages through the compiled format: answer key only, MCQs only.
+    compiled = [compile_package(f, f.parent / "bench.qbp") for f in files]
+
+    def compiled_key():
+        for f in compiled:
+            CompiledPackage(f).answer_key()
+        return len(compiled)
+
+    def compiled_mcqs():
+        for f in compiled:
+            CompiledPackage(f).get("mcqs")
+        return len(compiled)
+
+    benches["load_compiled_answer_key"] = compiled_key
+    benches["load_compiled_mcqs"] = compiled_mcqs
+
+    # Grading.
+    answer_sets = [
+        (pkg["mcqs"], {q["id"]: rng.choice("ABCDE") for q in pkg["mcqs"]}) for pkg in packages.values()
+    ]
+    essay_sets = [
+        (essay, make_essay_answer(essay, rng)) for pkg in packages.values() for essay in package_essays(pkg)
+    ]
+
+    def mcq():
+        for mcqs, answers in answer_sets:
+            grade_mcq(mcqs, answers)
+        return sum(len(mcqs) for mcqs, _ in answer_sets)
+
+    def essay():
+        for essay_data, text in essay_sets:
+            grade_essay(essay_data, text)
+        return len(essay_sets)
+
+    class_sets = [
+        (package_essays(pkg), [{e["id"]: make_essay_answer(e, rng) for e in package_essays(pkg)}
+                               for _ in range(CLASS_SIZE)])
+        for pkg in list(packages.values())[:MAX_CLASS_PACKAGES]
+    ]
+
+    def essay_semantic():
+        for essays, answer_maps in class_sets:
+            grade_essays_batch(essays, answer_maps, semantic_weight=0.5)
+        return sum(len(answer_maps) for _, answer_maps in class_sets)
+
+    benches["grade_mcq"] = mcq
+    benches["grade_essay"] = essay
+    benches["grade_essay_semantic"] = essay_semantic
+
+    # Viewer page table builders.
+    samples = []
+    for summary in store.query(limit=MAX_VIEW_SAMPLES):
+        submission = store.get(summary["submission_id"])
+        samples.append((packages[(submission["subject"], submission["package_id"])], submission))
+
+    for page_name, page_file in VIEWER_PAGES.items():
+        funcs = page_functions(page_file, ("flatten_mcq_data", "flatten_essay_data"))
+        for func_name, func in funcs.items():
+            def view(func=func):
+                for package, submission in samples:
+                    func(package, submission)
+                return len(samples)
+            benches[f"{page_name}.{func_name}"] = view
+
+    # Merging one subject, from scratch and with an up-to-date manifest.
+    subject_dir = data["db_dir"] / sorted({subject for subject, _ in packages})[0]
+    merge_out = data["db_dir"].parent / "merge" / "merged.json"
+    merge_out.parent.mkdir(parents=True, exist_ok=True)
+    n_subject_packages = sum(1 for subject, _ in packages if subject == subject_dir.name)
+
+    def merge(force):
+        merge_exam_packages(subject_dir, merge_out, force=force, verbose=False,
+                            manifest_dir=merge_out.parent / "manifests")
+        return n_subject_packages
+
+    benches["merge_exam_packages_full"] = lambda: merge(True)
+    benches["merge_exam_packages_incremental"] = lambda: merge(False)
+
+    # Results listing as the viewer pages do it: subjects -> packages -> submissions.
+    def listing():
+        rows = 0
+        for subject in store.subjects():
+            for package_id in store.packages(subject):
+                rows += len(store.query(subject=subject, package_id=package_id))
+        return rows
+
+    benches["results_listing"] = listing
+
+    # Full-text search over the whole bank (index built once, outside the timing).
+    index = SearchIndex(data["db_dir"].parent / "search.sqlite3", data["db_dir"])
+    index.sync(
+        {"subject": subject, "package_id": package_id, "sha256": str(len(files)),
+         "path": f"{subject}/{package_id}/package.json"}
+        for subject, package_id in packages
+    )
+    queries = ["camera", "gradient descent", "hom", "kernel margin support"]
+
+    def search():
+        for q in queries:
+            index.search(q)
+            index.search(q, difficulties=["hard"], subjects=["subject_1"])
+        return 2 * len(queries)
+
+    benches["search_query"] = search
+
+    results = {}
+    for name, fn in benches.items():
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        results[name] = measure(fn, repeat)
+    return results
+
+
+# -------------------------------
+# BASELINES
+# -------------------------------
+def baseline_path(scale: str) -> Path:
+    return BASELINE_DIR / f"{scale}.json"
+
+
+def compare(results: Dict[str, Dict], baseline: Dict, tolerance: float = DEFAULT_TOLERANCE) -> Dict[str, Dict]:
+    """Ratio of each best-of-N time to the baseline's, flagging regressions."""
+    report = {}
+    for name, current in results.items():
+        old = baseline.get("results", {}).get(name)
+        if not old or not old.get("min_s"):
+            continue
+        ratio = current["min_s"] / old["min_s"]
+        regression = ratio > 1 + tolerance and current["min_s"] - old["min_s"] >= MIN_REGRESSION_S
+        report[name] = {"baseline_s": old["min_s"], "ratio": ratio, "regression": regression}
+    return report
+
+
+def print_table(results: Dict[str, Dict], comparison: Dict[str, Dict]):
+    print(f"{'benchmark':<42}{'items':>10}{'median ms':>12}{'per item µs':>14}{'vs baseline':>14}")
+    for name, r in results.items():
+        per_item = f"{r['per_item_us']:.2f}" if r["per_item_us"] is not None else "-"
+        cmp = comparison.get(name)
+        vs = f"{cmp['ratio']:.2f}x{' !' if cmp['regression'] else ''}" if cmp else "-"
+        print(f"{name:<42}{r['items']:>10}{r['median_s'] * 1e3:>12.2f}{per_item:>14}{vs:>14}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the question bank on synthetic data.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--questions", type=int, help="Override the scale's question count.")
+    parser.add_argument("--submissions", type=int, help="Override the scale's submission count.")
+    parser.add_argument("--mcqs-per-package", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="*", help="Run benchmarks whose names start with these prefixes.")
+    parser.add_argument("--output", help="Write the JSON results to this file.")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table.")
+    parser.add_argument("--baseline", help="Baseline file (default: benchmarks/baselines/<scale>.json).")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if any benchmark regressed.")
+    args = parser.parse_args(argv)
+
+    scale = dict(SCALES[args.scale])
+    custom = args.questions is not None or args.submissions is not None
+    if args.questions is not None:
+        scale["questions"] = args.questions
+    if args.submissions is not None:
+        scale["submissions"] = args.submissions
+    label = f"q{scale['questions']}_s{scale['submissions']}" if custom else args.scale
+
+    data = prepare(WORK_DIR / label, scale["questions"], scale["submissions"],
+                   args.mcqs_per_package, args.seed, verbose=not args.json)
+    results = run_benchmarks(data, repeat=args.repeat, only=args.only)
+
+    baseline_file = Path(args.baseline) if args.baseline else baseline_path(label)
+    try:
+        baseline = json.loads(baseline_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        baseline = {}
+    comparison = compare(results, baseline, args.tolerance) if baseline.get("params") == data["params"] else {}
+
+    report = {
+        "version": RESULT_VERSION,
+        "scale": label,
+        "params": data["params"],
+        "created_at": datetime.now().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+        },
+        "results": results,
+        "comparison": comparison,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_table(results, comparison)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.save_baseline:
+        baseline_file.parent.mkdir(parents=True, exist_ok=True)
+        baseline_file.write_text(json.dumps(dict(report, comparison={}), indent=2), encoding="utf-8")
+        if not args.json:
+            print(f"Baseline saved to {baseline_file}")
+
+    regressions = [name for name, c in comparison.items() if c["regression"]]
+    if regressions and not args.json:
+        print(f"Regressions (> {args.tolerance:.0%} slower): {', '.join(regressions)}")
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
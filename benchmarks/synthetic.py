@@ -0,0 +1,148 @@
+"""
+Synthetic question banks and submissions for benchmarking.
+
+Packages follow the real database/<subject>/<package>/package.json schema
+(MCQs with options/correct_option/difficulty/slide_refs, essays with
+keyword rubric criteria). Everything is driven by a seeded RNG so the same
+parameters always produce the same data.
+"""
+import json
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from evaluation.grading import grade_submission
+from storage.submissions import SubmissionStore
+
+# Bumped whenever generated data changes shape, so cached data and baselines are not reused.
+DATA_VERSION = 2
+OPTION_KEYS = ["A", "B", "C", "D", "E"]
+DIFFICULTIES = ["easy", "medium", "hard"]
+
+_WORDS = (
+    "camera lens aperture exposure pixel sensor gradient histogram filter kernel edge corner "
+    "feature descriptor matching stereo disparity depth calibration distortion projection "
+    "homography epipolar optical flow motion segmentation threshold morphology convolution "
+    "fourier frequency noise sampling interpolation transform rotation translation scale "
+    "matrix vector eigenvalue gradient descent convex dual constraint objective lagrangian "
+    "cluster classifier regression entropy variance bias kernel margin support network"
+).split()
+
+
+def _phrase(rng: random.Random, n_words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(n_words))
+
+
+def make_mcq(package_id: str, index: int, rng: random.Random) -> Dict:
+    return {
+        "id": f"{package_id}_mcq{index}",
+        "question": f"Which statement about {_phrase(rng, 3)} is correct?",
+        "options": {key: _phrase(rng, rng.randint(4, 9)).capitalize() for key in OPTION_KEYS},
+        "correct_option": rng.choice(OPTION_KEYS),
+        "difficulty": rng.choice(DIFFICULTIES),
+        "learning_objective": "",
+        "slide_refs": sorted(rng.sample(range(1, 60), rng.randint(0, 3))),
+    }
+
+
+def make_essay(package_id: str, index: int, rng: random.Random, n_criteria: int = 6) -> Dict:
+    keywords = list(dict.fromkeys(_phrase(rng, rng.randint(1, 2)) for _ in range(n_criteria)))
+    weight = 100 // len(keywords)
+    return {
+        "id": f"{package_id}_essay{index}",
+        "prompt": f"Explain the role of {_phrase(rng, 4)} and discuss {_phrase(rng, 3)}.",
+        "expected_keywords": keywords,
+        "rubric": {
+            "total_points": 100,
+            "criteria": [
+                {"keyword": kw, "weight": weight, "description": f"Discusses {kw}."} for kw in keywords
+            ],
+            "grading_notes": "Synthetic rubric.",
+        },
+    }
+
+
+def make_package(package_id: str, n_mcqs: int, n_essays: int, rng: random.Random) -> Dict:
+    return {
+        "package_id": package_id,
+        "source": f"{package_id}.pdf",
+        "level": rng.choice(["introductory", "intermediate", "advanced_undergraduate"]),
+        "mcqs": [make_mcq(package_id, i, rng) for i in range(1, n_mcqs + 1)],
+        "essay": [make_essay(package_id, i, rng) for i in range(1, n_essays + 1)],
+    }
+
+
+def write_bank(db_dir, n_questions: int, mcqs_per_package: int = 50, essays_per_package: int = 1,
+               n_subjects: int = 4, seed: int = 0) -> List[Tuple[str, str]]:
+    """Write about `n_questions` MCQs as package.json files; returns (subject, package_id) pairs."""
+    rng = random.Random(seed)
+    db_dir = Path(db_dir)
+    n_packages = max(1, -(-n_questions // mcqs_per_package))
+    packages = []
+    for p in range(n_packages):
+        subject = f"subject_{p % n_subjects}"
+        package_id = f"package_{p // n_subjects + 1}"
+        n_mcqs = min(mcqs_per_package, n_questions - p * mcqs_per_package)
+        package = make_package(f"{subject}_{package_id}", max(n_mcqs, 0), essays_per_package, rng)
+        out_dir = db_dir / subject / package_id
+        out_dir.mkdir(parents=True, exist_ok=True)
+        with open(out_dir / "package.json", "w", encoding="utf-8") as f:
+            json.dump(package, f, indent=2, ensure_ascii=False)
+        packages.append((subject, package_id))
+    return packages
+
+
+def make_essay_answer(essay: Dict, rng: random.Random, hit_rate: float = 0.5, n_words: int = 120) -> str:
+    words = [rng.choice(_WORDS) for _ in range(n_words)]
+    for criterion in essay["rubric"]["criteria"]:
+        if rng.random() < hit_rate:
+            words.insert(rng.randrange(len(words) + 1), criterion["keyword"])
+    return " ".join(words)
+
+
+def make_submission(subject: str, package_id: str, package: Dict, rng: random.Random,
+                    timestamp: datetime, accuracy: float = 0.6) -> Dict:
+    """A Take Test result record, graded exactly as Take Test grades it."""
+    user_answers = {
+        q["id"]: q["correct_option"] if rng.random() < accuracy else rng.choice(OPTION_KEYS)
+        for q in package["mcqs"]
+    }
+    user_essay_answers = {e["id"]: make_essay_answer(e, rng, n_words=40) for e in package["essay"]}
+    return {
+        "timestamp": timestamp.isoformat(),
+        "user_id": None,
+        "subject": subject,
+        "package_id": package_id,
+        **grade_submission(package, user_answers, user_essay_answers),
+        "user_answers": user_answers,
+        "user_essay_answers": user_essay_answers,
+    }
+
+
+def iter_submissions(packages: Dict[Tuple[str, str], Dict], n_submissions: int, seed: int = 0,
+                     days: int = 365) -> Iterator[Dict]:
+    """Yield submissions spread over packages round-robin and over `days` days from 2025-01-01."""
+    rng = random.Random(seed + 1)
+    keys = sorted(packages)
+    start = datetime(2025, 1, 1)
+    for i in range(n_submissions):
+        subject, package_id = keys[i % len(keys)]
+        timestamp = start + timedelta(seconds=rng.randrange(days * 86400))
+        yield make_submission(subject, package_id, packages[(subject, package_id)], rng, timestamp)
+
+
+def fill_store(store: SubmissionStore, packages: Dict[Tuple[str, str], Dict], n_submissions: int,
+               seed: int = 0, batch_size: int = 5000) -> int:
+    """Append `n_submissions` synthetic results in batched transactions."""
+    batch, written = [], 0
+    for submission in iter_submissions(packages, n_submissions, seed):
+        batch.append(submission)
+        if len(batch) >= batch_size:
+            store.append_many(batch, [f"bench_{written + j:08d}" for j in range(len(batch))])
+            written += len(batch)
+            batch = []
+    if batch:
+        store.append_many(batch, [f"bench_{written + j:08d}" for j in range(len(batch))])
+        written += len(batch)
+    return written
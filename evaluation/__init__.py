@@ -0,0 +1 @@
+"""Grading helpers shared by app.py, the result pages and batch tools."""
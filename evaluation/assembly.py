@@ -0,0 +1,267 @@
+"""
+Randomized test assembly from the pooled question bank.
+
+A stratum index groups every MCQ and essay of a subject (or of the whole
+bank) into a tree of difficulty -> source package -> learning objective,
+with item counts on every node. Assembling an exam walks that tree once:
+N questions are split over the children of each node in proportion to the
+questions still available there (largest remainder, seeded tie-breaks), so
+a 50-question exam from 100k candidates touches only the nodes it samples
+from. Questions the user saw recently are excluded, and only used to top up
+when a stratum runs dry.
+
+Question ids are only unique within a package, so the pool is keyed by
+(source package, id) and a drawn question is renamed "<subject>/<package>/<id>"
+(its package-local id kept as `source_id`). The index is rebuilt only when a
+package's content hash changes. Assembled tests are written to results/assembled/<subject>/<package_id>.json, where
+storage.loader finds them, so grading, storage and the result viewers work
+exactly as for a package.
+"""
+import hashlib
+import json
+import random
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from evaluation.mcq_evaluator import package_essays
+from storage.atomic import atomic_write_json
+from storage.loader import ASSEMBLED_DIR, load_json, load_package, thaw
+from storage.registry import PackageRegistry, get_registry
+from storage.submissions import SubmissionStore
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+ALL_SUBJECTS = "all_subjects"
+ASSEMBLED_PREFIX = "assembled_"
+STRATA = ("difficulty", "package", "learning_objective")
+# Submissions whose questions count as "recently seen".
+RECENT_SUBMISSIONS = 10
+
+_indexes: Dict[str, Tuple[tuple, "StratumIndex"]] = {}
+_indexes_lock = threading.Lock()
+
+
+def _stratum_key(item: Dict, source: str) -> Tuple[str, str, str]:
+    values = {
+        "difficulty": str(item.get("difficulty") or "unrated").strip().lower(),
+        "package": source,
+        "learning_objective": str(item.get("learning_objective") or "").strip().lower(),
+    }
+    return tuple(values[name] for name in STRATA)
+
+
+def qualified_id(source: str, qid: str) -> str:
+    """Id of a question in an assembled test, unique across the bank."""
+    return f"{source}/{qid}"
+
+
+def question_source(question: Dict, subject: str, package_id: str) -> Tuple[str, str]:
+    """(source package, package-local id) of a question of a package or an assembled test."""
+    source = question.get("source_package")
+    if source:
+        return source, question.get("source_id", question["id"])
+    return f"{subject}/{package_id}", question["id"]
+
+
+def _new_node() -> Dict:
+    return {"count": 0, "children": {}, "items": []}
+
+
+class StratumIndex:
+    """Per-kind (mcq/essay) stratum trees over a pool of questions."""
+
+    def __init__(self, pool: Iterable[Tuple[str, str, str, Dict]]):
+        """`pool` yields (kind, subject, package_id, question) tuples."""
+        self.items: List[Dict] = []
+        self.sources: List[str] = []
+        self.trees = {"mcq": _new_node(), "essay": _new_node()}
+        self._paths: Dict[Tuple[str, str], Tuple[str, List[Dict]]] = {}
+
+        for kind, subject, package_id, item in pool:
+            qid = item.get("id") if isinstance(item, dict) else None
+            source = f"{subject}/{package_id}"
+            if qid is None or (source, qid) in self._paths:
+                continue  # first occurrence of an id within a package wins
+            position = len(self.items)
+            self.items.append(item)
+            self.sources.append(source)
+
+            node, path = self.trees[kind], [self.trees[kind]]
+            for key in _stratum_key(item, source):
+                node = node["children"].setdefault(key, _new_node())
+                path.append(node)
+            node["items"].append(position)
+            for visited in path:
+                visited["count"] += 1
+            self._paths[(source, qid)] = (kind, path)
+
+        for tree in self.trees.values():
+            self._sort(tree)
+
+    def _sort(self, node: Dict):
+        # Deterministic child order so a seed always yields the same exam.
+        node["children"] = dict(sorted(node["children"].items()))
+        for child in node["children"].values():
+            self._sort(child)
+
+    def size(self, kind: str) -> int:
+        return self.trees[kind]["count"]
+
+    @staticmethod
+    def _allocate(n: int, available: Dict[str, int], rng: random.Random) -> Dict[str, int]:
+        """Split n over keys proportionally to availability (largest remainder)."""
+        total = sum(available.values())
+        if n >= total:
+            return dict(available)
+        quotas = {key: n * count / total for key, count in available.items() if count}
+        alloc = {key: int(q) for key, q in quotas.items()}
+        leftover = n - sum(alloc.values())
+        order = sorted(quotas, key=lambda key: (alloc[key] - quotas[key], rng.random()))
+        for key in order[:leftover]:
+            alloc[key] += 1
+        return alloc
+
+    def _sample(self, node: Dict, n: int, seen: Set[int], seen_counts: Dict[int, int],
+                rng: random.Random, out: List[int]):
+        if n <= 0:
+            return
+        if not node["children"]:
+            fresh = [p for p in node["items"] if p not in seen]
+            out.extend(rng.sample(fresh, min(n, len(fresh))))
+            return
+        available = {
+            key: child["count"] - seen_counts.get(id(child), 0) for key, child in node["children"].items()
+        }
+        for key, k in self._allocate(n, available, rng).items():
+            self._sample(node["children"][key], k, seen, seen_counts, rng, out)
+
+    def sample(self, kind: str, n: int, rng: random.Random,
+               exclude: Iterable[Tuple[str, str]] = ()) -> Tuple[List[Dict], int]:
+        """Stratified sample of n questions, excluding (source, id) pairs; returns (questions, how many were recently seen)."""
+        seen, seen_counts = set(), {}
+        for key in exclude:
+            found = self._paths.get(key)
+            if not found or found[0] != kind:
+                continue
+            qid, leaf = key[1], found[1][-1]
+            seen.update(p for p in leaf["items"] if self.items[p].get("id") == qid)
+            for node in found[1]:
+                seen_counts[id(node)] = seen_counts.get(id(node), 0) + 1
+
+        picked: List[int] = []
+        self._sample(self.trees[kind], n, seen, seen_counts, rng, picked)
+        reused = 0
+        if len(picked) < n and seen:
+            # Not enough unseen questions: top up from the recently seen ones.
+            extra = rng.sample(sorted(seen), min(n - len(picked), len(seen)))
+            picked.extend(extra)
+            reused = len(extra)
+        rng.shuffle(picked)
+        return [self._question(p) for p in picked], reused
+
+    def _question(self, position: int) -> Dict:
+        item, source = thaw(self.items[position]), self.sources[position]
+        return dict(item, id=qualified_id(source, item["id"]), source_id=item["id"], source_package=source)
+
+
+# -------------------------------
+# INDEX CACHE
+# -------------------------------
+def _pool(entries: List[Dict], db_dir: Path):
+    for entry in entries:
+        try:
+            package = load_json(Path(db_dir) / entry["path"])
+        except (OSError, ValueError):
+            continue
+        if not isinstance(package, dict):
+            continue
+        for q in package.get("mcqs", []) or []:
+            yield "mcq", entry["subject"], entry["package_id"], q
+        for essay in package_essays(package):
+            yield "essay", entry["subject"], entry["package_id"], essay
+
+
+def get_stratum_index(subject: Optional[str] = None, registry: Optional[PackageRegistry] = None) -> StratumIndex:
+    """Stratum index for one subject (or the whole bank), rebuilt only when a package changes."""
+    registry = registry or get_registry()
+    registry.refresh()
+    entries = registry.entries(subject)
+    fingerprint = tuple((e["subject"], e["package_id"], e["sha256"]) for e in entries)
+    scope = subject or ALL_SUBJECTS
+    with _indexes_lock:
+        cached = _indexes.get(scope)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+    index = StratumIndex(_pool(entries, registry.db_dir))
+    with _indexes_lock:
+        _indexes[scope] = (fingerprint, index)
+    return index
+
+
+# -------------------------------
+# ASSEMBLY
+# -------------------------------
+def recent_question_ids(store: SubmissionStore, subject: Optional[str] = None,
+                        limit: int = RECENT_SUBMISSIONS, user_id: Optional[str] = None) -> Set[Tuple[str, str]]:
+    """(source package, id) of the questions answered in the latest `limit` submissions (of one user, if given)."""
+    seen = set()
+    for summary in store.query(subject=subject, limit=limit, user_id=user_id):
+        submission = store.get(summary["submission_id"]) or {}
+        answered = set(submission.get("user_answers", {}) or {})
+        answered.update(submission.get("user_essay_answers", {}) or {})
+        sub_subject, sub_package = submission.get("subject"), submission.get("package_id")
+        package = load_package(sub_subject, sub_package) or {}
+        for q in list(package.get("mcqs", []) or []) + list(package_essays(package)):
+            if q.get("id") in answered:
+                answered.discard(q["id"])
+                seen.add(question_source(q, sub_subject, sub_package))
+        # Questions no longer in the package still count against it.
+        seen.update((f"{sub_subject}/{sub_package}", qid) for qid in answered)
+    return seen
+
+
+def assemble_test(subject: Optional[str], n_mcqs: int, n_essays: int, seed: int,
+                  exclude: Iterable[Tuple[str, str]] = (), registry: Optional[PackageRegistry] = None) -> Dict:
+    """Build a package-shaped exam by stratified sampling from the pool.
+
+    `exclude` holds (source, question id) pairs, as from recent_question_ids().
+    """
+    index = get_stratum_index(subject, registry)
+    exclude = set(exclude)
+    rng = random.Random(seed)
+    mcqs, reused_mcqs = index.sample("mcq", n_mcqs, rng, exclude)
+    essays, reused_essays = index.sample("essay", n_essays, rng, exclude)
+
+    scope = subject or ALL_SUBJECTS
+    digest = hashlib.sha1(
+        json.dumps([scope, seed] + [q["id"] for q in mcqs + essays]).encode("utf-8")
+    ).hexdigest()[:8]
+    return {
+        "package_id": f"{ASSEMBLED_PREFIX}{seed}_{digest}",
+        "source": f"Assembled from {len({q['source_package'] for q in mcqs + essays})} packages",
+        "level": "mixed",
+        "mcqs": mcqs,
+        "essay": essays,
+        "assembly": {
+            "scope": scope,
+            "seed": seed,
+            "strata": list(STRATA),
+            "pool_mcqs": index.size("mcq"),
+            "pool_essays": index.size("essay"),
+            "excluded_recent": len(exclude),
+            "reused_recent": reused_mcqs + reused_essays,
+            "created_at": datetime.now().isoformat(),
+        },
+    }
+
+
+def save_assembled(package: Dict, subject: Optional[str], assembled_dir: Path = ASSEMBLED_DIR) -> Path:
+    """Persist an assembled exam so graders and result viewers can load it later."""
+    out_dir = Path(assembled_dir) / (subject or ALL_SUBJECTS)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_file = out_dir / f"{package['package_id']}.json"
+    atomic_write_json(out_file, package, indent=2)
+    return out_file
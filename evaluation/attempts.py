@@ -0,0 +1,250 @@
+"""
+Per-user attempt history and "review my mistakes" tests.
+
+Every MCQ of a submission that carries a `user_id` is folded into
+results/analytics/attempts.sqlite3: one row per (user, subject, package,
+question) with the number of attempts, how many were correct and the latest
+answer (question ids are only unique within a package). Questions from
+assembled or review tests are recorded against the package they were drawn
+from, under their package-local id. Like the item statistics, the index remembers the last
+submission sequence number folded in, so an update reads only what was
+appended since; it runs as a commit hook of the submission writer.
+
+A review test reads a user's missed questions with one indexed query and
+fetches each question by id from its package (a record lookup when a
+compiled package file exists), so nothing scans old submissions.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from evaluation.assembly import ALL_SUBJECTS, qualified_id, question_source
+from storage.loader import get_package_file, load_package, thaw
+from storage.packfile import open_compiled
+from storage.submissions import SubmissionStore, get_store
+from storage.timing import timed
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+ATTEMPTS_FILE = BASE_DIR / "results" / "analytics" / "attempts.sqlite3"
+REVIEW_PREFIX = "review_"
+# Bumped when the table layout changes; the index is then rebuilt from the store.
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS attempts (
+    user_id      TEXT NOT NULL,
+    question_id  TEXT NOT NULL,
+    subject      TEXT NOT NULL,
+    package_id   TEXT NOT NULL,
+    attempts     INTEGER NOT NULL,
+    correct      INTEGER NOT NULL,
+    last_correct INTEGER NOT NULL,
+    last_answer  TEXT,
+    last_at      TEXT,
+    PRIMARY KEY (user_id, subject, package_id, question_id)
+);
+CREATE INDEX IF NOT EXISTS idx_attempts_missed
+    ON attempts (user_id, last_correct, last_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_UPSERT = """
+INSERT INTO attempts (user_id, question_id, subject, package_id, attempts, correct, last_correct, last_answer, last_at)
+VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?)
+ON CONFLICT (user_id, subject, package_id, question_id) DO UPDATE SET
+    attempts = attempts + 1,
+    correct = correct + excluded.correct,
+    last_correct = excluded.last_correct,
+    last_answer = excluded.last_answer,
+    last_at = excluded.last_at
+"""
+
+_lock = threading.Lock()
+
+
+def _answer_key(subject: str, package_id: str) -> List[Tuple[str, Optional[str], str, str]]:
+    """(answer id, correct option, source subject, source package, source id) per MCQ of a package or test."""
+    package = load_package(subject, package_id) or {}
+    key = []
+    for q in package.get("mcqs", []) or []:
+        source, source_id = question_source(q, subject, package_id)
+        source_subject, _, source_package = source.partition("/")
+        key.append((q["id"], q.get("correct_option"), source_subject, source_package, source_id))
+    return key
+
+
+class AttemptIndex:
+    """(user, subject, package, question) -> attempts, correct count and latest outcome, folded from the store."""
+
+    def __init__(self, path: Path = ATTEMPTS_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                # Older layout: drop it (and last_seq), the next update refolds every submission.
+                conn.executescript("DROP TABLE IF EXISTS attempts; DROP TABLE IF EXISTS meta;")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------- updates ----------
+    def last_seq(self) -> int:
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'last_seq'").fetchone()
+        return int(row["value"]) if row else 0
+
+    def update(self, store: Optional[SubmissionStore] = None, rebuild: bool = False) -> int:
+        """Fold submissions appended since the last update; returns how many were read."""
+        store = store or get_store()
+        with _lock:
+            conn = self._connect()
+            last_seq = 0 if rebuild else self.last_seq()
+            keys: Dict[Tuple[str, str], List] = {}
+            rows, read = [], 0
+            for seq, submission in store.iter_since(last_seq):
+                read += 1
+                last_seq = seq
+                user_id = submission.get("user_id")
+                if not user_id:
+                    continue
+                group = (submission["subject"], submission["package_id"])
+                if group not in keys:
+                    keys[group] = _answer_key(*group)
+                answers = submission.get("user_answers", {}) or {}
+                at = submission.get("timestamp") or ""
+                for qid, correct_option, subject, package_id, source_id in keys[group]:
+                    answer = answers.get(qid)
+                    correct = int(answer is not None and answer == correct_option)
+                    rows.append((user_id, source_id, subject, package_id, correct, correct, answer, at))
+            if not read and not rebuild:
+                return 0
+            with conn:
+                if rebuild:
+                    conn.execute("DELETE FROM attempts")
+                # Rows are in submission order, so the latest attempt sets last_correct.
+                conn.executemany(_UPSERT, rows)
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_seq', ?)", (str(last_seq),))
+            return read
+
+    # ---------- reads ----------
+    def mistakes(self, user_id: str, subject: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        """Questions whose latest attempt by this user was wrong or unanswered, newest first."""
+        sql = "SELECT * FROM attempts WHERE user_id = ? AND last_correct = 0"
+        params: List = [user_id]
+        if subject is not None:
+            sql += " AND subject = ?"
+            params.append(subject)
+        sql += " ORDER BY last_at DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return [dict(r) for r in self._connect().execute(sql, params)]
+
+    def summary(self, user_id: str) -> Dict:
+        row = self._connect().execute(
+            "SELECT COUNT(*) AS questions, COALESCE(SUM(attempts), 0) AS attempts, "
+            "COALESCE(SUM(correct), 0) AS correct, COALESCE(SUM(last_correct = 0), 0) AS open_mistakes "
+            "FROM attempts WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return dict(row)
+
+    def question(self, user_id: str, subject: str, package_id: str, question_id: str) -> Optional[Dict]:
+        row = self._connect().execute(
+            "SELECT * FROM attempts WHERE user_id = ? AND subject = ? AND package_id = ? AND question_id = ?",
+            (user_id, subject, package_id, question_id),
+        ).fetchone()
+        return dict(row) if row else None
+
+
+_index: Optional[AttemptIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_attempt_index() -> AttemptIndex:
+    """Return the process-wide attempt index."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = AttemptIndex()
+    return _index
+
+
+@timed("update_attempts")
+def update_attempts():
+    """Commit hook: fold newly stored submissions into the attempt index."""
+    get_attempt_index().update()
+
+
+# -------------------------------
+# REVIEW TESTS
+# -------------------------------
+def _fetch_questions(subject: str, package_id: str, ids: List[str]) -> Dict[str, Dict]:
+    path = get_package_file(subject, package_id)
+    if path is None:
+        return {}
+    compiled = open_compiled(path)
+    if compiled is not None:
+        return {qid: q for qid in ids if (q := compiled.question(qid)) is not None}
+    wanted = set(ids)
+    package = load_package(subject, package_id) or {}
+    return {q["id"]: q for q in package.get("mcqs", []) or [] if q.get("id") in wanted}
+
+
+def build_review_test(user_id: str, subject: Optional[str] = None, n_questions: int = 20) -> Optional[Dict]:
+    """Package-shaped test of the user's most recent open mistakes, or None if there are none.
+
+    Questions are renamed "<subject>/<package>/<id>" as in assembled tests, so
+    questions sharing an id in different packages keep separate answers.
+    """
+    index = get_attempt_index()
+    index.update()
+    rows = index.mistakes(user_id, subject, limit=n_questions)
+    by_package = defaultdict(list)
+    for row in rows:
+        by_package[(row["subject"], row["package_id"])].append(row["question_id"])
+
+    found = {}
+    for (row_subject, row_package), ids in by_package.items():
+        source = f"{row_subject}/{row_package}"
+        for qid, q in _fetch_questions(row_subject, row_package, ids).items():
+            found[(source, qid)] = dict(thaw(q), id=qualified_id(source, qid), source_id=qid, source_package=source)
+    mcqs = [
+        found[key] for row in rows
+        if (key := (f"{row['subject']}/{row['package_id']}", row["question_id"])) in found
+    ]
+    if not mcqs:
+        return None
+
+    digest = hashlib.sha1(json.dumps([user_id] + [q["id"] for q in mcqs]).encode("utf-8")).hexdigest()[:8]
+    return {
+        "package_id": f"{REVIEW_PREFIX}{digest}",
+        "source": f"Review of {len(mcqs)} missed question(s) from {len(by_package)} package(s)",
+        "level": "mixed",
+        "mcqs": mcqs,
+        "essay": [],
+        "review": {
+            "user_id": user_id,
+            "subject": subject or ALL_SUBJECTS,
+            "created_at": datetime.now().isoformat(),
+        },
+    }
@@ -0,0 +1,261 @@
+"""
+Compiled multi-keyword essay grading.
+
+Each rubric is compiled once into an Aho-Corasick automaton over its
+criterion keywords, cached by a hash of the rubric, and a response is then
+scored in a single pass over the text. The default mode reproduces the
+original `keyword.lower() in text.lower()` rule exactly; `normalize` and
+`word_boundary` are opt-in.
+"""
+import hashlib
+import json
+import threading
+import unicodedata
+from collections import OrderedDict, deque
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from storage.timing import timed
+
+DEFAULT_TOTAL_POINTS = 100
+MAX_COMPILED_RUBRICS = 2048
+
+# Dashes and quotes folded together when `normalize=True`.
+_CHAR_FOLDS = {
+    "‐": "-", "‑": "-", "‒": "-", "–": "-", "—": "-",
+    "―": "-", "−": "-", "﹘": "-", "﹣": "-", "－": "-",
+    "‘": "'", "’": "'", "“": '"', "”": '"',
+}
+
+
+class EssayScore(NamedTuple):
+    score: float
+    total: float
+    matched: List[str]
+    spans: Dict[str, List[Tuple[int, int]]]
+
+
+# -------------------------------
+# NORMALIZATION
+# -------------------------------
+def _fold(text: str, normalize: bool) -> Tuple[str, Optional[List[int]]]:
+    """Lower-case (and optionally normalize) text.
+
+    Returns the folded text and, when lengths differ from the input, a map
+    from each folded character to its index in the original text.
+    """
+    if not normalize:
+        folded = text.lower()
+        if len(folded) == len(text):
+            return folded, None
+
+    out: List[str] = []
+    offsets: List[int] = []
+    previous_space = False
+    for i, ch in enumerate(text):
+        if normalize:
+            ch = _CHAR_FOLDS.get(ch, ch)
+            if ch.isspace():
+                if previous_space:
+                    continue
+                ch = " "
+                previous_space = True
+            else:
+                previous_space = False
+            piece = unicodedata.normalize("NFKC", ch).casefold()
+        else:
+            piece = ch.lower()
+        out.append(piece)
+        offsets.extend([i] * len(piece))
+    return "".join(out), offsets
+
+
+def _keyword_criteria(rubric: Dict) -> List[Dict]:
+    """Criteria that carry a keyword; free-text criteria are not auto-graded."""
+    return [c for c in rubric.get("criteria", []) or [] if isinstance(c, dict) and "keyword" in c]
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+# -------------------------------
+# AUTOMATON
+# -------------------------------
+class CompiledRubric:
+    """Aho-Corasick automaton over the keywords of one rubric."""
+
+    def __init__(self, rubric: Dict, normalize: bool = False, word_boundary: bool = False):
+        self.normalize = normalize
+        self.word_boundary = word_boundary
+        self.total_points = rubric.get("total_points", DEFAULT_TOTAL_POINTS)
+        criteria = _keyword_criteria(rubric)
+        self.keywords = [c["keyword"] for c in criteria]
+        self.weights = [c.get("weight", 0) for c in criteria]
+
+        # Distinct folded patterns; several criteria may share one keyword.
+        self._patterns: List[str] = []
+        self._pattern_criteria: List[List[int]] = []
+        index: Dict[str, int] = {}
+        for ci, keyword in enumerate(self.keywords):
+            folded, _ = _fold(keyword, normalize)
+            if not folded:
+                continue
+            if folded not in index:
+                index[folded] = len(self._patterns)
+                self._patterns.append(folded)
+                self._pattern_criteria.append([])
+            self._pattern_criteria[index[folded]].append(ci)
+
+        self._build()
+
+    def _build(self):
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[int]] = [[]]
+        for pi, pattern in enumerate(self._patterns):
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            out[state].append(pi)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                candidate = goto[f].get(ch, 0)
+                fail[nxt] = candidate if candidate != nxt else 0
+                out[nxt] = out[nxt] + out[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def find(self, text: str) -> Dict[int, List[Tuple[int, int]]]:
+        """Return {pattern_index: [(start, end), ...]} in original-text offsets."""
+        folded, offsets = _fold(text or "", self.normalize)
+        goto, fail, out = self._goto, self._fail, self._out
+        lengths = [len(p) for p in self._patterns]
+        found: Dict[int, List[Tuple[int, int]]] = {}
+
+        state = 0
+        for i, ch in enumerate(folded):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            for pi in out[state]:
+                start, end = i - lengths[pi] + 1, i + 1
+                if self.word_boundary and (
+                    (start > 0 and _is_word_char(folded[start - 1]) and _is_word_char(folded[start]))
+                    or (end < len(folded) and _is_word_char(folded[end]) and _is_word_char(folded[end - 1]))
+                ):
+                    continue
+                if offsets is not None:
+                    start, end = offsets[start], offsets[end - 1] + 1
+                found.setdefault(pi, []).append((start, end))
+        return found
+
+    def score(self, text: str) -> EssayScore:
+        """Score one response in a single pass over the text."""
+        found = self.find(text)
+        hit = [False] * len(self.keywords)
+        spans: Dict[str, List[Tuple[int, int]]] = {}
+        for pi, pattern_spans in found.items():
+            for ci in self._pattern_criteria[pi]:
+                hit[ci] = True
+                spans[self.keywords[ci]] = pattern_spans
+
+        score = 0
+        matched = []
+        for ci, keyword in enumerate(self.keywords):
+            if hit[ci]:
+                score += self.weights[ci]
+                matched.append(keyword)
+        return EssayScore(score, self.total_points, matched, spans)
+
+
+# -------------------------------
+# CACHE
+# -------------------------------
+_compiled: "OrderedDict[Tuple[str, bool, bool], CompiledRubric]" = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def rubric_hash(rubric: Dict) -> str:
+    """Stable hash of the parts of a rubric that affect scoring."""
+    key = {
+        "total_points": rubric.get("total_points", DEFAULT_TOTAL_POINTS),
+        "criteria": [[c["keyword"], c.get("weight", 0)] for c in _keyword_criteria(rubric)],
+    }
+    return hashlib.sha1(json.dumps(key, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def compile_rubric(rubric: Dict, normalize: bool = False, word_boundary: bool = False) -> CompiledRubric:
+    """Return the cached automaton for a rubric, compiling it on first use."""
+    key = (rubric_hash(rubric), normalize, word_boundary)
+    with _compiled_lock:
+        compiled = _compiled.get(key)
+        if compiled is not None:
+            _compiled.move_to_end(key)
+            return compiled
+
+    compiled = CompiledRubric(rubric, normalize=normalize, word_boundary=word_boundary)
+    with _compiled_lock:
+        _compiled[key] = compiled
+        while len(_compiled) > MAX_COMPILED_RUBRICS:
+            _compiled.popitem(last=False)
+    return compiled
+
+
+# -------------------------------
+# PUBLIC HELPERS
+# -------------------------------
+def get_rubric(essay_data: Dict) -> Dict:
+    return essay_data.get("rubric") or {"criteria": [], "total_points": DEFAULT_TOTAL_POINTS}
+
+
+@timed("grade_essay")
+def score_essay(essay_data: Dict, user_text: str, normalize: bool = False,
+                word_boundary: bool = False) -> EssayScore:
+    """Score an essay response and return matched keywords with their spans."""
+    compiled = compile_rubric(get_rubric(essay_data), normalize=normalize, word_boundary=word_boundary)
+    return compiled.score(user_text or "")
+
+
+def rubric_keywords(essay_data: Dict) -> List[str]:
+    """Keywords of the auto-graded rubric criteria, in rubric order."""
+    return [c["keyword"] for c in _keyword_criteria(get_rubric(essay_data))]
+
+
+def match_record(essay_data: Dict, result: EssayScore) -> Dict:
+    """Serializable form of a scored essay, stored alongside a submission."""
+    return {
+        "rubric_hash": rubric_hash(get_rubric(essay_data)),
+        "spans": {kw: [list(span) for span in spans] for kw, spans in result.spans.items()},
+    }
+
+
+def find_matched_keywords(essay_data: Dict, user_text: str, record: Optional[Dict] = None) -> List[str]:
+    """Matched keywords for a response, reusing a stored match record when
+    it was produced against the same rubric."""
+    if record and record.get("rubric_hash") == rubric_hash(get_rubric(essay_data)):
+        spans = record.get("spans", {})
+        return [kw for kw in rubric_keywords(essay_data) if kw in spans]
+    return score_essay(essay_data, user_text).matched
+
+
+def grade_essay(essay_data, user_text):
+    """Keyword-based essay scoring."""
+    result = score_essay(essay_data, user_text)
+    return result.score, result.total, result.matched
@@ -0,0 +1,163 @@
+"""
+Whole-submission grading shared by Take Test, batch regrading and the
+grading service. Nothing here imports Streamlit, so scripts can use it:
+
+    from evaluation.grading import grade_batch
+    grade_batch([{"subject": ..., "package_id": ..., "user_answers": {...}}])
+"""
+import os
+from collections import defaultdict
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from evaluation.essay_grader import compile_rubric, get_rubric, match_record, score_essay
+from evaluation.mcq_evaluator import answer_key, final_score, grade_mcq, package_essays
+from storage.loader import load_package
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+# Read here rather than in evaluation.semantic so that keyword-only grading
+# never imports NumPy or the vector code.
+DEFAULT_SEMANTIC_WEIGHT = float(os.getenv("QB_SEMANTIC_WEIGHT", 0))
+
+
+def score_mcqs(package: Dict, answer_maps: List[Dict]) -> "np.ndarray":
+    """Number of correct MCQs per submission, computed over an answer matrix.
+
+    Answers and keys are interned to integer codes (missing answers included),
+    so equality is exactly `user_answers.get(id) == correct_option`.
+    """
+    import numpy as np
+
+    ids, key = answer_key(package)
+    if not ids:
+        return np.zeros(len(answer_maps), dtype=np.int64)
+
+    codes: Dict = {}
+    key_codes = np.array([codes.setdefault(k, len(codes)) for k in key], dtype=np.int64)
+    answers = np.empty((len(answer_maps), len(ids)), dtype=np.int64)
+    for row, user_answers in enumerate(answer_maps):
+        answers[row] = [codes.setdefault(user_answers.get(qid), len(codes)) for qid in ids]
+    return (answers == key_codes).sum(axis=1)
+
+
+def grade_essays_batch(essays: List[Dict], essay_answer_maps: List[Dict],
+                       semantic_weight: Optional[float] = None) -> List[Dict]:
+    """Score every essay of a package for many submissions at once.
+
+    Keyword matching runs per response; with a semantic weight above zero
+    (QB_SEMANTIC_WEIGHT by default) each essay's responses are also compared
+    with its rubric criteria in one batched similarity call and blended in
+    (see evaluation.semantic).
+    """
+    weight = DEFAULT_SEMANTIC_WEIGHT if semantic_weight is None else semantic_weight
+    if weight > 0:
+        from evaluation.semantic import blend, score_batch
+    graded = [
+        {"essay_score": 0, "essay_total": 0, "matched_keywords": [], "essay_matches": {}, "per_essay": []}
+        for _ in essay_answer_maps
+    ]
+    for essay in essays:
+        texts = [answers.get(essay["id"], "") for answers in essay_answer_maps]
+        semantic = score_batch(essays, essay["id"], texts) if weight > 0 else [None] * len(texts)
+        compiled = compile_rubric(get_rubric(essay)) if weight > 0 else None
+        for out, text, sem in zip(graded, texts, semantic):
+            result = score_essay(essay, text)
+            # Stored so the viewers can reuse spans instead of re-matching.
+            record = match_record(essay, result)
+            if sem is not None:
+                matched = set(result.matched)
+                hits = [keyword in matched for keyword in compiled.keywords]
+                result = result._replace(score=round(blend(compiled.weights, hits, sem.credits, weight), 2))
+                record["semantic"] = {
+                    "weight": weight,
+                    "credits": dict(zip(compiled.keywords, (round(c, 3) for c in sem.credits))),
+                    "prompt_similarity": round(sem.prompt_similarity, 3),
+                }
+            out["essay_score"] += result.score
+            out["essay_total"] += result.total
+            out["matched_keywords"].extend(result.matched)
+            out["essay_matches"][essay["id"]] = record
+            out["per_essay"].append((essay["id"], result))
+    return graded
+
+
+def grade_essays(essays: List[Dict], user_essay_answers: Dict,
+                 semantic_weight: Optional[float] = None) -> Dict:
+    """Score every essay of a package and aggregate the totals."""
+    return grade_essays_batch(essays, [user_essay_answers], semantic_weight)[0]
+
+
+def grade_submission(package: Dict, user_answers: Dict, user_essay_answers: Dict) -> Dict:
+    """Score fields of a submission, exactly as Take Test stores them."""
+    mcqs = package.get("mcqs", [])
+    if mcqs:
+        mcq_correct, mcq_total = grade_mcq(mcqs, user_answers)
+    else:
+        mcq_correct, mcq_total = 0, 0
+
+    essays = grade_essays(package_essays(package), user_essay_answers)
+    return {
+        "mcq_score": mcq_correct,
+        "mcq_total": mcq_total,
+        "essay_score": essays["essay_score"],
+        "essay_total": essays["essay_total"],
+        "final_score": final_score(mcq_correct, mcq_total, essays["essay_score"], essays["essay_total"]),
+        "matched_keywords": essays["matched_keywords"],
+        "essay_matches": essays["essay_matches"],
+    }
+
+
+def grade_batch(submissions: List[Dict], semantic_weight: Optional[float] = None) -> List[Dict]:
+    """Grade many submissions, possibly for different packages, in input order.
+
+    Each submission needs `subject`, `package_id`, `user_answers` and/or
+    `user_essay_answers`. Submissions are grouped by package: the package is
+    loaded once (from the in-memory JSON cache), MCQs are scored over one
+    answer matrix and essays with grade_essays_batch. A submission that
+    cannot be graded gets `{"error": ...}` instead of scores.
+    """
+    results: List[Optional[Dict]] = [None] * len(submissions)
+    groups = defaultdict(list)
+    for i, submission in enumerate(submissions):
+        if not isinstance(submission, dict):
+            results[i] = {"error": "submission must be a JSON object"}
+        elif not isinstance(submission.get("user_answers", {}) or {}, dict) or \
+                not isinstance(submission.get("user_essay_answers", {}) or {}, dict):
+            results[i] = {"error": "user_answers and user_essay_answers must be objects"}
+        elif not all(v is None or isinstance(v, str) for v in (submission.get("user_answers") or {}).values()):
+            results[i] = {"error": "MCQ answers must be option keys (strings) or null"}
+        elif not all(isinstance(v, str) for v in (submission.get("user_essay_answers") or {}).values()):
+            results[i] = {"error": "essay answers must be strings"}
+        else:
+            groups[(str(submission.get("subject") or ""), str(submission.get("package_id") or ""))].append(i)
+
+    for (subject, package_id), positions in groups.items():
+        package = load_package(subject, package_id) if subject and package_id else None
+        if package is None:
+            for i in positions:
+                results[i] = {"error": f"package not found: {subject}/{package_id}"}
+            continue
+        batch = [submissions[i] for i in positions]
+        mcq_total = len(package.get("mcqs", []) or [])
+        mcq_correct = score_mcqs(package, [s.get("user_answers", {}) or {} for s in batch])
+        essays = package_essays(package)
+        if essays:
+            graded = grade_essays_batch(essays, [s.get("user_essay_answers", {}) or {} for s in batch],
+                                        semantic_weight)
+        else:
+            graded = [{"essay_score": 0, "essay_total": 0, "matched_keywords": [], "essay_matches": {}}] * len(batch)
+        for i, correct, essay in zip(positions, mcq_correct.tolist(), graded):
+            results[i] = {
+                "mcq_score": correct,
+                "mcq_total": mcq_total,
+                "essay_score": essay["essay_score"],
+                "essay_total": essay["essay_total"],
+                "final_score": final_score(correct, mcq_total, essay["essay_score"], essay["essay_total"]),
+                "matched_keywords": essay["matched_keywords"],
+                "essay_matches": essay["essay_matches"],
+            }
+    return results
@@ -0,0 +1,222 @@
+"""
+Classical item analysis over stored submissions.
+
+Per package we keep running sums (sufficient statistics) in a materialized
+file, results/analytics/question_performance.json, together with the last
+submission sequence number folded in. New submissions are applied in
+vectorized NumPy batches, so opening the analytics page only processes what
+arrived since the last update instead of rescanning every result. Every
+question keeps its own attempt count and score sums, so a question added to
+a package later is measured only against the submissions that contained it.
+Submissions whose package cannot be loaded are kept (by id) and folded in
+once it can.
+
+Derived per MCQ: p-value (proportion correct), point-biserial
+discrimination against the MCQ total score, and option choice distribution.
+Derived per essay: keyword hit rates.
+"""
+import json
+import math
+import threading
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from evaluation.essay_grader import find_matched_keywords, rubric_keywords
+from evaluation.mcq_evaluator import answer_key, package_essays
+from storage.atomic import atomic_write_json
+from storage.loader import load_package
+from storage.submissions import SubmissionStore, get_store
+from storage.timing import timed
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+ANALYTICS_DIR = BASE_DIR / "results" / "analytics"
+STATS_FILE = ANALYTICS_DIR / "question_performance.json"
+STATS_VERSION = 2
+
+_lock = threading.Lock()
+
+
+def _empty_stats() -> Dict:
+    return {"version": STATS_VERSION, "last_seq": 0, "packages": {}, "pending": {}}
+
+
+def load_stats(path: Path = STATS_FILE) -> Dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            stats = json.load(f)
+    except (OSError, ValueError):
+        return _empty_stats()
+    return stats if stats.get("version") == STATS_VERSION else _empty_stats()
+
+
+def _save_stats(stats: Dict, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    stats["updated_at"] = datetime.now().isoformat()
+    # Rebuildable from the submission store, so no fsync.
+    atomic_write_json(path, stats, fsync="none")
+
+
+# -------------------------------
+# INCREMENTAL AGGREGATION
+# -------------------------------
+def _apply_batch(entry: Dict, package: Dict, submissions: List[Dict]):
+    """Fold a batch of submissions for one package into its running sums."""
+    import numpy as np  # deferred: importing this module is on every page's startup path
+
+    ids, key = answer_key(package)
+    mcq_stats = entry.setdefault("mcqs", {})
+    n = len(submissions)
+
+    if ids:
+        codes: Dict = {}
+        key_codes = np.array([codes.setdefault(k, len(codes)) for k in key], dtype=np.int64)
+        answers = np.empty((n, len(ids)), dtype=np.int64)
+        for row, submission in enumerate(submissions):
+            user_answers = submission.get("user_answers", {}) or {}
+            answers[row] = [codes.setdefault(user_answers.get(qid), len(codes)) for qid in ids]
+
+        correct = answers == key_codes
+        totals = correct.sum(axis=1).astype(float)
+        n_correct = correct.sum(axis=0)
+        sum_total_correct = (correct * totals[:, None]).sum(axis=0)
+
+        batch_total, batch_total_sq = float(totals.sum()), float((totals ** 2).sum())
+        labels = {code: label for label, code in codes.items()}
+        for col, qid in enumerate(ids):
+            item = mcq_stats.setdefault(qid, {
+                "n": 0, "n_correct": 0, "sum_total": 0.0, "sum_total_sq": 0.0, "sum_total_correct": 0.0, "options": {},
+            })
+            item["n"] += n
+            item["sum_total"] += batch_total
+            item["sum_total_sq"] += batch_total_sq
+            item["n_correct"] += int(n_correct[col])
+            item["sum_total_correct"] += float(sum_total_correct[col])
+            chosen, counts = np.unique(answers[:, col], return_counts=True)
+            for code, count in zip(chosen.tolist(), counts.tolist()):
+                label = labels[code]
+                label = "(no answer)" if label is None else str(label)
+                item["options"][label] = item["options"].get(label, 0) + count
+
+    essay_stats = entry.setdefault("essays", {})
+    for essay in package_essays(package):
+        eid = essay["id"]
+        item = essay_stats.setdefault(eid, {"n": 0, "keywords": {kw: 0 for kw in rubric_keywords(essay)}})
+        for submission in submissions:
+            text = (submission.get("user_essay_answers", {}) or {}).get(eid, "")
+            record = (submission.get("essay_matches", {}) or {}).get(eid)
+            for kw in find_matched_keywords(essay, text, record):
+                item["keywords"][kw] = item["keywords"].get(kw, 0) + 1
+        item["n"] += n
+
+    entry["n"] = entry.get("n", 0) + n
+
+
+@timed("update_stats")
+def update_stats(store: Optional[SubmissionStore] = None, path: Path = STATS_FILE,
+                 rebuild: bool = False) -> Dict:
+    """Fold submissions appended since the last update into the materialized stats."""
+    store = store or get_store()
+    with _lock:
+        stats = _empty_stats() if rebuild else load_stats(path)
+        pending = stats.setdefault("pending", {})
+        batches = defaultdict(list)
+        last_seq = stats["last_seq"]
+        for seq, submission in store.iter_since(last_seq):
+            batches[(submission["subject"], submission["package_id"])].append(submission)
+            last_seq = seq
+
+        # Retry submissions of packages that could not be loaded before.
+        retry = {key: held for key, held in pending.items()
+                 if load_package(held["subject"], held["package_id"]) is not None}
+        if last_seq == stats["last_seq"] and not retry and not rebuild:
+            return stats
+        for key, held in retry.items():
+            del pending[key]
+            retried = [s for s in map(store.get, held["submission_ids"]) if s is not None]
+            batches[(held["subject"], held["package_id"])][:0] = retried
+
+        for (subject, package_id), submissions in batches.items():
+            key = f"{subject}/{package_id}"
+            package = load_package(subject, package_id)
+            if package is None:
+                held = pending.setdefault(key, {"subject": subject, "package_id": package_id, "submission_ids": []})
+                held["submission_ids"].extend(s["submission_id"] for s in submissions)
+                continue
+            entry = stats["packages"].setdefault(key, {"subject": subject, "package_id": package_id})
+            _apply_batch(entry, package, submissions)
+
+        stats["last_seq"] = last_seq
+        _save_stats(stats, path)
+        return stats
+
+
+# -------------------------------
+# DERIVED STATISTICS
+# -------------------------------
+def mcq_item_rows(stats: Dict, subject: Optional[str] = None, package_id: Optional[str] = None) -> List[Dict]:
+    """p-value, point-biserial and option distribution per MCQ."""
+    rows = []
+    for entry in stats["packages"].values():
+        if subject and entry["subject"] != subject:
+            continue
+        if package_id and entry["package_id"] != package_id:
+            continue
+        for qid, item in entry.get("mcqs", {}).items():
+            # Only the submissions that contained this question count.
+            n = item["n"]
+            if not n:
+                continue
+            sum_total = item["sum_total"]
+            mean = sum_total / n
+            sd = math.sqrt(max(item["sum_total_sq"] / n - mean ** 2, 0.0))
+            n1 = item["n_correct"]
+            p = n1 / n
+            if 0 < n1 < n and sd > 0:
+                mean1 = item["sum_total_correct"] / n1
+                mean0 = (sum_total - item["sum_total_correct"]) / (n - n1)
+                point_biserial = (mean1 - mean0) / sd * math.sqrt(p * (1 - p))
+            else:
+                point_biserial = None
+            rows.append({
+                "subject": entry["subject"],
+                "package_id": entry["package_id"],
+                "question_id": qid,
+                "attempts": n,
+                "p_value": p,
+                "point_biserial": point_biserial,
+                "options": {k: v / n for k, v in sorted(item["options"].items())},
+            })
+    return rows
+
+
+def essay_keyword_rows(stats: Dict, subject: Optional[str] = None,
+                       package_id: Optional[str] = None) -> List[Dict]:
+    """Hit rate of every rubric keyword per essay."""
+    rows = []
+    for entry in stats["packages"].values():
+        if subject and entry["subject"] != subject:
+            continue
+        if package_id and entry["package_id"] != package_id:
+            continue
+        for eid, item in entry.get("essays", {}).items():
+            for kw, hits in item["keywords"].items():
+                rows.append({
+                    "subject": entry["subject"],
+                    "package_id": entry["package_id"],
+                    "essay_id": eid,
+                    "keyword": kw,
+                    "attempts": item["n"],
+                    "hit_rate": hits / item["n"] if item["n"] else 0.0,
+                })
+    return rows
+
+
+if __name__ == "__main__":
+    result = update_stats()
+    print(f"Item statistics up to submission #{result['last_seq']} "
+          f"for {len(result['packages'])} packages -> {STATS_FILE}")
@@ -0,0 +1,41 @@
+"""MCQ scoring and the combined final score used by Take Test."""
+from typing import Dict, List, Tuple
+
+from storage.timing import timed
+
+# Share of the final score given to MCQs when a package has any.
+MCQ_WEIGHT = 50
+ESSAY_WEIGHT = 50
+
+
+@timed("grade_mcq")
+def grade_mcq(mcq_data, user_answers):
+    """Compute MCQ score."""
+    total, correct = len(mcq_data), 0
+    for q in mcq_data:
+        if user_answers.get(q["id"]) == q.get("correct_option"):
+            correct += 1
+    return correct, total
+
+
+def final_score(mcq_correct, mcq_total, essay_score, essay_total) -> float:
+    """Combine MCQ and essay results into a 0–100 score (50/50 when both exist)."""
+    essay_percent = essay_score / essay_total if essay_total else 0
+    if mcq_total > 0:
+        mcq_percent = mcq_correct / mcq_total
+        return (mcq_percent * MCQ_WEIGHT) + (essay_percent * ESSAY_WEIGHT)
+    return essay_percent * 100
+
+
+def package_essays(package: Dict) -> List[Dict]:
+    """Essay list of a package; accepts both `essay: {...}` and `essay: [...]`."""
+    essays = package.get("essay", []) or []
+    if isinstance(essays, dict):
+        essays = [essays]
+    return essays
+
+
+def answer_key(package: Dict) -> Tuple[List[str], List]:
+    """MCQ ids and their correct options, in package order."""
+    mcqs = package.get("mcqs", []) or []
+    return [q["id"] for q in mcqs], [q.get("correct_option") for q in mcqs]
@@ -0,0 +1,188 @@
+"""
+Headless bulk regrading of stored submissions.
+
+Run after fixing a package's `correct_option` or rubric weights:
+
+    python -m evaluation.regrade                      # all subjects
+    python -m evaluation.regrade --subject machine_vision --package package_20
+    python -m evaluation.regrade --dry-run --report regrade_report.json
+
+Each package is loaded once; MCQs for all of its submissions are scored in
+one vectorized pass over an answer matrix, and essays are scored in a
+process pool. Scores use the same formulas as Take Test (`grade_mcq`,
+`grade_essay`, `final_score`), so regraded results match the interactive path.
+
+Item statistics and the per-user attempt index judge answers against the key
+at the time a submission was folded in, so a regrade that writes rebuilds
+both from the store.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from evaluation.attempts import get_attempt_index
+from evaluation.grading import grade_essays_batch, score_mcqs
+from evaluation.item_analysis import update_stats
+from evaluation.mcq_evaluator import final_score, package_essays
+from storage.loader import load_package, thaw
+from storage.submissions import SubmissionStore, get_store
+
+SCORE_FIELDS = ("mcq_score", "mcq_total", "essay_score", "essay_total", "final_score")
+ESSAY_CHUNK_SIZE = 64
+
+
+# -------------------------------
+# ESSAYS (PROCESS POOL)
+# -------------------------------
+def _grade_essay_chunk(essays: List[Dict], essay_answers: List[Dict],
+                       semantic_weight: Optional[float] = None) -> List[Dict]:
+    """Worker: grade a chunk of submissions against one package's essays."""
+    results = grade_essays_batch(essays, essay_answers, semantic_weight)
+    for graded in results:
+        graded.pop("per_essay")
+    return results
+
+
+def _submit_essays(pool, essays, payloads, semantic_weight=None):
+    essay_answers = [p.get("user_essay_answers", {}) or {} for p in payloads]
+    if pool is None:
+        return [_grade_essay_chunk(essays, essay_answers, semantic_weight)]
+    return [
+        pool.submit(_grade_essay_chunk, essays, essay_answers[i:i + ESSAY_CHUNK_SIZE], semantic_weight)
+        for i in range(0, len(essay_answers), ESSAY_CHUNK_SIZE)
+    ]
+
+
+# -------------------------------
+# REGRADE
+# -------------------------------
+def _changed(old: Dict, new: Dict) -> bool:
+    for field in SCORE_FIELDS:
+        before, after = old.get(field), new[field]
+        if isinstance(before, (int, float)) and isinstance(after, (int, float)):
+            if abs(before - after) > 1e-9:
+                return True
+        elif before != after:
+            return True
+    return False
+
+
+def regrade(store: SubmissionStore, subject: Optional[str] = None, package_id: Optional[str] = None,
+            workers: Optional[int] = None, dry_run: bool = False,
+            semantic_weight: Optional[float] = None) -> Dict:
+    """Re-score stored submissions and write back those whose grade changed."""
+    groups = [
+        (s, p)
+        for s in ([subject] if subject else store.subjects())
+        for p in ([package_id] if package_id else store.packages(s))
+    ]
+    if workers is None:
+        workers = min(os.cpu_count() or 1, 8)
+
+    changes, updated_payloads, missing = [], [], []
+    scanned = 0
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for group_subject, group_package in groups:
+            package = load_package(group_subject, group_package)
+            payloads = list(store.iter_payloads(group_subject, group_package))
+            if not payloads:
+                continue
+            if package is None:
+                missing.append(f"{group_subject}/{group_package}")
+                continue
+            scanned += len(payloads)
+
+            essays = thaw(package_essays(package))
+            pending = _submit_essays(pool, essays, payloads, semantic_weight) if essays else []
+            mcq_total = len(package.get("mcqs", []) or [])
+            mcq_correct = score_mcqs(package, [p.get("user_answers", {}) or {} for p in payloads])
+
+            essay_results = []
+            for chunk in pending:
+                essay_results.extend(chunk if isinstance(chunk, list) else chunk.result())
+
+            for i, payload in enumerate(payloads):
+                graded = essay_results[i] if essays else {
+                    "essay_score": 0, "essay_total": 0, "matched_keywords": [], "essay_matches": {},
+                }
+                correct = int(mcq_correct[i])
+                new = {
+                    "mcq_score": correct,
+                    "mcq_total": mcq_total,
+                    "essay_score": graded["essay_score"],
+                    "essay_total": graded["essay_total"],
+                    "final_score": final_score(correct, mcq_total, graded["essay_score"], graded["essay_total"]),
+                }
+                if not _changed(payload, new):
+                    continue
+                changes.append({
+                    "submission_id": payload["submission_id"],
+                    "subject": group_subject,
+                    "package_id": group_package,
+                    **{f"old_{k}": payload.get(k) for k in SCORE_FIELDS},
+                    **{f"new_{k}": new[k] for k in SCORE_FIELDS},
+                })
+                updated_payloads.append(dict(
+                    payload, **new,
+                    matched_keywords=graded["matched_keywords"],
+                    essay_matches=graded["essay_matches"],
+                    regraded_at=datetime.now().isoformat(),
+                ))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if not dry_run:
+        if updated_payloads:
+            store.replace_many(updated_payloads)
+        # Also when no score changed: a new key can move per-question outcomes without changing totals.
+        update_stats(store, rebuild=True)
+        get_attempt_index().update(store, rebuild=True)
+
+    return {
+        "scanned": scanned,
+        "changed": len(changes),
+        "dry_run": dry_run,
+        "missing_packages": missing,
+        "changes": changes,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Regrade stored submissions against current packages.")
+    parser.add_argument("--subject", help="Only regrade this subject.")
+    parser.add_argument("--package", dest="package_id", help="Only regrade this package id.")
+    parser.add_argument("--workers", type=int, default=None, help="Essay worker processes (1 = inline).")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing them.")
+    parser.add_argument("--semantic-weight", type=float, default=None,
+                        help="Blend in semantic essay similarity (0 = keywords only; default QB_SEMANTIC_WEIGHT).")
+    parser.add_argument("--report", help="Write the full diff report to this JSON file.")
+    args = parser.parse_args(argv)
+
+    report = regrade(get_store(), subject=args.subject, package_id=args.package_id,
+                     workers=args.workers, dry_run=args.dry_run, semantic_weight=args.semantic_weight)
+
+    for change in report["changes"]:
+        print(
+            f"{change['submission_id']}: "
+            f"MCQ {change['old_mcq_score']}/{change['old_mcq_total']} -> {change['new_mcq_score']}/{change['new_mcq_total']}, "
+            f"essay {change['old_essay_score']}/{change['old_essay_total']} -> {change['new_essay_score']}/{change['new_essay_total']}, "
+            f"final {change['old_final_score']} -> {change['new_final_score']:.1f}"
+        )
+    for missing in report["missing_packages"]:
+        print(f"Skipped {missing}: package not found", file=sys.stderr)
+    action = "would change" if args.dry_run else "changed"
+    print(f"Regraded {report['scanned']} submissions; {report['changed']} {action}.")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
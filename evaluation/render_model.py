@@ -0,0 +1,60 @@
+"""
+Precompiled Take Test render model.
+
+Option labels, widget keys and default answers are built once per package
+version (keyed by the registry's content hash) and shared by every session,
+so a rerun never rebuilds `options_formatted` lists or splits labels.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from evaluation.mcq_evaluator import package_essays
+
+MAX_MODELS = 256
+
+_models: "OrderedDict[Tuple[str, str, str], Dict]" = OrderedDict()
+_models_lock = threading.Lock()
+
+
+def build_render_model(package: Dict) -> Dict:
+    """Everything the test UI needs, in display order."""
+    mcqs: List[Dict] = []
+    for q in package.get("mcqs", []) or []:
+        options = q.get("options", {}) or {}
+        keys = list(options)
+        mcqs.append({
+            "id": q["id"],
+            "title": f"Q: {q['question']}",
+            "keys": keys,
+            "labels": {key: f"{key}. {value}" for key, value in options.items()},
+        })
+
+    essays = [
+        {"id": essay["id"], "title": f"Essay {idx}: {essay['id']}", "prompt": essay.get("prompt", ""), "index": idx}
+        for idx, essay in enumerate(package_essays(package), start=1)
+    ]
+
+    return {
+        "mcqs": mcqs,
+        "essays": essays,
+        # Take Test has always pre-selected the first option of every MCQ.
+        "default_answers": {q["id"]: q["keys"][0] for q in mcqs if q["keys"]},
+    }
+
+
+def get_render_model(subject: str, package_id: str, version: str, package: Dict) -> Dict:
+    """Cached render model for one package version."""
+    key = (subject, package_id, version)
+    with _models_lock:
+        model = _models.get(key)
+        if model is not None:
+            _models.move_to_end(key)
+            return model
+
+    model = build_render_model(package)
+    with _models_lock:
+        _models[key] = model
+        while len(_models) > MAX_MODELS:
+            _models.popitem(last=False)
+    return model
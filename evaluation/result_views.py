@@ -0,0 +1,101 @@
+"""
+Rows shared by the result viewer pages.
+
+Each viewer shows the same facts about a stored submission (which option
+was chosen, which rubric keywords matched) in its own columns. The facts are
+computed here once per question; the pages only pick column names. Rows are
+plain dicts, so neither this module nor the pages need pandas: Streamlit
+renders lists of dicts directly and `rows_to_csv` writes the download.
+"""
+import csv
+import io
+from typing import Dict, List, NamedTuple
+
+from evaluation.essay_grader import find_matched_keywords, rubric_keywords
+from evaluation.mcq_evaluator import package_essays
+from storage.timing import timed
+
+
+class MCQReview(NamedTuple):
+    number: int
+    id: str
+    question: str
+    options: Dict[str, str]
+    user_key: str          # "-" when unanswered
+    correct_key: str       # "-" when the package has no key
+    is_correct: bool
+
+
+class EssayReview(NamedTuple):
+    number: int
+    id: str
+    prompt: str
+    expected: List[str]
+    matched: List[str]
+    response: str
+
+
+def submission_label(summary: Dict) -> str:
+    """Human-readable label for a submission in a selectbox."""
+    score = summary.get("final_score")
+    score_text = f"{score:.1f}/100" if score is not None else "unscored"
+    return f"{summary['timestamp'][:19].replace('T', ' ')} — {score_text}"
+
+
+def option_text(options: Dict[str, str], key: str) -> str:
+    return options.get(key, "-") if isinstance(options, dict) else "-"
+
+
+def preview(text: str, limit: int) -> str:
+    return text[:limit] + ("..." if len(text) > limit else "")
+
+
+@timed("result_views.mcq_review")
+def mcq_review(package: Dict, result: Dict) -> List[MCQReview]:
+    """One entry per MCQ; correctness is decided exactly as grading does."""
+    user_answers = result.get("user_answers", {}) or {}
+    return [
+        MCQReview(
+            number=i,
+            id=q["id"],
+            question=q["question"],
+            options=q.get("options", {}) or {},
+            user_key=user_answers.get(q["id"], "-"),
+            correct_key=q.get("correct_option", "-"),
+            is_correct=user_answers.get(q["id"]) == q.get("correct_option"),
+        )
+        for i, q in enumerate(package.get("mcqs", []) or [], 1)
+    ]
+
+
+@timed("result_views.essay_review")
+def essay_review(package: Dict, result: Dict) -> List[EssayReview]:
+    """One entry per essay; matched keywords reuse the stored match records."""
+    user_essays = result.get("user_essay_answers", {}) or {}
+    essay_matches = result.get("essay_matches", {}) or {}
+    rows = []
+    for i, essay in enumerate(package_essays(package), 1):
+        response = user_essays.get(essay["id"], "")
+        rows.append(EssayReview(
+            number=i,
+            id=essay["id"],
+            prompt=essay["prompt"],
+            expected=rubric_keywords(essay),
+            matched=find_matched_keywords(essay, response, essay_matches.get(essay["id"])),
+            response=response,
+        ))
+    return rows
+
+
+def rows_to_csv(*tables: List[Dict]) -> bytes:
+    """CSV of several row lists stacked; columns are the union, in first-seen order."""
+    columns: Dict[str, None] = {}
+    for rows in tables:
+        for row in rows:
+            columns.update(dict.fromkeys(row))
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=list(columns), restval="", lineterminator="\n")
+    writer.writeheader()
+    for rows in tables:
+        writer.writerows(rows)
+    return out.getvalue().encode("utf-8")
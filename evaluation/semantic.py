@@ -0,0 +1,239 @@
+"""
+Offline semantic essay scoring (TF-IDF / BM25 vectors, cosine similarity).
+
+Keyword grading only credits a criterion when its literal keyword appears.
+Here every auto-graded rubric criterion (its keyword plus description) and
+every essay prompt of a package becomes a TF-IDF vector over the package's
+own vocabulary. A response is vectorized the same way (BM25-saturated term
+frequencies by default) and compared with all criteria of its essay in one
+matrix product; a whole class's responses to an essay are one batch.
+
+The vectors are built once per package content and cached in memory and in
+.cache/semantic/<digest>.npz, so nothing is recomputed until a rubric or
+prompt changes. No network, model download or GPU is involved.
+
+Similarity is turned into partial credit between SIM_FLOOR and SIM_CEILING
+and blended with the keyword result per criterion:
+
+    credit = keyword_hit + weight * (1 - keyword_hit) * semantic_credit
+
+so a literal keyword match always keeps full credit, and weight 0 (the
+default, QB_SEMANTIC_WEIGHT, read by evaluation.grading) reproduces keyword
+grading exactly. Responses
+that barely relate to the essay prompt (below ON_TOPIC_MIN) get no semantic
+credit.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Sequence
+
+import numpy as np
+
+from evaluation.essay_grader import _keyword_criteria, get_rubric
+from storage.atomic import atomic_open
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+CACHE_DIR = BASE_DIR / ".cache" / "semantic"
+VECTORS_VERSION = 1
+
+DEFAULT_METHOD = os.getenv("QB_SEMANTIC_METHOD", "bm25")
+SIM_FLOOR = 0.05
+SIM_CEILING = 0.30
+ON_TOPIC_MIN = 0.01
+BM25_K1 = 1.2
+MAX_CACHED_PACKAGES = 256
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+_STOPWORDS = frozenset("""
+a about after all also an and any are as at be because been before being between both but by can
+could did do does each either for from had has have how however if in into is it its itself may might
+more most must no not of on only or other our should so such than that the their them then there
+these they this those through to under up very was we were what when where whether which while who
+why will with within would you your
+""".split())
+_SUFFIXES = ("ations", "ation", "ings", "ing", "ions", "ion", "ies", "es", "ed", "ly", "s")
+
+
+class SemanticScore(NamedTuple):
+    similarities: List[float]   # cosine similarity per auto-graded criterion
+    credits: List[float]        # 0..1 semantic credit per criterion
+    prompt_similarity: float
+
+
+# -------------------------------
+# TOKENIZATION
+# -------------------------------
+def _stem(token: str) -> str:
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[: -len(suffix)] + ("y" if suffix == "ies" else "")
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Case-folded, lightly stemmed word tokens without stopwords."""
+    folded = unicodedata.normalize("NFKC", text or "").casefold()
+    return [_stem(t) for t in _TOKEN_RE.findall(folded) if len(t) > 1 and t not in _STOPWORDS]
+
+
+def criterion_text(criterion: Dict) -> str:
+    return f"{criterion.get('keyword', '')} {criterion.get('description', '')}"
+
+
+# -------------------------------
+# PACKAGE VECTORS
+# -------------------------------
+class PackageVectors:
+    """Vocabulary, IDF and L2-normalized criterion/prompt vectors for one package's essays."""
+
+    def __init__(self, vocab: List[str], idf: np.ndarray, criteria: np.ndarray, prompts: np.ndarray,
+                 essay_ids: List[str], offsets: np.ndarray):
+        self.vocab = vocab
+        self.columns = {term: i for i, term in enumerate(vocab)}
+        self.idf = idf
+        self.criteria = criteria      # (n_criteria, V), rows grouped by essay
+        self.prompts = prompts        # (n_essays, V)
+        self.essay_ids = essay_ids
+        self.offsets = offsets        # criteria rows of essay i: offsets[i]:offsets[i + 1]
+        self.unseen_idf = float(np.log((len(criteria) + len(prompts) + 0.5) / 0.5 + 1))
+
+    @classmethod
+    def build(cls, essays: Sequence[Dict]) -> "PackageVectors":
+        essay_ids, offsets, documents = [], [0], []
+        prompt_docs = []
+        for essay in essays:
+            essay_ids.append(essay["id"])
+            criteria = _keyword_criteria(get_rubric(essay))
+            documents.extend(tokenize(criterion_text(c)) for c in criteria)
+            offsets.append(offsets[-1] + len(criteria))
+            prompt_docs.append(tokenize(essay.get("prompt", "")))
+
+        corpus = documents + prompt_docs
+        df = Counter(term for doc in corpus for term in set(doc))
+        vocab = sorted(df)
+        n_docs = max(len(corpus), 1)
+        idf = np.array([math.log((n_docs - df[t] + 0.5) / (df[t] + 0.5) + 1) for t in vocab], dtype=np.float32)
+        columns = {term: i for i, term in enumerate(vocab)}
+
+        def matrix(docs):
+            out = np.zeros((len(docs), len(vocab)), dtype=np.float32)
+            for row, doc in enumerate(docs):
+                for term, tf in Counter(doc).items():
+                    out[row, columns[term]] = (1 + math.log(tf)) * idf[columns[term]]
+            norms = np.linalg.norm(out, axis=1, keepdims=True)
+            return out / np.where(norms > 0, norms, 1)
+
+        return cls(vocab, idf, matrix(documents), matrix(prompt_docs), essay_ids,
+                   np.asarray(offsets, dtype=np.int64))
+
+    def response_matrix(self, texts: Sequence[str], method: str = DEFAULT_METHOD) -> np.ndarray:
+        """(n, V) vectors of responses; out-of-vocabulary terms only count towards the norm."""
+        out = np.zeros((len(texts), len(self.vocab)), dtype=np.float32)
+        norms = np.zeros(len(texts), dtype=np.float64)
+        for row, text in enumerate(texts):
+            norm_sq = 0.0
+            for term, tf in Counter(tokenize(text)).items():
+                if method == "tfidf":
+                    weight = 1 + math.log(tf)
+                else:  # BM25 term saturation; length is normalized by the cosine
+                    weight = tf * (BM25_K1 + 1) / (tf + BM25_K1)
+                col = self.columns.get(term)
+                weight *= self.idf[col] if col is not None else self.unseen_idf
+                if col is not None:
+                    out[row, col] = weight
+                norm_sq += weight * weight
+            norms[row] = math.sqrt(norm_sq)
+        return out / np.where(norms > 0, norms, 1)[:, None].astype(np.float32)
+
+    def score(self, essay_id: str, texts: Sequence[str], method: str = DEFAULT_METHOD) -> List[SemanticScore]:
+        """Similarity of every response to every criterion of one essay, in one batch."""
+        i = self.essay_ids.index(essay_id)
+        responses = self.response_matrix(texts, method)
+        sims = responses @ self.criteria[self.offsets[i]:self.offsets[i + 1]].T
+        on_topic = responses @ self.prompts[i]
+        credits = np.clip((sims - SIM_FLOOR) / (SIM_CEILING - SIM_FLOOR), 0.0, 1.0)
+        credits[on_topic < ON_TOPIC_MIN] = 0.0
+        return [
+            SemanticScore(sims[row].tolist(), credits[row].tolist(), float(on_topic[row]))
+            for row in range(len(texts))
+        ]
+
+    # ---------- disk cache ----------
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_open(path, "wb", fsync="none") as f:
+            np.savez(f, vocab=np.array(self.vocab, dtype=str), idf=self.idf, criteria=self.criteria,
+                     prompts=self.prompts, essay_ids=np.array(self.essay_ids, dtype=str), offsets=self.offsets)
+
+    @classmethod
+    def load(cls, path: Path) -> "PackageVectors":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["vocab"].tolist(), data["idf"], data["criteria"], data["prompts"],
+                       data["essay_ids"].tolist(), data["offsets"])
+
+
+def essays_digest(essays: Sequence[Dict]) -> str:
+    """Hash of everything the vectors depend on (prompts and auto-graded criteria)."""
+    key = [VECTORS_VERSION] + [
+        [essay["id"], essay.get("prompt", ""), [criterion_text(c) for c in _keyword_criteria(get_rubric(essay))]]
+        for essay in essays
+    ]
+    return hashlib.sha1(json.dumps(key, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+_vectors: "OrderedDict[str, PackageVectors]" = OrderedDict()
+_vectors_lock = threading.Lock()
+
+
+def get_vectors(essays: Sequence[Dict], cache_dir: Path = CACHE_DIR) -> PackageVectors:
+    """Vectors for a package's essays: memory, then .cache/semantic/, then built."""
+    digest = essays_digest(essays)
+    with _vectors_lock:
+        vectors = _vectors.get(digest)
+        if vectors is not None:
+            _vectors.move_to_end(digest)
+            return vectors
+
+    path = Path(cache_dir) / f"{digest}.npz"
+    try:
+        vectors = PackageVectors.load(path)
+    except (OSError, ValueError, KeyError):
+        vectors = PackageVectors.build(essays)
+        try:
+            vectors.save(path)
+        except OSError:
+            pass  # read-only checkout: keep the in-memory copy
+
+    with _vectors_lock:
+        _vectors[digest] = vectors
+        while len(_vectors) > MAX_CACHED_PACKAGES:
+            _vectors.popitem(last=False)
+    return vectors
+
+
+# -------------------------------
+# BLENDING
+# -------------------------------
+def blend(weights: Sequence[float], keyword_hits: Sequence[bool], credits: Sequence[float],
+          semantic_weight: float) -> float:
+    """Blended essay score: keyword hits keep full credit, the rest earn weighted semantic credit."""
+    return float(sum(
+        w * (1.0 if hit else semantic_weight * credit)
+        for w, hit, credit in zip(weights, keyword_hits, credits)
+    ))
+
+
+def score_batch(essays: Sequence[Dict], essay_id: str, texts: Sequence[str],
+                method: str = DEFAULT_METHOD) -> List[SemanticScore]:
+    """Semantic scores of many responses to one essay of a package."""
+    return get_vectors(essays).score(essay_id, texts, method)
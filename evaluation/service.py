@@ -0,0 +1,247 @@
+"""
+Local HTTP grading service.
+
+Grades batches of answer sheets without Streamlit, e.g. from an LMS export:
+
+    python -m evaluation.service --port 8765
+    curl -X POST localhost:8765/grade -d '{"subject": "machine_vision", "package_id": "package_20",
+                                            "user_answers": {"q1": "B"}}'
+    curl -X POST localhost:8765/grade -H 'Content-Type: application/x-ndjson' --data-binary @sheets.jsonl
+
+POST /grade takes one submission (a JSON object), a JSON array of them, or
+JSONL (one submission per line) and answers in the same shape, one result
+per submission in input order. A submission that cannot be graded gets
+`{"error": ...}` in its slot; the rest of the batch is still graded.
+Query parameters:
+    semantic_weight=<float>  blend in semantic essay credit (default QB_SEMANTIC_WEIGHT)
+    store=1                  also save the graded submissions, as Take Test does
+
+GET /health reports cache sizes; GET /packages lists the catalog.
+
+Requests are served by a thread per connection. Packages stay in the
+in-memory JSON cache and compiled rubrics in the rubric cache between
+requests, and each batch is graded per package (one answer matrix for the
+MCQs), so throughput comes from batching rather than from many tiny requests.
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from evaluation.attempts import update_attempts
+from evaluation.essay_grader import compile_rubric, get_rubric
+from evaluation.grading import grade_batch
+from evaluation.item_analysis import update_stats
+from evaluation.mcq_evaluator import package_essays
+from storage.loader import cache_stats, load_package
+from storage.registry import get_registry
+from storage.submissions import get_writer
+from storage.timing import span
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 64 * 1024 * 1024
+STORE_TIMEOUT = 30
+JSONL_TYPES = ("application/x-ndjson", "application/jsonl", "application/x-jsonlines", "application/ndjson")
+
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# -------------------------------
+# REQUEST BODIES
+# -------------------------------
+def parse_body(body: bytes, content_type: str = "") -> Tuple[List, str]:
+    """Submissions in a request body and the shape to answer in ("object", "array" or "jsonl")."""
+    text = body.decode("utf-8-sig")
+    if content_type.split(";")[0].strip().lower() not in JSONL_TYPES:
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            pass  # maybe JSONL sent as application/json
+        else:
+            if isinstance(data, list):
+                return data, "array"
+            return [data], "object"
+
+    submissions = []
+    for number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            submissions.append(json.loads(line))
+        except json.JSONDecodeError as exc:
+            raise RequestError(400, f"line {number}: {exc.msg}")
+    return submissions, "jsonl"
+
+
+def format_body(results: List[Dict], shape: str) -> Tuple[bytes, str]:
+    if shape == "jsonl":
+        text = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in results)
+        return text.encode("utf-8"), "application/x-ndjson"
+    data = results[0] if shape == "object" else results
+    return json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json"
+
+
+# -------------------------------
+# GRADING
+# -------------------------------
+def store_results(submissions: List[Dict], results: List[Dict]):
+    """Save graded submissions through the group-commit writer; adds `submission_id` to each result."""
+    writer = get_writer()
+    writer.add_commit_hook(update_stats)
+    writer.add_commit_hook(update_attempts)
+    pending = []
+    for submission, result in zip(submissions, results):
+        if "error" in result:
+            continue
+        result_data = {
+            "timestamp": submission.get("timestamp") or datetime.now().isoformat(),
+            "user_id": submission.get("user_id"),
+            "subject": submission["subject"],
+            "package_id": submission["package_id"],
+            **{k: v for k, v in result.items() if k != "ref"},
+            "user_answers": submission.get("user_answers", {}) or {},
+            "user_essay_answers": submission.get("user_essay_answers", {}) or {},
+        }
+        pending.append((result, writer.submit(result_data)))
+    for result, future in pending:
+        result["submission_id"] = future.result(timeout=STORE_TIMEOUT)
+
+
+def grade_request(submissions: List, semantic_weight=None, store: bool = False) -> List[Dict]:
+    with span("service.grade"):
+        results = grade_batch(submissions, semantic_weight)
+    for submission, result in zip(submissions, results):
+        if isinstance(submission, dict) and "ref" in submission:
+            result["ref"] = submission["ref"]
+    if store:
+        store_results(submissions, results)
+    return results
+
+
+def warm(subject: str = None) -> int:
+    """Load every package (optionally of one subject) and compile its rubrics; returns how many."""
+    loaded = 0
+    for entry in get_registry().entries(subject):
+        package = load_package(entry["subject"], entry["package_id"])
+        if package is None:
+            continue
+        for essay in package_essays(package):
+            compile_rubric(get_rubric(essay))
+        loaded += 1
+    return loaded
+
+
+# -------------------------------
+# HTTP
+# -------------------------------
+class GradingHandler(BaseHTTPRequestHandler):
+    server_version = "QuestionBankGrader/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, data):
+        self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            self._send_json(200, {"status": "ok", "package_cache": cache_stats()})
+        elif path == "/packages":
+            subject = parse_qs(urlparse(self.path).query).get("subject", [None])[0]
+            self._send_json(200, [
+                {"subject": e["subject"], "package_id": e["package_id"],
+                 "mcq_count": e.get("mcq_count"), "essay_count": e.get("essay_count")}
+                for e in get_registry().entries(subject)
+            ])
+        else:
+            self._send_json(404, {"error": f"unknown path {path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/grade":
+            self.close_connection = True  # body left unread
+            self._send_json(404, {"error": f"unknown path {url.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY_BYTES:
+                self.close_connection = True
+                raise RequestError(413, f"body larger than {MAX_BODY_BYTES} bytes")
+            submissions, shape = parse_body(self.rfile.read(length), self.headers.get("Content-Type", ""))
+            if not submissions:
+                raise RequestError(400, "no submissions in request body")
+
+            query = parse_qs(url.query)
+            weight = query.get("semantic_weight", [None])[0]
+            try:
+                weight = float(weight) if weight is not None else None
+            except ValueError:
+                raise RequestError(400, "semantic_weight must be a number")
+            store = query.get("store", ["0"])[0].lower() in ("1", "true", "yes")
+
+            body, content_type = format_body(grade_request(submissions, weight, store), shape)
+        except RequestError as exc:
+            self._send_json(exc.status, {"error": str(exc)})
+        except (UnicodeDecodeError, ValueError) as exc:
+            self._send_json(400, {"error": str(exc)})
+        except Exception as exc:
+            self._send_json(500, {"error": f"{type(exc).__name__}: {exc}"})
+        else:
+            self._send(200, body, content_type)
+
+
+class GradingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, quiet: bool = False):
+        self.quiet = quiet
+        super().__init__(address, GradingHandler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve batch grading over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--no-warm", action="store_true", help="Do not preload packages and rubrics at startup.")
+    parser.add_argument("--quiet", action="store_true", help="Do not log every request.")
+    args = parser.parse_args(argv)
+
+    if not args.no_warm:
+        started = time.perf_counter()
+        loaded = warm()
+        print(f"Loaded {loaded} packages in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+
+    server = GradingServer((args.host, args.port), quiet=args.quiet)
+    print(f"Grading on http://{args.host}:{server.server_address[1]}/grade", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Package generation, merging and validation tools."""
@@ -0,0 +1,311 @@
+"""
+Batch question generation for many PDFs.
+
+A batch job takes a set of lecture PDFs (uploads, or a folder on disk),
+queues one task per file and runs them on a bounded thread pool, so a course
+of 30 decks takes about as long as its slowest deck rather than the sum.
+Generation is I/O-bound once GPT generation is enabled, and PDF text
+extraction is cached by content hash (generators.extract_text), so threads
+are enough; saving goes through generate_package.write_package, which
+serializes the writes.
+
+Job state lives in .cache/batch_jobs/<job_id>/job.json and is rewritten on
+every status change. Uploaded PDFs are spooled next to it, so a job that
+was cancelled, or interrupted by a restart, can be resumed: finished files
+are skipped and everything else is queued again. A spooled PDF is deleted
+once its file is done, and jobs untouched for QB_BATCH_JOB_DAYS days (7 by
+default) are removed when the next job is created.
+
+    python -m generators.batch machine_vision lectures/ --workers 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from generators.generate_package import build_package, write_package
+from storage.atomic import atomic_write_bytes, atomic_write_json
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+JOBS_DIR = BASE_DIR / ".cache" / "batch_jobs"
+DEFAULT_WORKERS = 4
+MAX_WORKERS = 16
+JOB_MAX_AGE_DAYS = float(os.getenv("QB_BATCH_JOB_DAYS", 7))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+_jobs: Dict[str, "BatchJob"] = {}
+_jobs_lock = threading.Lock()
+
+
+def package_id_for(name: str, prefix: str = "") -> str:
+    """Package id from a PDF file name: 'Lecture 03 - Optics.pdf' -> 'lecture_03_optics'."""
+    stem = re.sub(r"[^0-9a-zA-Z]+", "_", Path(name).stem).strip("_").lower() or "package"
+    return f"{prefix}{stem}"
+
+
+class BatchJob:
+    """One batch of PDFs for one subject, persisted after every status change."""
+
+    def __init__(self, state: Dict, job_dir: Path):
+        self.state = state
+        self.job_dir = Path(job_dir)
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures = []
+
+    @property
+    def job_id(self) -> str:
+        return self.state["job_id"]
+
+    # ---------- persistence ----------
+    def _save(self):
+        atomic_write_json(self.job_dir / "job.json", self.state, indent=2)
+
+    def _update(self, index: int, **fields):
+        with self._lock:
+            self.state["files"][index].update(fields)
+            self._save()
+
+    @classmethod
+    def create(cls, subject: str, level: str, sources: Iterable[Tuple[str, object]],
+               prefix: str = "", jobs_dir: Path = JOBS_DIR) -> "BatchJob":
+        """`sources` yields (file name, PDF bytes or path to a PDF on disk)."""
+        job_id = f"{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:6]}"
+        job_dir = Path(jobs_dir) / job_id
+        job_dir.mkdir(parents=True, exist_ok=True)
+
+        files, used_ids = [], set()
+        for name, source in sources:
+            if isinstance(source, (bytes, bytearray)):
+                # Uploads are spooled so the job can be resumed after a restart.
+                digest = hashlib.sha256(source).hexdigest()
+                path = job_dir / f"{digest}.pdf"
+                atomic_write_bytes(path, source)
+            else:
+                path = Path(source).resolve()
+            package_id = package_id_for(name, prefix)
+            candidate, n = package_id, 2
+            while candidate in used_ids:
+                candidate, n = f"{package_id}_{n}", n + 1
+            used_ids.add(candidate)
+            files.append({"name": name, "path": str(path), "package_id": candidate, "status": QUEUED,
+                          "error": None, "seconds": None, "questions": None, "near_duplicates": None})
+
+        job = cls({"job_id": job_id, "subject": subject, "level": level,
+                   "created_at": datetime.now().isoformat(), "files": files}, job_dir)
+        job._save()
+        return job
+
+    @classmethod
+    def load(cls, job_dir: Path) -> "BatchJob":
+        with open(Path(job_dir) / "job.json", "r", encoding="utf-8") as f:
+            state = json.load(f)
+        # Files that were running when the process stopped start over.
+        for entry in state["files"]:
+            if entry["status"] == RUNNING:
+                entry["status"] = QUEUED
+        return cls(state, job_dir)
+
+    # ---------- execution ----------
+    def _run_file(self, index: int):
+        if self._cancel.is_set():
+            self._update(index, status=CANCELLED)
+            return
+        entry = self.state["files"][index]
+        self._update(index, status=RUNNING, error=None)
+        start = time.perf_counter()
+        try:
+            pdf_bytes = Path(entry["path"]).read_bytes()
+            data = build_package(pdf_bytes, entry["package_id"], entry["name"],
+                                 self.state["level"], self.state["subject"])
+            _, report = write_package(data, self.state["subject"], entry["package_id"])
+        except Exception as exc:  # one bad deck must not stop the batch
+            self._update(index, status=FAILED, error=f"{type(exc).__name__}: {exc}",
+                         seconds=time.perf_counter() - start)
+            return
+        questions = len(data.get("mcqs", []) or []) + len(data.get("essay", []) or [])
+        self._update(index, status=DONE, seconds=time.perf_counter() - start,
+                     questions=questions, near_duplicates=len(report))
+        self._release_spool(entry["path"])
+
+    def _release_spool(self, path: str):
+        """Delete a spooled upload once no unfinished file of this job still needs it."""
+        if Path(path).parent != self.job_dir:
+            return  # a PDF from a folder on disk, not ours to delete
+        with self._lock:
+            needed = any(entry["path"] == path and entry["status"] != DONE for entry in self.state["files"])
+        if not needed:
+            Path(path).unlink(missing_ok=True)
+
+    def start(self, workers: int = DEFAULT_WORKERS) -> int:
+        """Queue every unfinished file (failed and cancelled ones included); returns how many."""
+        if self.is_running():
+            return 0
+        self._cancel.clear()
+        pending = [i for i, entry in enumerate(self.state["files"]) if entry["status"] != DONE]
+        with self._lock:
+            for i in pending:
+                self.state["files"][i]["status"] = QUEUED
+            self._save()
+        if not pending:
+            return 0
+        workers = max(1, min(int(workers), MAX_WORKERS, len(pending)))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"batch-{self.job_id}")
+        self._futures = [self._executor.submit(self._run_file, i) for i in pending]
+        # Queued tasks still run; the pool's threads exit once the queue is empty.
+        self._executor.shutdown(wait=False)
+        return len(pending)
+
+    def cancel(self):
+        """Stop queued files; files already running finish normally."""
+        self._cancel.set()
+        for future in self._futures:
+            future.cancel()
+        with self._lock:
+            for entry in self.state["files"]:
+                if entry["status"] == QUEUED:
+                    entry["status"] = CANCELLED
+            self._save()
+
+    def is_running(self) -> bool:
+        return any(not future.done() for future in self._futures)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued file finished; False on timeout."""
+        _, not_done = wait(self._futures, timeout=timeout)
+        return not not_done
+
+    def progress(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+            for entry in self.state["files"]:
+                counts[entry["status"]] += 1
+        counts["total"] = len(self.state["files"])
+        return counts
+
+    def files(self) -> List[Dict]:
+        with self._lock:
+            return [dict(entry) for entry in self.state["files"]]
+
+
+# -------------------------------
+# JOB REGISTRY
+# -------------------------------
+def create_job(subject: str, level: str, sources: Iterable[Tuple[str, object]], prefix: str = "",
+               workers: int = DEFAULT_WORKERS, jobs_dir: Path = JOBS_DIR) -> BatchJob:
+    """Create, register and start a batch job."""
+    expire_jobs(jobs_dir=jobs_dir)
+    job = BatchJob.create(subject, level, sources, prefix, jobs_dir)
+    with _jobs_lock:
+        _jobs[job.job_id] = job
+    job.start(workers)
+    return job
+
+
+def get_job(job_id: str, jobs_dir: Path = JOBS_DIR) -> Optional[BatchJob]:
+    """The live job object, or the persisted one (e.g. after a restart)."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None and (Path(jobs_dir) / job_id / "job.json").exists():
+            job = _jobs[job_id] = BatchJob.load(Path(jobs_dir) / job_id)
+        return job
+
+
+def unfinished_jobs(jobs_dir: Path = JOBS_DIR) -> List[BatchJob]:
+    """Jobs with files that are not done and no worker running: candidates for resuming."""
+    jobs = []
+    if not Path(jobs_dir).exists():
+        return jobs
+    for job_dir in sorted(Path(jobs_dir).iterdir(), reverse=True):
+        if not (job_dir / "job.json").exists():
+            continue
+        job = get_job(job_dir.name, jobs_dir)
+        if job and not job.is_running() and job.progress()[DONE] < job.progress()["total"]:
+            jobs.append(job)
+    return jobs
+
+
+def expire_jobs(max_age_days: float = JOB_MAX_AGE_DAYS, jobs_dir: Path = JOBS_DIR) -> List[str]:
+    """Delete jobs (state and spooled PDFs) not updated for `max_age_days`; returns their ids."""
+    expired = []
+    if not Path(jobs_dir).exists():
+        return expired
+    cutoff = time.time() - max_age_days * 86400
+    for job_dir in Path(jobs_dir).iterdir():
+        stamp = job_dir / "job.json" if (job_dir / "job.json").exists() else job_dir
+        try:
+            if not job_dir.is_dir() or stamp.stat().st_mtime >= cutoff:
+                continue
+        except OSError:
+            continue
+        with _jobs_lock:
+            job = _jobs.get(job_dir.name)
+            if job is not None and job.is_running():
+                continue
+            _jobs.pop(job_dir.name, None)
+        shutil.rmtree(job_dir, ignore_errors=True)
+        expired.append(job_dir.name)
+    return expired
+
+
+def pdfs_in_folder(folder) -> List[Tuple[str, Path]]:
+    return [(path.name, path) for path in sorted(Path(folder).glob("*.pdf"))]
+
+
+# -------------------------------
+# CLI
+# -------------------------------
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate packages for every PDF in a folder.")
+    parser.add_argument("subject", nargs="?")
+    parser.add_argument("folder", nargs="?")
+    parser.add_argument("--level", default="undergraduate")
+    parser.add_argument("--prefix", default="", help="package id prefix")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--resume", metavar="JOB_ID", help="resume an unfinished job")
+    args = parser.parse_args(argv)
+
+    if args.resume:
+        job = get_job(args.resume)
+        if job is None:
+            parser.error(f"unknown job {args.resume}")
+        job.start(args.workers)
+    elif args.subject and args.folder:
+        job = create_job(args.subject, args.level, pdfs_in_folder(args.folder), args.prefix, args.workers)
+    else:
+        parser.error("give SUBJECT FOLDER or --resume JOB_ID")
+
+    print(f"Job {job.job_id}: {job.progress()['total']} file(s)")
+    try:
+        while not job.wait(timeout=0.5):
+            pass
+    except KeyboardInterrupt:
+        job.cancel()
+        print(f"Cancelled; resume with --resume {job.job_id}")
+    for entry in job.files():
+        if entry["status"] == DONE:
+            detail = f"{entry['questions']} questions in {entry['seconds']:.1f}s"
+        else:
+            detail = entry["error"] or ""
+        print(f"{entry['status']:>9}  {entry['name']} -> {entry['package_id']}  {detail}")
+    return 0 if job.progress()[DONE] == job.progress()["total"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+"""
+Bulk MCQ import from pasted text or .txt/.md/.csv files.
+
+Input is read line by line and parsed one question block at a time, so a
+file with thousands of questions is never split into a list of strings or
+held in the page's session state. Text blocks look like:
+
+    12. Which lens setting doubles the exposure? [hard]
+    A) f/8 -> f/5.6
+    B) f/8 -> f/11
+    C) 1/125 s -> 1/250 s
+    D. ISO 200 -> ISO 100
+    Answer: A
+    Objective: Relate f-number and exposure
+    Slides: 12, 13
+
+Blocks are separated by blank lines (or `---`), or start at the next
+numbered question. The answer comes from an `Answer:` line or from a `*`,
+`✓` or `(correct)` mark on an option; difficulty from a `Difficulty:` line
+or an `[easy]` / `[medium]` / `[hard]` tag. Unlabelled options are lettered
+A, B, C, ... in order, as in the single-question builder. CSV files need a
+header with `question`, option columns `A`..`H` (or `option_a`..), and
+`answer`; `difficulty`, `learning_objective`, `slide_refs` and `id` are
+optional.
+
+Imported questions are written through generate_package.write_package, so
+they are validated and land in the registry, the search index and the
+duplicate index like any other saved package.
+
+    python -m generators.bulk_import machine_vision old_exams exams_2014.txt
+"""
+import argparse
+import csv
+import io
+import re
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+from uuid import uuid4
+
+from generators.generate_package import DB_DIR, write_package
+from storage.loader import load_json, thaw
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+DIFFICULTIES = ("easy", "medium", "hard")
+OPTION_LABELS = "ABCDEFGH"
+LEGACY_OPTION_LABELS = "ABCDE"
+
+_NUMBERED_RE = re.compile(r"^(?:q(?:uestion)?\s*)?\d+\s*[.):]\s+", re.I)
+_QUESTION_PREFIX_RE = re.compile(r"^(?:q(?:uestion)?\s*\d*\s*[.):]|\d+\s*[.):])\s*", re.I)
+_OPTION_RE = re.compile(r"^(\*\s*)?[(\[]?([A-Ha-h])[)\].:]\s+(.+)$")
+_ANSWER_RE = re.compile(r"^(?:answer|ans|correct(?:\s+option)?|key)\s*[:=-]\s*[(\[]?([A-Ha-h])\b", re.I)
+_DIFFICULTY_RE = re.compile(r"^difficulty\s*[:=-]\s*(\w+)", re.I)
+_DIFFICULTY_TAG_RE = re.compile(r"\s*\[(easy|medium|hard)\]", re.I)
+_OBJECTIVE_RE = re.compile(r"^(?:learning\s+objective|objective|lo)\s*[:=-]\s*(.+)$", re.I)
+_SLIDES_RE = re.compile(r"^(?:slides?|slide\s+refs?)\s*[:=-]\s*(.+)$", re.I)
+_CORRECT_MARK_RE = re.compile(r"\s*(?:\*|✓|✔|\(correct\))$", re.I)
+_SEPARATOR_RE = re.compile(r"^(?:-{3,}|={3,}|\*{3,})$")
+
+
+class ParsedMCQ(NamedTuple):
+    """One parsed block: the question (None if unusable) and what was wrong with it."""
+    line: int
+    mcq: Optional[Dict]
+    problems: List[str]
+    excerpt: str
+
+
+# -------------------------------
+# TEXT FORMAT
+# -------------------------------
+def iter_blocks(lines: Iterable[str]) -> Iterator[Tuple[int, List[str]]]:
+    """(first line number, stripped lines) per question block."""
+    block: List[str] = []
+    start = 0
+    has_options = False
+    for number, raw in enumerate(lines, 1):
+        line = raw.strip()
+        if not line or _SEPARATOR_RE.match(line):
+            # A blank line between the question and its options does not end the block.
+            if block and (has_options or _SEPARATOR_RE.match(line)):
+                yield start, block
+                block, has_options = [], False
+            continue
+        if block and has_options and _NUMBERED_RE.match(line) and not _OPTION_RE.match(line):
+            yield start, block
+            block, has_options = [], False
+        if not block:
+            start = number
+        block.append(line)
+        has_options = has_options or bool(_OPTION_RE.match(line)) or len(block) > 1
+    if block:
+        yield start, block
+
+
+def _slide_refs(text: str) -> List[int]:
+    return [int(part) for part in re.split(r"[,;\s]+", text) if part.isdigit()]
+
+
+def _difficulty(value: str, problems: List[str]) -> Optional[str]:
+    value = value.strip().lower()
+    if value in DIFFICULTIES:
+        return value
+    if value:
+        problems.append(f"unknown difficulty '{value}'")
+    return None
+
+
+def parse_block(lines: List[str], default_difficulty: str = "medium") -> Tuple[Optional[Dict], List[str]]:
+    """Parse one block into an MCQ dict (without an id) and a list of problems."""
+    problems: List[str] = []
+    answer = difficulty = None
+    objective, slides = "", []
+    body = []
+    for line in lines:
+        if match := _ANSWER_RE.match(line):
+            answer = match.group(1).upper()
+        elif match := _DIFFICULTY_RE.match(line):
+            difficulty = _difficulty(match.group(1), problems) or difficulty
+        elif match := _OBJECTIVE_RE.match(line):
+            objective = match.group(1).strip()
+        elif match := _SLIDES_RE.match(line):
+            slides = _slide_refs(match.group(1))
+        else:
+            body.append(line)
+
+    question_lines, options, marked = [], {}, []
+    labelled = any(_OPTION_RE.match(line) for line in body[1:])
+    last_label = None
+    for i, line in enumerate(body):
+        match = _OPTION_RE.match(line) if labelled and i else None
+        if match:
+            star, label, text = match.groups()
+            label = label.upper()
+        elif not labelled and i:
+            if len(options) >= len(LEGACY_OPTION_LABELS):
+                problems.append(f"more than {len(LEGACY_OPTION_LABELS)} unlabelled options")
+                break
+            star, label, text = None, LEGACY_OPTION_LABELS[len(options)], line
+        elif last_label is not None:
+            options[last_label] += " " + line  # wrapped option text
+            continue
+        else:
+            question_lines.append(line)
+            continue
+        if label in options:
+            problems.append(f"option {label} appears twice")
+        unmarked = _CORRECT_MARK_RE.sub("", text)
+        if star or unmarked != text:
+            marked.append(label)
+        options[label] = unmarked.strip().rstrip(".")
+        last_label = label
+
+    question = " ".join(question_lines)
+    question = _QUESTION_PREFIX_RE.sub("", question, count=1)
+    if match := _DIFFICULTY_TAG_RE.search(question):
+        difficulty = difficulty or match.group(1).lower()
+        question = _DIFFICULTY_TAG_RE.sub("", question)
+    question = question.strip()
+
+    if not question:
+        problems.append("no question text")
+    if len(options) < 2:
+        problems.append("fewer than two options")
+    if answer is None:
+        if len(marked) == 1:
+            answer = marked[0]
+        elif marked:
+            problems.append(f"several options marked correct ({', '.join(marked)})")
+        else:
+            problems.append("no answer marked")
+    elif answer not in options:
+        problems.append(f"answer {answer} is not one of the options")
+
+    mcq = {
+        "question": question,
+        "options": options,
+        "correct_option": answer,
+        "difficulty": difficulty or default_difficulty,
+        "learning_objective": objective,
+        "slide_refs": slides,
+    }
+    return (None if problems else mcq), problems
+
+
+def iter_text(lines: Iterable[str], default_difficulty: str = "medium") -> Iterator[ParsedMCQ]:
+    for start, block in iter_blocks(lines):
+        mcq, problems = parse_block(block, default_difficulty)
+        yield ParsedMCQ(start, mcq, problems, block[0][:120])
+
+
+# -------------------------------
+# CSV FORMAT
+# -------------------------------
+def _option_column(name: str) -> Optional[str]:
+    name = name.strip().lower()
+    for prefix in ("option_", "option ", "opt_", ""):
+        if name.startswith(prefix) and len(name) == len(prefix) + 1 and name[-1].upper() in OPTION_LABELS:
+            return name[-1].upper()
+    return None
+
+
+def iter_csv(lines: Iterable[str], default_difficulty: str = "medium") -> Iterator[ParsedMCQ]:
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if not header:
+        return
+    columns = {name.strip().lower(): i for i, name in enumerate(header)}
+    option_columns = [(label, i) for i, name in enumerate(header) if (label := _option_column(name))]
+
+    def cell(row, *names):
+        for name in names:
+            i = columns.get(name)
+            if i is not None and i < len(row):
+                return row[i].strip()
+        return ""
+
+    for row in reader:
+        if not any(value.strip() for value in row):
+            continue
+        problems: List[str] = []
+        options = {label: row[i].strip() for label, i in option_columns if i < len(row) and row[i].strip()}
+        answer = cell(row, "answer", "correct_option", "correct").upper()[:1] or None
+        difficulty = _difficulty(cell(row, "difficulty"), problems) or default_difficulty
+        question = cell(row, "question")
+        if not question:
+            problems.append("no question text")
+        if len(options) < 2:
+            problems.append("fewer than two options")
+        if answer is None:
+            problems.append("no answer marked")
+        elif answer not in options:
+            problems.append(f"answer {answer} is not one of the options")
+        mcq = {
+            "question": question,
+            "options": options,
+            "correct_option": answer,
+            "difficulty": difficulty,
+            "learning_objective": cell(row, "learning_objective", "objective"),
+            "slide_refs": _slide_refs(cell(row, "slide_refs", "slides")),
+        }
+        if cell(row, "id"):
+            mcq = {"id": cell(row, "id"), **mcq}
+        yield ParsedMCQ(reader.line_num, None if problems else mcq, problems, question[:120] or ",".join(row)[:120])
+
+
+# -------------------------------
+# ENTRY POINTS
+# -------------------------------
+def iter_mcqs(source, fmt: str = "text", default_difficulty: str = "medium") -> Iterator[ParsedMCQ]:
+    """Stream ParsedMCQ entries from text (`fmt="text"`, also .md) or CSV (`fmt="csv"`).
+
+    `source` is pasted text, bytes, a binary file object (e.g. an upload) or a
+    Path; files are decoded lazily, line by line.
+    """
+    parse = iter_csv if fmt == "csv" else iter_text
+    if isinstance(source, str):
+        yield from parse(io.StringIO(source), default_difficulty)
+    elif isinstance(source, Path):
+        with open(source, "r", encoding="utf-8-sig", errors="replace", newline="") as f:
+            yield from parse(f, default_difficulty)
+    else:
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        source.seek(0)
+        lines = io.TextIOWrapper(source, encoding="utf-8-sig", errors="replace", newline="")
+        try:
+            yield from parse(lines, default_difficulty)
+        finally:
+            lines.detach()  # leave the caller's file object open
+
+
+def format_for(file_name: str) -> str:
+    return "csv" if file_name.lower().endswith(".csv") else "text"
+
+
+def duplicate_groups(mcqs: List[Dict]) -> List[List[int]]:
+    """Near-duplicate clusters (positions in `mcqs`) within one import."""
+    from generators.dedup import find_duplicates
+
+    return find_duplicates(enumerate(mcqs))
+
+
+def _existing_package(subject: str, package_id: str) -> Optional[Dict]:
+    path = DB_DIR / subject / package_id / "package.json"
+    try:
+        data = load_json(path)
+    except (OSError, ValueError):
+        return None
+    return thaw(data) if isinstance(data, dict) else None
+
+
+def assign_ids(mcqs: List[Dict], package_id: str, used: Set[str]) -> List[Dict]:
+    """Give every MCQ a unique `<package_id>_mcq_<hex>` id, keeping unique given ids."""
+    out = []
+    for mcq in mcqs:
+        qid = mcq.get("id")
+        while not qid or qid in used:
+            qid = f"{package_id}_mcq_{uuid4().hex[:6]}"
+        used.add(qid)
+        out.append({"id": qid, **{k: v for k, v in mcq.items() if k != "id"}})
+    return out
+
+
+def import_mcqs(mcqs: List[Dict], subject: str, package_id: str, source: str = "", level: str = "",
+                replace: bool = False) -> Tuple[Path, Dict, int]:
+    """Append (or, with replace=True, replace) MCQs in a package and save it.
+
+    Only the `mcqs` list changes; essays, notes and every other field of an
+    existing package are kept. Returns the package path, the near-duplicate
+    report and the number of questions added. Raises InvalidPackageError if
+    the result fails validation.
+    """
+    data = _existing_package(subject, package_id) or {"package_id": package_id, "source": source, "level": level}
+    if replace or not data.get("mcqs"):
+        data["mcqs"] = []
+    if source and not data.get("source"):
+        data["source"] = source
+    if level and not data.get("level"):
+        data["level"] = level
+    used = {q["id"] for q in data["mcqs"] if isinstance(q, dict) and "id" in q}
+    added = assign_ids(mcqs, package_id, used)
+    data["mcqs"] = list(data["mcqs"]) + added
+    path, report = write_package(data, subject, package_id)
+    return path, report, len(added)
+
+
+# -------------------------------
+# CLI
+# -------------------------------
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import MCQs from .txt/.md/.csv files into a package.")
+    parser.add_argument("subject")
+    parser.add_argument("package_id")
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument("--level", default="")
+    parser.add_argument("--difficulty", default="medium", choices=DIFFICULTIES,
+                        help="difficulty for questions without a tag")
+    parser.add_argument("--replace", action="store_true", help="replace the package's MCQs instead of appending")
+    parser.add_argument("--dry-run", action="store_true", help="parse and report only")
+    args = parser.parse_args(argv)
+
+    mcqs, failed = [], 0
+    for path in args.files:
+        for item in iter_mcqs(path, format_for(path.name), args.difficulty):
+            if item.mcq is None:
+                failed += 1
+                print(f"{path}:{item.line}: {'; '.join(item.problems)}  [{item.excerpt}]")
+            else:
+                mcqs.append(item.mcq)
+    print(f"Parsed {len(mcqs)} question(s), {failed} block(s) skipped")
+    for group in duplicate_groups(mcqs):
+        print("Near-duplicates within the import: " + ", ".join(f"#{i + 1}" for i in group))
+    if args.dry_run or not mcqs:
+        return 1 if failed else 0
+    source = ", ".join(path.name for path in args.files)
+    path, report, added = import_mcqs(mcqs, args.subject, args.package_id, source, args.level, args.replace)
+    print(f"Added {added} question(s) to {path}; {len(report)} near-duplicate(s) of existing questions")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,415 @@
+"""
+Near-duplicate question detection (MinHash + LSH).
+
+Question and option text is normalized (NFKC, casefolded, punctuation
+stripped) and split into word unigram/bigram shingles; options are sorted
+so reordered choices still match. Each question gets a 128-value MinHash
+signature (one-permutation hashing, vectorized in NumPy), and LSH banding puts
+similar signatures in the same bucket, so candidate pairs are found in
+roughly linear time instead of comparing every pair. Candidates are kept
+when their estimated Jaccard similarity reaches the threshold, and
+connected pairs form duplicate clusters.
+
+    python -m generators.dedup                       # whole database/
+    python -m generators.dedup merged_machine_vision_exams.json
+"""
+import argparse
+import json
+import re
+import threading
+import unicodedata
+import zlib
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from storage.loader import load_json
+from storage.registry import get_registry
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+NUM_PERM = 128
+BANDS = 32  # 4 rows per band: pairs above ~0.45 Jaccard usually share a bucket
+DEFAULT_THRESHOLD = 0.7
+# Candidate pairs verified per NumPy batch when clustering.
+BATCH_PAIRS = 50_000
+
+_rng = np.random.RandomState(1)
+_MIX1, _MIX2 = (_rng.randint(0, 2 ** 62, size=2, dtype=np.int64).astype(np.uint64) << np.uint64(1)) | np.uint64(1)
+_BIN_SHIFT = np.uint64(64 - int(np.log2(NUM_PERM)))
+_EMPTY = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint32)
+# Per-row multipliers that fold each band of a signature into one uint64 bucket key.
+_BAND_MIX = _rng.randint(0, 2 ** 62, size=NUM_PERM, dtype=np.int64).astype(np.uint64) | np.uint64(1)
+# Added per bin of distance when an empty bin borrows a neighbour's value.
+_ROTATION = np.uint32(0x9E3779B1)
+
+_PUNCT_RE = re.compile(r"[^\w\s]+", re.UNICODE)
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", str(text)).casefold()
+    return " ".join(_PUNCT_RE.sub(" ", text).split())
+
+
+def item_text(item: Dict) -> str:
+    """Text that identifies a question: MCQ stem plus sorted options, or an essay prompt."""
+    if "question" in item:
+        options = item.get("options", {})
+        values = sorted(normalize_text(v) for v in options.values()) if isinstance(options, dict) else []
+        return " ".join([normalize_text(item.get("question", ""))] + values)
+    return normalize_text(item.get("prompt", ""))
+
+
+def shingles(text: str) -> np.ndarray:
+    """CRC32 hashes of the word unigrams and bigrams of normalized text."""
+    words = text.split()
+    grams = set(words)
+    grams.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """64-bit finalizer so the bin (top bits) and value (low bits) are independent."""
+    with np.errstate(over="ignore"):
+        h = values * _MIX1
+        h ^= h >> np.uint64(29)
+        h *= _MIX2
+        h ^= h >> np.uint64(32)
+    return h
+
+
+def signatures(texts: List[str]) -> np.ndarray:
+    """MinHash signatures, one row per text (rows of empty texts never match).
+
+    One-permutation hashing: each shingle is hashed once and lands in one of
+    NUM_PERM bins, a bin keeps its minimum, and empty bins borrow the next
+    non-empty bin's value (rotation densification). Cost is linear in the
+    number of shingles instead of shingles x permutations.
+    """
+    n = len(texts)
+    out = np.tile(_EMPTY, (n, 1))
+    hashed = [shingles(t) for t in texts]
+    lengths = np.fromiter((len(h) for h in hashed), dtype=np.int64, count=n)
+    if not lengths.sum():
+        return out
+
+    h = _mix(np.concatenate(hashed))
+    rows = np.repeat(np.arange(n), lengths)
+    bins = (h >> _BIN_SHIFT).astype(np.int64)
+    np.minimum.at(out.reshape(-1), rows * NUM_PERM + bins, (h & np.uint64(0xFFFFFFFF)).astype(np.uint32))
+
+    # Densify: bin j of a row takes the first filled bin at j + t (circularly), plus t * _ROTATION.
+    filled = out != _EMPTY
+    doubled = np.concatenate([filled, filled], axis=1)
+    positions = np.where(doubled, np.arange(2 * NUM_PERM), 4 * NUM_PERM)
+    nearest = np.minimum.accumulate(positions[:, ::-1], axis=1)[:, ::-1][:, :NUM_PERM]
+    distance = nearest - np.arange(NUM_PERM)
+    has_any = filled.any(axis=1)
+    source = np.take_along_axis(out, np.where(has_any[:, None], nearest % NUM_PERM, 0), axis=1)
+    with np.errstate(over="ignore"):
+        dense = source + distance.astype(np.uint32) * _ROTATION
+    out[has_any] = dense[has_any]
+    return out
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent: Dict = {}
+
+    def find(self, x):
+        self.parent.setdefault(x, x)
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[rb] = ra
+
+
+def band_keys(sigs: np.ndarray, bands: int = BANDS) -> np.ndarray:
+    """One uint64 LSH bucket key per (signature, band)."""
+    rows = NUM_PERM // bands
+    mixed = sigs.astype(np.uint64) * _BAND_MIX
+    return mixed.reshape(len(sigs), bands, rows).sum(axis=2, dtype=np.uint64)
+
+
+class DuplicateIndex:
+    """Incremental MinHash/LSH index of question texts keyed by arbitrary ids.
+
+    Signatures and band keys live in growable NumPy arrays: a query compares
+    its band keys against every row in one vectorized pass, and clustering
+    groups equal band keys with a sort per band.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, bands: int = BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self._keys: List[Hashable] = []
+        self._positions: Dict[Hashable, int] = {}
+        self._sigs = np.empty((0, NUM_PERM), dtype=np.uint32)
+        self._band_keys = np.empty((0, bands), dtype=np.uint64)
+        self._alive = np.empty(0, dtype=bool)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _grow(self, needed: int):
+        capacity = max(2 * len(self._alive), needed, 1024)
+        for name in ("_sigs", "_band_keys", "_alive"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(self._keys)] = old[:len(self._keys)]
+            setattr(self, name, new)
+
+    def add_many(self, items: Iterable[Tuple[Hashable, str]]):
+        """Index (key, normalized text) pairs; re-adding a key replaces it."""
+        items = list(items)
+        if not items:
+            return
+        sigs = signatures([text for _, text in items])
+        keys = band_keys(sigs, self.bands)
+        nonempty = ~(sigs == _EMPTY).all(axis=1)
+        with self._lock:
+            base = len(self._keys)
+            stop = base + len(items)
+            if stop > len(self._alive):
+                self._grow(stop)
+            self._sigs[base:stop] = sigs
+            self._band_keys[base:stop] = keys
+            self._alive[base:stop] = nonempty
+            for offset, (key, _) in enumerate(items):
+                old = self._positions.get(key)
+                if old is not None:
+                    self._alive[old] = False
+                self._keys.append(key)
+                self._positions[key] = base + offset
+
+    def remove(self, keys: Iterable[Hashable]):
+        with self._lock:
+            for key in keys:
+                pos = self._positions.pop(key, None)
+                if pos is not None:
+                    self._alive[pos] = False
+
+    def query(self, text: str, exclude=()) -> List[Tuple[Hashable, float]]:
+        """Indexed keys whose estimated Jaccard similarity to `text` reaches the threshold."""
+        sig = signatures([text])
+        if (sig == _EMPTY).all():
+            return []
+        keys = band_keys(sig, self.bands)[0]
+        excluded = set(exclude)
+        with self._lock:
+            n = len(self._keys)
+            candidates = np.flatnonzero((self._band_keys[:n] == keys).any(axis=1) & self._alive[:n])
+            sims = np.count_nonzero(self._sigs[candidates] == sig[0], axis=1) / NUM_PERM
+            hits = [
+                (self._keys[p], float(s)) for p, s in zip(candidates.tolist(), sims.tolist())
+                if s >= self.threshold and self._keys[p] not in excluded
+            ]
+        return sorted(hits, key=lambda hit: -hit[1])
+
+    def query_many(self, texts: List[str]) -> List[List[Tuple[Hashable, float]]]:
+        """`query` for many texts at once (e.g. a bulk import).
+
+        Candidates come from a sorted join per band (searchsorted against the
+        index's sorted band keys) instead of one full scan per text.
+        """
+        results: List[List[Tuple[Hashable, float]]] = [[] for _ in texts]
+        if not texts:
+            return results
+        sigs = signatures(list(texts))
+        qkeys = band_keys(sigs, self.bands)
+        empty = (sigs == _EMPTY).all(axis=1)
+        with self._lock:
+            n = len(self._keys)
+            live = np.flatnonzero(self._alive[:n])
+            pairs = []
+            for band in range(self.bands):
+                order = np.argsort(self._band_keys[live, band])
+                ordered = self._band_keys[live[order], band]
+                lo = np.searchsorted(ordered, qkeys[:, band], "left")
+                counts = np.searchsorted(ordered, qkeys[:, band], "right") - lo
+                total = int(counts.sum())
+                if not total:
+                    continue
+                query = np.repeat(np.arange(len(texts)), counts)
+                offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                pairs.append(np.stack([query, live[order[np.repeat(lo, counts) + offsets]]], axis=1))
+            if not pairs:
+                return results
+            codes = np.unique(np.concatenate(pairs)[:, 0] * max(n, 1) + np.concatenate(pairs)[:, 1])
+            pairs = np.stack([codes // max(n, 1), codes % max(n, 1)], axis=1)
+            for start in range(0, len(pairs), BATCH_PAIRS):
+                chunk = pairs[start:start + BATCH_PAIRS]
+                sims = np.count_nonzero(sigs[chunk[:, 0]] == self._sigs[chunk[:, 1]], axis=1) / NUM_PERM
+                keep = sims >= self.threshold
+                for (q, pos), sim in zip(chunk[keep].tolist(), sims[keep].tolist()):
+                    if not empty[q]:
+                        results[q].append((self._keys[pos], float(sim)))
+        return [sorted(hits, key=lambda hit: -hit[1]) for hits in results]
+
+    def clusters(self) -> List[List[Hashable]]:
+        """Groups of keys connected by above-threshold similarity (size >= 2)."""
+        with self._lock:
+            live = np.flatnonzero(self._alive[:len(self._keys)])
+            pairs = []
+            for band in range(self.bands):
+                column = self._band_keys[live, band]
+                order = np.argsort(column, kind="stable")
+                ordered = column[order]
+                starts = np.r_[True, ordered[1:] != ordered[:-1]]
+                # Each member of a bucket is paired with the bucket's first member only:
+                # linear per bucket, and pairs missed here are usually joined through
+                # another band.
+                heads = live[order][np.maximum.accumulate(np.where(starts, np.arange(len(order)), 0))]
+                members = live[order]
+                mask = heads != members
+                pairs.append(np.stack([heads[mask], members[mask]], axis=1))
+            pairs = np.concatenate(pairs) if pairs else np.empty((0, 2), dtype=np.int64)
+            # Same pair found in several bands: de-duplicate on a single int64 code.
+            n = len(self._keys)
+            codes = np.unique(pairs[:, 0] * n + pairs[:, 1])
+            pairs = np.stack([codes // n, codes % n], axis=1)
+
+            uf = _UnionFind()
+            for start in range(0, len(pairs), BATCH_PAIRS):
+                chunk = pairs[start:start + BATCH_PAIRS]
+                sims = np.count_nonzero(self._sigs[chunk[:, 0]] == self._sigs[chunk[:, 1]], axis=1) / NUM_PERM
+                for a, b in chunk[sims >= self.threshold].tolist():
+                    uf.union(a, b)
+            groups = defaultdict(list)
+            for pos in list(uf.parent):
+                groups[uf.find(pos)].append(self._keys[pos])
+        return sorted((sorted(g, key=str) for g in groups.values() if len(g) > 1), key=lambda g: (-len(g), str(g[0])))
+
+
+def find_duplicates(items: Iterable[Tuple[Hashable, Dict]],
+                    threshold: float = DEFAULT_THRESHOLD) -> List[List[Hashable]]:
+    """Near-duplicate clusters among (key, question dict) pairs."""
+    index = DuplicateIndex(threshold)
+    index.add_many((key, item_text(item)) for key, item in items)
+    return index.clusters()
+
+
+# -------------------------------
+# BANK-WIDE INDEX
+# -------------------------------
+def package_items(subject: str, package_id: str, package: Dict) -> List[Tuple[Tuple, Dict]]:
+    """((subject, package_id, question_id), question) pairs for every MCQ and essay."""
+    essays = package.get("essay", []) or []
+    if isinstance(essays, dict):
+        essays = [essays]
+    mcqs = package.get("mcqs", []) or []
+    return [
+        ((subject, package_id, item["id"]), item)
+        for item in list(mcqs) + list(essays)
+        if isinstance(item, dict) and "id" in item
+    ]
+
+
+class BankIndex:
+    """Duplicate index over database/, kept in sync with the registry by content hash."""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        self.index = DuplicateIndex(threshold)
+        self._versions: Dict[Tuple[str, str], str] = {}
+        self._members: Dict[Tuple[str, str], List[Tuple]] = {}
+        self._lock = threading.Lock()
+
+    def update_package(self, subject: str, package_id: str, package: Optional[Dict], sha256: str = ""):
+        with self._lock:
+            self.index.remove(self._members.pop((subject, package_id), []))
+            self._versions.pop((subject, package_id), None)
+            if package is None:
+                return
+            items = package_items(subject, package_id, package)
+            self.index.add_many((key, item_text(item)) for key, item in items)
+            self._members[(subject, package_id)] = [key for key, _ in items]
+            self._versions[(subject, package_id)] = sha256
+
+    def sync(self, entries: Iterable[Dict], db_dir: Path) -> int:
+        """Re-index packages whose sha256 changed; drop packages that are gone."""
+        wanted = {(e["subject"], e["package_id"]): e for e in entries}
+        changed = 0
+        for key, entry in wanted.items():
+            if self._versions.get(key) == entry["sha256"]:
+                continue
+            try:
+                package = load_json(Path(db_dir) / entry["path"])
+            except (OSError, ValueError):
+                package = {}
+            self.update_package(key[0], key[1], package if isinstance(package, dict) else {}, entry["sha256"])
+            changed += 1
+        for key in [k for k in self._versions if k not in wanted]:
+            self.update_package(key[0], key[1], None)
+            changed += 1
+        return changed
+
+    def check(self, item: Dict, exclude_package: Optional[Tuple[str, str]] = None) -> List[Tuple[Tuple, float]]:
+        """Existing questions that near-duplicate `item` (optionally ignoring its own package)."""
+        hits = self.index.query(item_text(item))
+        if exclude_package:
+            hits = [(key, sim) for key, sim in hits if key[:2] != tuple(exclude_package)]
+        return hits
+
+    def check_package(self, subject: str, package_id: str, package: Dict) -> Dict[str, List[Tuple[Tuple, float]]]:
+        """Near duplicates elsewhere in the bank for each question of a package."""
+        items = package_items(subject, package_id, package)
+        matches = self.index.query_many([item_text(item) for _, item in items])
+        report = {}
+        for ((_, _, qid), _), hits in zip(items, matches):
+            hits = [(key, sim) for key, sim in hits if key[:2] != (subject, package_id)]
+            if hits:
+                report[qid] = hits
+        return report
+
+
+_bank: Optional[BankIndex] = None
+_bank_lock = threading.Lock()
+
+
+def get_bank_index() -> BankIndex:
+    """Process-wide duplicate index over database/, synced from the registry."""
+    global _bank
+    registry = get_registry()
+    with _bank_lock:
+        if _bank is None:
+            _bank = BankIndex()
+        registry.refresh()
+        _bank.sync(registry.entries(), registry.db_dir)
+    return _bank
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report near-duplicate questions.")
+    parser.add_argument("path", nargs="?", help="Merged/package JSON file (default: every package in database/).")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    if args.path:
+        with open(args.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        items = package_items("-", Path(args.path).stem, data)
+        clusters = find_duplicates(items, args.threshold)
+    else:
+        registry = get_registry()
+        registry.refresh(force=True)
+        bank = BankIndex(args.threshold)
+        bank.sync(registry.entries(), registry.db_dir)
+        clusters = bank.index.clusters()
+
+    for cluster in clusters:
+        print(" ~ ".join("/".join(key) for key in cluster))
+    print(f"{len(clusters)} near-duplicate clusters "
+          f"({sum(len(c) for c in clusters)} questions) at threshold {args.threshold}")
+
+
+if __name__ == "__main__":
+    main()
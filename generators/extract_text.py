@@ -0,0 +1,100 @@
+"""
+PDF-to-text extraction for package generation.
+
+PDFs are opened straight from memory (no temp files), text is streamed one
+page at a time, and large decks can be split into page ranges across a
+process pool. Results are cached on disk by the PDF's SHA-256, so the same
+slides uploaded again are served without touching PyMuPDF.
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from storage.atomic import atomic_write_json
+from storage.timing import timed
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+CACHE_DIR = BASE_DIR / ".cache" / "pdf_text"
+CACHE_VERSION = 1
+
+# Decks with at least this many pages are split across worker processes.
+PARALLEL_MIN_PAGES = 60
+PAGES_PER_TASK = 25
+
+
+def pdf_sha256(pdf_bytes: bytes) -> str:
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def iter_pages(pdf_bytes: bytes, start: int = 0, stop: Optional[int] = None) -> Iterator[Dict]:
+    """Yield {"page": n, "text": ...} for each page (1-based), opened from memory."""
+    import fitz  # PyMuPDF
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        for index in range(start, stop):
+            yield {"page": index + 1, "text": doc.load_page(index).get_text("text")}
+
+
+def page_count(pdf_bytes: bytes) -> int:
+    import fitz  # PyMuPDF
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return doc.page_count
+
+
+def _extract_range(pdf_bytes: bytes, start: int, stop: int) -> List[Dict]:
+    return list(iter_pages(pdf_bytes, start, stop))
+
+
+def _cache_file(digest: str, cache_dir: Path) -> Path:
+    return Path(cache_dir) / f"{digest}.json"
+
+
+def _read_cache(path: Path) -> Optional[List[Dict]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data.get("pages") if data.get("version") == CACHE_VERSION else None
+
+
+def _write_cache(path: Path, digest: str, pages: List[Dict]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write_json(path, {"version": CACHE_VERSION, "sha256": digest, "pages": pages}, fsync="none")
+
+
+@timed("extract_pages")
+def extract_pages(pdf_bytes: bytes, workers: Optional[int] = None, use_cache: bool = True,
+                  cache_dir: Path = CACHE_DIR) -> List[Dict]:
+    """Extract per-page text, using the content-hash cache and, for large
+    decks, a process pool over page ranges."""
+    digest = pdf_sha256(pdf_bytes)
+    cache_path = _cache_file(digest, cache_dir)
+    if use_cache:
+        cached = _read_cache(cache_path)
+        if cached is not None:
+            return cached
+
+    total = page_count(pdf_bytes)
+    if workers is None:
+        workers = min(os.cpu_count() or 1, 4)
+
+    if workers > 1 and total >= PARALLEL_MIN_PAGES:
+        ranges = [(start, min(start + PAGES_PER_TASK, total)) for start in range(0, total, PAGES_PER_TASK)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = pool.map(_extract_range, [pdf_bytes] * len(ranges), *zip(*ranges))
+            pages = [page for chunk in chunks for page in chunk]
+    else:
+        pages = list(iter_pages(pdf_bytes))
+
+    if use_cache:
+        _write_cache(cache_path, digest, pages)
+    return pages
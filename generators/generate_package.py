@@ -0,0 +1,118 @@
+"""
+PDF -> package generation and saving, without any Streamlit calls.
+
+app.py (single PDF) and generators.batch (many PDFs on worker threads) both
+build packages with `build_package` and write them with `write_package`, so
+a batch-generated package goes through exactly the same validation, catalog,
+search-index and duplicate checks as one saved from the UI.
+"""
+import threading
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from generators.extract_text import extract_pages, pdf_sha256
+from generators.validate_schema import package_errors
+from storage.atomic import atomic_write_json
+from storage.packfile import refresh_compiled
+from storage.registry import get_registry
+from storage.search import get_search_index
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+DB_DIR = BASE_DIR / "database"
+
+# Writing and indexing are serialized; only generation runs concurrently.
+_save_lock = threading.Lock()
+
+
+class InvalidPackageError(ValueError):
+    """Raised instead of writing a package that fails schema validation."""
+
+    def __init__(self, problems: List[str]):
+        super().__init__("; ".join(problems))
+        self.problems = problems
+
+
+def build_package(pdf_bytes: bytes, package_id: str, source: str, level: str, subject: str) -> Dict:
+    """Placeholder question generation from a PDF (GPT generation is disabled)."""
+    # Keep context extraction in place for future GPT integration. Pages are
+    # read from memory and cached by content hash; boundaries are kept so
+    # generated questions can cite slides.
+    pages = extract_pages(pdf_bytes)
+    return {
+        "package_id": package_id,
+        "source": source,
+        "level": level,
+        "mcqs": [],
+        "essay": [
+            {
+                "id": f"{package_id}_essay1",
+                "prompt": f"Write an essay discussing key ideas of {subject}.",
+                "expected_keywords": ["example", "placeholder", "essay"],
+                "rubric": {
+                    "total_points": 100,
+                    "criteria": [
+                        {"keyword": "example", "weight": 40, "description": "Mentions example concept"},
+                        {"keyword": "placeholder", "weight": 40, "description": "Mentions placeholder concept"},
+                        {"keyword": "essay", "weight": 20, "description": "Mentions essay structure"},
+                    ],
+                    "grading_notes": "This is a placeholder rubric until OpenAI is re-enabled."
+                },
+            },
+            {
+                "id": f"{package_id}_essay2",
+                "prompt": f"Explain the importance of theoretical understanding in {subject}.",
+                "expected_keywords": ["theory", "understanding", "concept"],
+                "rubric": {
+                    "total_points": 100,
+                    "criteria": [
+                        {"keyword": "theory", "weight": 40, "description": "Mentions theoretical aspects"},
+                        {"keyword": "understanding", "weight": 30, "description": "Shows comprehension"},
+                        {"keyword": "concept", "weight": 30, "description": "Explains key concepts"},
+                    ],
+                    "grading_notes": "Placeholder rubric for essay 2."
+                },
+            },
+        ],
+        "source_text_chars": sum(len(page["text"]) for page in pages),
+        "source_pages": len(pages),
+        # Each page's [start, end) in its concatenated text; the text itself is
+        # cached under source_sha256 (generators.extract_text).
+        "source_sha256": pdf_sha256(pdf_bytes),
+        "source_page_spans": page_spans(pages),
+    }
+
+
+def page_spans(pages: List[Dict]) -> List[Dict]:
+    """[{"page", "start", "end"}] character offsets of each page in the joined page texts."""
+    spans, offset = [], 0
+    for page in pages:
+        spans.append({"page": page["page"], "start": offset, "end": offset + len(page["text"])})
+        offset += len(page["text"])
+    return spans
+
+
+def write_package(data: Dict, subject: str, package_id: str) -> Tuple[Path, Dict]:
+    """Validate and write database/<subject>/<package_id>/package.json.
+
+    Returns the written path and the near-duplicate report for its questions.
+    Raises InvalidPackageError (nothing is written) when validation fails.
+    """
+    problems = package_errors(data)
+    if problems:
+        raise InvalidPackageError(problems)
+    out_dir = DB_DIR / subject / package_id
+    with _save_lock:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        # Readers (the app, the search page, merges) never see a half-written package.
+        atomic_write_json(out_dir / "package.json", data, indent=2, ensure_ascii=True)
+        # Keep the catalog, the search index and any compiled copy in step with the file we just wrote.
+        refresh_compiled(out_dir / "package.json")
+        entry = get_registry().update(subject, package_id)
+        get_search_index().index_package(subject, package_id, entry["sha256"] if entry else None)
+        from generators.dedup import get_bank_index  # NumPy-backed; only needed once a package is saved
+
+        report = get_bank_index().check_package(subject, package_id, data)
+    return out_dir / "package.json", report
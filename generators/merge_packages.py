@@ -0,0 +1,266 @@
+"""
+Incremental merge of package.json files into combined question banks.
+
+A manifest records every input's mtime, size and SHA-256 together with the
+questions taken from it, so re-running the merge only re-reads packages that
+changed. Manifests hold a copy of every input, so they are kept out of the
+tree, in .cache/merge/ (one per output path). Outputs are never picked up
+as inputs, questions are de-duplicated by id, and the merged document is
+streamed to disk item by item. Inputs that fail schema validation
+(generators.validate_schema, cached by content hash) are reported and left
+out. Near-duplicate questions (rephrased copies with different ids) are
+reported via MinHash/LSH, see generators.dedup.
+
+    python -m generators.merge_packages database/machine_vision merged.json
+    python -m generators.merge_packages --subjects      # database/<subject>/combined/
+"""
+import argparse
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from generators.dedup import find_duplicates
+from generators.validate_schema import invalid_only, validate_files
+from storage.atomic import atomic_open, atomic_write_json
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+DB_DIR = BASE_DIR / "database"
+MANIFEST_DIR = BASE_DIR / ".cache" / "merge"
+MANIFEST_VERSION = 1
+COMBINED_DIRNAME = "combined"
+INPUT_NAME = "package.json"
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_path(output_file, manifest_dir: Path = MANIFEST_DIR) -> Path:
+    """Cache file of the manifest for an output, keyed by the output's absolute path."""
+    output_file = Path(output_file).resolve()
+    digest = hashlib.sha1(str(output_file).encode("utf-8")).hexdigest()[:12]
+    return Path(manifest_dir) / f"{output_file.stem}-{digest}.manifest.json"
+
+
+def _load_manifest(path: Path) -> Dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest
+
+
+def _extract(pkg: Dict) -> Dict:
+    """The parts of a package that go into a merged bank."""
+    essay_data = pkg.get("essay")
+    if isinstance(essay_data, dict):
+        essays = [essay_data]
+    elif isinstance(essay_data, list):
+        essays = essay_data
+    else:
+        essays = []
+    mcqs = pkg.get("mcqs") if isinstance(pkg.get("mcqs"), list) else []
+    return {"package_id": pkg.get("package_id", "unknown"), "mcqs": mcqs, "essay": essays}
+
+
+def find_inputs(input_folder, exclude=()) -> List[Path]:
+    """All package.json files under input_folder, minus merge outputs."""
+    excluded = {Path(p).resolve() for p in exclude}
+    inputs = []
+    for root, dirs, files in os.walk(input_folder):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d != COMBINED_DIRNAME)
+        if INPUT_NAME in files:
+            path = Path(root) / INPUT_NAME
+            if path.resolve() not in excluded:
+                inputs.append(path)
+    return inputs
+
+
+def _write_stream(output_file: Path, header: Dict, packages: List[str], mcqs, essays, notes: str):
+    """Write the merged document one item at a time via a temp file."""
+    def dump(value):
+        return json.dumps(value, ensure_ascii=False)
+
+    def write_array(f, key, items, last=False):
+        f.write(f'  {dump(key)}: [')
+        for i, item in enumerate(items):
+            f.write(",\n    " if i else "\n    ")
+            f.write(dump(item))
+        f.write("\n  ]" if items else "]")
+        f.write("\n" if last else ",\n")
+
+    with atomic_open(output_file, "w") as f:
+        f.write("{\n")
+        for key, value in header.items():
+            f.write(f"  {dump(key)}: {dump(value)},\n")
+        write_array(f, "packages", packages)
+        write_array(f, "mcqs", mcqs)
+        write_array(f, "essay", essays)
+        f.write(f'  "notes": {dump(notes)}\n')
+        f.write("}\n")
+
+
+def merge_exam_packages(input_folder, output_file,
+                        merged_source: str = "Machine Vision Exams Compilation (2014–2020)",
+                        level: str = "advanced_undergraduate", force: bool = False,
+                        verbose: bool = True, validate: bool = True,
+                        manifest_dir: Path = MANIFEST_DIR) -> Dict:
+    """
+    Merges multiple JSON exam packages into a single JSON structure.
+    Supports both 'essay': {...} and 'essay': [{...}] formats.
+    Searches recursively for package.json files; only changed inputs are re-read.
+    """
+    output_file = Path(output_file)
+    manifest_file = manifest_path(output_file, manifest_dir)
+    old_manifest = {} if force else _load_manifest(manifest_file)
+    old_inputs = old_manifest.get("inputs", {})
+    by_sha = {entry["sha256"]: entry for entry in old_inputs.values()}
+
+    inputs, reread = {}, 0
+    content_changed = manifest_dirty = False
+    input_files = find_inputs(input_folder, exclude=(output_file, manifest_file))
+    invalid = {}
+    if validate:
+        verdicts = invalid_only(validate_files(input_files))
+        invalid = {
+            os.path.relpath(path, input_folder): verdicts[os.path.abspath(path)]
+            for path in input_files if os.path.abspath(path) in verdicts
+        }
+    for path in input_files:
+        key = os.path.relpath(path, input_folder)
+        stat = path.stat()
+        old = old_inputs.get(key)
+        if old and old["mtime_ns"] == stat.st_mtime_ns and old["size"] == stat.st_size:
+            inputs[key] = old
+            continue
+
+        manifest_dirty = True
+        sha = _sha256(path)
+        if not old or old["sha256"] != sha:
+            content_changed = True
+        if sha in by_sha:
+            content = {k: by_sha[sha][k] for k in ("package_id", "mcqs", "essay")}
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                content = _extract(json.load(f))
+            reread += 1
+        inputs[key] = dict(content, mtime_ns=stat.st_mtime_ns, size=stat.st_size, sha256=sha)
+
+    # De-duplicate by question id across inputs (first occurrence wins).
+    packages, mcqs, essays = [], [], []
+    seen_packages, seen_mcqs, seen_essays = set(), set(), set()
+    duplicates = 0
+    for key in sorted(inputs):
+        if key in invalid:
+            continue
+        entry = inputs[key]
+        if entry["package_id"] not in seen_packages:
+            seen_packages.add(entry["package_id"])
+            packages.append(entry["package_id"])
+        for target, seen, items in ((mcqs, seen_mcqs, entry["mcqs"]), (essays, seen_essays, entry["essay"])):
+            for item in items:
+                qid = item.get("id") if isinstance(item, dict) else None
+                if qid is not None:
+                    if qid in seen:
+                        duplicates += 1
+                        continue
+                    seen.add(qid)
+                target.append(item)
+
+    changed = (force or content_changed or set(inputs) != set(old_inputs) or not output_file.exists()
+               or sorted(invalid) != old_manifest.get("invalid", []))
+    near_duplicates = old_manifest.get("near_duplicates")
+    if changed or near_duplicates is None:
+        near_duplicates = find_duplicates((item["id"], item) for item in mcqs + essays
+                                          if isinstance(item, dict) and "id" in item)
+        manifest_dirty = True
+    if changed:
+        header = {"merged_source": merged_source, "level": level}
+        _write_stream(output_file, header, packages, mcqs, essays,
+                      "Merged automatically using Question Bank Generator")
+    if changed or manifest_dirty:
+        manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        # Older versions kept the manifest next to the output.
+        output_file.with_name(output_file.stem + ".manifest.json").unlink(missing_ok=True)
+        atomic_write_json(manifest_file, {"version": MANIFEST_VERSION, "generated_at": datetime.now().isoformat(),
+                                          "inputs": inputs, "invalid": sorted(invalid),
+                                          "near_duplicates": near_duplicates}, fsync="none")
+
+    summary = {
+        "output": str(output_file),
+        "inputs": len(inputs),
+        "reread": reread,
+        "written": bool(changed),
+        "packages": len(packages),
+        "mcqs": len(mcqs),
+        "essays": len(essays),
+        "duplicates_removed": duplicates,
+        "invalid": invalid,
+        "near_duplicates": near_duplicates,
+    }
+    if verbose:
+        state = "Merged" if changed else "Up to date:"
+        print(f"{state} {len(packages)} packages into {output_file} "
+              f"({reread}/{len(inputs)} inputs re-read, {duplicates} duplicate questions removed)")
+        print(f"Total essays: {len(essays)}")
+        print(f"Total MCQs: {len(mcqs)}")
+        for key, errors in invalid.items():
+            print(f"Skipped invalid package {key}: " + "; ".join(errors[:3]))
+        if near_duplicates:
+            print(f"Near-duplicate clusters: {len(near_duplicates)} (kept; see the manifest)")
+            for cluster in near_duplicates:
+                print("  " + " ~ ".join(cluster))
+    return summary
+
+
+def merge_subjects(db_dir: Path = DB_DIR, subjects: Optional[List[str]] = None,
+                   force: bool = False, verbose: bool = True) -> List[Dict]:
+    """Write database/<subject>/combined/combined_package.json for each subject."""
+    db_dir = Path(db_dir)
+    if subjects is None:
+        subjects = sorted(d.name for d in db_dir.iterdir() if d.is_dir() and not d.name.startswith("."))
+    summaries = []
+    for subject in subjects:
+        subject_dir = db_dir / subject
+        out_dir = subject_dir / COMBINED_DIRNAME
+        out_dir.mkdir(parents=True, exist_ok=True)
+        summaries.append(merge_exam_packages(
+            subject_dir, out_dir / "combined_package.json",
+            merged_source=f"{subject.replace('_', ' ').title()} Compilation",
+            level="mixed", force=force, verbose=verbose,
+        ))
+    return summaries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally merge package.json files.")
+    parser.add_argument("input_folder", nargs="?", help="Folder searched recursively for package.json.")
+    parser.add_argument("output_file", nargs="?", help="Merged JSON output.")
+    parser.add_argument("--subjects", action="store_true",
+                        help="Write database/<subject>/combined/combined_package.json for every subject.")
+    parser.add_argument("--force", action="store_true", help="Ignore the manifest and re-read everything.")
+    args = parser.parse_args(argv)
+
+    if args.subjects:
+        merge_subjects(force=args.force)
+    elif args.input_folder and args.output_file:
+        merge_exam_packages(args.input_folder, args.output_file, force=args.force)
+    else:
+        parser.error("give INPUT_FOLDER OUTPUT_FILE or --subjects")
+
+
+if __name__ == "__main__":
+    main()
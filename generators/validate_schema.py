@@ -0,0 +1,272 @@
+"""
+Validate package.json files against schemas/package_schema.json.
+
+The schema is compiled once per process. Cross-field rules JSON Schema
+cannot express are checked in Python: every `correct_option` must be one of
+its MCQ's option keys, and question ids must be unique within a package.
+
+Verdicts are cached in .cache/schema_verdicts.json by file content SHA-256
+(and the schema's own hash), with a path -> (mtime, size, sha256) map in
+front, so an unchanged file is neither re-hashed nor re-validated. Cache
+misses are validated in a process pool when there are enough of them.
+
+    python -m generators.validate_schema                   # all of database/
+    python -m generators.validate_schema database/machine_vision/package_01/package.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from storage.atomic import atomic_write_json
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+DB_DIR = BASE_DIR / "database"
+SCHEMA_FILE = BASE_DIR / "schemas" / "package_schema.json"
+CACHE_FILE = BASE_DIR / ".cache" / "schema_verdicts.json"
+CACHE_VERSION = 1
+
+# Misses below this count are validated inline; a pool costs more than it saves.
+PARALLEL_MIN_FILES = 16
+# At most this many messages are kept per file.
+MAX_ERRORS = 20
+
+if TYPE_CHECKING:
+    from jsonschema import Draft202012Validator
+
+_validator: Optional["Draft202012Validator"] = None
+_validator_lock = threading.Lock()
+_cache_lock = threading.Lock()
+_loaded: Dict[str, Tuple[Optional[tuple], Dict]] = {}
+_startup: Optional[Dict[str, List[str]]] = None
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def schema_digest(schema_file: Path = SCHEMA_FILE) -> str:
+    return _sha256(Path(schema_file).read_bytes())
+
+
+def get_validator(schema_file: Path = SCHEMA_FILE) -> "Draft202012Validator":
+    """The compiled package validator (checked and built once per process).
+
+    jsonschema is imported here, not at module level: with a warm verdict
+    cache the app's startup check never needs it.
+    """
+    global _validator
+    if _validator is None:
+        with _validator_lock:
+            if _validator is None:
+                from jsonschema import Draft202012Validator
+
+                with open(schema_file, "r", encoding="utf-8") as f:
+                    schema = json.load(f)
+                Draft202012Validator.check_schema(schema)
+                _validator = Draft202012Validator(schema)
+    return _validator
+
+
+# -------------------------------
+# CHECKS
+# -------------------------------
+def _location(path) -> str:
+    return "/".join(str(part) for part in path) or "<root>"
+
+
+def _cross_field_errors(package: Dict) -> List[str]:
+    errors = []
+    seen = set()
+    mcqs = package.get("mcqs") if isinstance(package.get("mcqs"), list) else []
+    essays = package.get("essay") or []
+    essays = [essays] if isinstance(essays, dict) else essays if isinstance(essays, list) else []
+    for kind, items in (("mcqs", mcqs), ("essay", essays)):
+        for i, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            qid = item.get("id")
+            if qid in seen:
+                errors.append(f"{kind}/{i}/id: duplicate question id {qid!r}")
+            seen.add(qid)
+            options = item.get("options")
+            if kind == "mcqs" and isinstance(options, dict) and item.get("correct_option") not in options:
+                errors.append(
+                    f"mcqs/{i}/correct_option: {item.get('correct_option')!r} is not one of {sorted(options)}"
+                )
+    return errors
+
+
+def _describe(error) -> str:
+    # "is not valid under any of the given schemas" says nothing; report the
+    # closest branch instead (e.g. the essay that lacks a rubric).
+    while error.context:
+        # Branches rejected only for the wrong type are not the closest match.
+        branches = [e for e in error.context if e.validator != "type" or e.relative_path] or error.context
+        error = max(branches, key=lambda e: len(e.absolute_path))
+    return f"{_location(error.absolute_path)}: {error.message}"
+
+
+def package_errors(package) -> List[str]:
+    """Human-readable problems with one parsed package (empty when valid)."""
+    validator = get_validator()
+    errors = [
+        _describe(error)
+        for error in sorted(validator.iter_errors(package), key=lambda e: list(map(str, e.absolute_path)))
+    ]
+    if isinstance(package, dict):
+        errors += _cross_field_errors(package)
+    return errors[:MAX_ERRORS]
+
+
+def validate_bytes(raw: bytes) -> List[str]:
+    try:
+        package = json.loads(raw)
+    except ValueError as exc:
+        return [f"<root>: invalid JSON ({exc})"]
+    return package_errors(package)
+
+
+def _validate_file(path: str) -> Tuple[str, List[str]]:
+    """Worker: (sha256, errors) for one file."""
+    raw = Path(path).read_bytes()
+    return _sha256(raw), validate_bytes(raw)
+
+
+# -------------------------------
+# VERDICT CACHE
+# -------------------------------
+def _file_version(path: Path) -> Optional[tuple]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _load_cache(cache_file: Path, digest: str) -> Dict:
+    # The parsed cache stays in memory until another process rewrites the file.
+    version = _file_version(cache_file)
+    loaded = _loaded.get(str(cache_file))
+    if loaded and version and loaded[0] == version and loaded[1].get("schema") == digest:
+        return loaded[1]
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    if data.get("version") != CACHE_VERSION or data.get("schema") != digest:
+        data = {"version": CACHE_VERSION, "schema": digest, "files": {}, "verdicts": {}}
+    _loaded[str(cache_file)] = (version, data)
+    return data
+
+
+def _save_cache(cache_file: Path, data: Dict):
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write_json(cache_file, data, fsync="none")
+    _loaded[str(cache_file)] = (_file_version(cache_file), data)
+
+
+def validate_files(paths: Iterable, workers: Optional[int] = None, use_cache: bool = True,
+                   cache_file: Path = CACHE_FILE) -> Dict[str, List[str]]:
+    """{path: errors} for each file; unchanged content is served from the cache."""
+    paths = [os.path.abspath(os.fspath(p)) for p in paths]
+    with _cache_lock:
+        if use_cache:
+            cache = _load_cache(Path(cache_file), schema_digest())
+        else:
+            cache = {"files": {}, "verdicts": {}}
+        files, verdicts = cache["files"], cache["verdicts"]
+        results, misses, dirty = {}, [], False
+
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError as exc:
+                results[path] = [f"<file>: {exc.strerror or exc}"]
+                continue
+            known = files.get(path)
+            if known and known[:2] == [stat.st_mtime_ns, stat.st_size] and known[2] in verdicts:
+                results[path] = verdicts[known[2]]
+                continue
+            sha = _sha256(Path(path).read_bytes())
+            files[path], dirty = [stat.st_mtime_ns, stat.st_size, sha], True
+            if sha in verdicts:
+                results[path] = verdicts[sha]
+            else:
+                misses.append(path)
+
+        if workers is None:
+            workers = min(os.cpu_count() or 1, 8)
+        if workers > 1 and len(misses) >= PARALLEL_MIN_FILES:
+            # Each worker compiles the schema once and keeps it for its share.
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                checked = list(pool.map(_validate_file, misses, chunksize=max(1, len(misses) // (workers * 4))))
+        else:
+            checked = [_validate_file(path) for path in misses]
+        for path, (sha, errors) in zip(misses, checked):
+            verdicts[sha] = errors
+            files[path][2] = sha
+            results[path] = errors
+
+        if use_cache and dirty:
+            _save_cache(Path(cache_file), cache)
+    return results
+
+
+def validate_database(db_dir: Path = DB_DIR, workers: Optional[int] = None,
+                      use_cache: bool = True) -> Dict[str, List[str]]:
+    """Validate every database/<subject>/<package_id>/package.json."""
+    return validate_files(sorted(Path(db_dir).glob("*/*/package.json")), workers=workers, use_cache=use_cache)
+
+
+def invalid_only(results: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    return {path: errors for path, errors in results.items() if errors}
+
+
+def startup_report(db_dir: Path = DB_DIR) -> Dict[str, List[str]]:
+    """Invalid packages under database/, checked once per process (app startup)."""
+    global _startup
+    if _startup is None:
+        _startup = invalid_only(validate_database(db_dir))
+    return _startup
+
+
+def package_file_errors(package_file) -> List[str]:
+    """Cached verdict for one package file."""
+    return next(iter(validate_files([package_file]).values()))
+
+
+# -------------------------------
+# CLI
+# -------------------------------
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Validate package.json files against the package schema.")
+    parser.add_argument("paths", nargs="*", help="package.json files (default: all of database/)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-cache", action="store_true", help="re-validate everything")
+    args = parser.parse_args(argv)
+
+    if args.paths:
+        results = validate_files(args.paths, workers=args.workers, use_cache=not args.no_cache)
+    else:
+        results = validate_database(workers=args.workers, use_cache=not args.no_cache)
+    invalid = invalid_only(results)
+    for path, errors in invalid.items():
+        print(f"❌ {os.path.relpath(path)}")
+        for error in errors:
+            print(f"   - {error}")
+    print(f"{len(results) - len(invalid)}/{len(results)} package(s) valid")
+    return 1 if invalid else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,11 @@
 import streamlit as st
-import json
-import re
 from uuid import uuid4
 
+from generators.bulk_import import DIFFICULTIES, duplicate_groups, format_for, import_mcqs, iter_mcqs
+from generators.generate_package import InvalidPackageError
+from storage.drafts import get_draft, list_drafts
+from storage.registry import get_registry
+
 # =====================================================
 # PAGE CONFIG
 # =====================================================
@@ -14,11 +17,9 @@ st.set_page_config(
 st.title("🧠 MCQ Question Bank Builder")
 st.caption("Add, label, parse, and export multiple-choice questions")
 
-# =====================================================
-# SESSION STATE
-# =====================================================
-if "questions" not in st.session_state:
-    st.session_state.questions = []
+PREVIEW_PAGE_SIZE = 25
+QUESTION_PAGE_SIZE = 20
+DIFFICULTY_LEVELS = ["easy", "medium", "hard"]
 
 # =====================================================
 # HELPERS
@@ -44,18 +45,168 @@ def parse_mcq_block(text: str):
 
     return question, options
 
+def near_duplicates(question: str, options: dict, draft_questions: list):
+    """Bank questions and questions in this draft that look like the same MCQ."""
+    from generators.dedup import DuplicateIndex, get_bank_index, item_text  # NumPy: first check only
+
+    candidate = {"question": question, "options": options}
+    hits = [("/".join(key), sim) for key, sim in get_bank_index().check(candidate)]
+    session = DuplicateIndex()
+    session.add_many((f"this set / {q['id']}", item_text(q)) for q in draft_questions)
+    hits.extend(session.query(item_text(candidate)))
+    return sorted(hits, key=lambda hit: -hit[1])
+
+@st.cache_data(max_entries=4, show_spinner="Parsing questions...")
+def parse_bulk(data: bytes, fmt: str, default_difficulty: str):
+    """Parse a whole import once; paging the preview reruns against the cached result."""
+    mcqs, failed = [], []
+    for item in iter_mcqs(data, fmt, default_difficulty):
+        if item.mcq is None:
+            failed.append({"Line": item.line, "Problems": "; ".join(item.problems), "Text": item.excerpt})
+        else:
+            mcqs.append(item.mcq)
+    return {"mcqs": mcqs, "failed": failed, "duplicates": duplicate_groups(mcqs)}
+
+def render_question(draft, i: int, q: dict):
+    """One draft question with in-place edit and delete; each change appends one log line."""
+    with st.expander(f"Question {i} · {q['question'][:80]}"):
+        for k, v in q["options"].items():
+            marker = "✅" if k == q["correct_option"] else ""
+            st.write(f"{k}. {v} {marker}")
+        st.caption(f"Difficulty: {q['difficulty']}")
+
+        with st.form(f"edit_{q['id']}"):
+            text = st.text_area("Question", q["question"])
+            keys = list(q["options"])
+            col1, col2 = st.columns(2)
+            correct = col1.selectbox("Correct Option", keys,
+                                     index=keys.index(q["correct_option"]) if q["correct_option"] in keys else 0)
+            difficulty = col2.selectbox("Difficulty", DIFFICULTY_LEVELS,
+                                        index=DIFFICULTY_LEVELS.index(q["difficulty"])
+                                        if q["difficulty"] in DIFFICULTY_LEVELS else 1)
+            objective = st.text_input("Learning Objective", q.get("learning_objective", ""))
+            if st.form_submit_button("💾 Save changes"):
+                changes = {
+                    field: value
+                    for field, value in (("question", text.strip()), ("correct_option", correct),
+                                         ("difficulty", difficulty), ("learning_objective", objective))
+                    if value != q.get(field)
+                }
+                if changes:
+                    draft.update(q["id"], **changes)
+                    st.rerun()
+
+        if st.button("🗑️ Delete question", key=f"delete_{q['id']}"):
+            draft.delete(q["id"])
+            st.rerun()
+
+def render_bulk_import():
+    """Paste or upload many MCQ blocks, preview them page by page, write them into a package."""
+    st.header("📥 Bulk Import")
+    st.caption(
+        "Blocks separated by blank lines or numbered `1.`, `2.`, ...; options `A)`/`B.`/`(c)`; answer via "
+        "`Answer: B` or a `*` / `✓` / `(correct)` mark; difficulty via `Difficulty: hard` or a `[hard]` tag. "
+        "CSV needs `question`, `A`..`E` and `answer` columns."
+    )
+    upload = st.file_uploader("Upload .txt / .md / .csv", type=["txt", "md", "csv"])
+    pasted = st.text_area("...or paste many questions", height=250, key="bulk_text")
+    default_difficulty = st.selectbox("Difficulty for untagged questions", DIFFICULTIES, index=1)
+
+    if upload is not None:
+        parsed = parse_bulk(upload.getvalue(), format_for(upload.name), default_difficulty)
+        origin = upload.name
+    elif pasted.strip():
+        parsed = parse_bulk(pasted.encode("utf-8"), "text", default_difficulty)
+        origin = source
+    else:
+        st.info("Upload a file or paste questions to preview them.")
+        return
+
+    mcqs = parsed["mcqs"]
+    st.subheader(f"🔍 Preview — {len(mcqs)} question(s) parsed, {len(parsed['failed'])} block(s) skipped")
+    if parsed["failed"]:
+        with st.expander(f"⚠️ {len(parsed['failed'])} block(s) could not be parsed"):
+            st.dataframe(parsed["failed"], use_container_width=True)
+    if parsed["duplicates"]:
+        st.warning(
+            f"⚠️ {len(parsed['duplicates'])} group(s) of near-duplicates within this import: "
+            + "; ".join(", ".join(f"#{i + 1}" for i in group) for group in parsed["duplicates"][:10])
+        )
+    if not mcqs:
+        return
+
+    pages = max(1, -(-len(mcqs) // PREVIEW_PAGE_SIZE))
+    page = st.number_input(f"Preview page (1–{pages})", min_value=1, max_value=pages, value=1) - 1
+    start = page * PREVIEW_PAGE_SIZE
+    for i, q in enumerate(mcqs[start:start + PREVIEW_PAGE_SIZE], start + 1):
+        options = "  \n".join(
+            f"{k}. {v} {'✅' if k == q['correct_option'] else ''}" for k, v in q["options"].items()
+        )
+        st.markdown(f"**#{i}** {q['question']} · _{q['difficulty']}_  \n{options}")
+
+    st.subheader("💾 Save to Database")
+    subjects = get_registry().subjects()
+    col1, col2 = st.columns(2)
+    subject = col1.selectbox("Subject", subjects + ["➕ New subject"]) if subjects else "➕ New subject"
+    if subject == "➕ New subject":
+        subject = col1.text_input("New subject name (e.g., machine_vision)").strip()
+    mode = col2.radio("If the package exists", ["Append questions", "Replace its MCQs"])
+    skip_duplicates = st.checkbox("Skip later copies of near-duplicates within this import", value=True)
+
+    if subject and package_id and st.button(f"💾 Import into database/{subject}/{package_id}/package.json"):
+        skipped = {i for group in parsed["duplicates"] for i in group[1:]} if skip_duplicates else set()
+        selected = [q for i, q in enumerate(mcqs) if i not in skipped]
+        try:
+            path, report, added = import_mcqs(selected, subject, package_id, origin, level,
+                                              replace=mode == "Replace its MCQs")
+        except InvalidPackageError as exc:
+            st.error("❌ Not saved — the package fails schema validation:\n" + "\n".join(f"- `{p}`" for p in exc.problems))
+            return
+        st.success(f"✅ Imported {added} question(s) into {path}")
+        if report:
+            st.warning(
+                f"⚠️ {len(report)} imported question(s) look like near-duplicates of existing ones: "
+                + ", ".join(f"`{qid}` ~ `{'/'.join(hits[0][0])}`" for qid, hits in list(report.items())[:10])
+            )
+
 # =====================================================
 # SIDEBAR — PACKAGE INFO
 # =====================================================
 st.sidebar.header("📦 Question Set")
 
-package_id = st.sidebar.text_input("Package ID", "pkg_exposure_01")
+author = st.sidebar.text_input("👤 Author", key="draft_author",
+                               help="Your drafts are kept under this name, so you can resume them in a new session.")
+package_id = st.sidebar.text_input("Package ID", placeholder="e.g., pkg_exposure_01").strip()
 source = st.sidebar.text_input("Source", "imaging_exposure.pdf")
 level = st.sidebar.selectbox(
     "Level",
     ["introductory", "intermediate", "advanced_undergraduate", "graduate"]
 )
 
+# Drafts live on disk per author and package id, so a dropped session resumes where it left off
+# and authors never share (or clear) a draft. Without an author name the draft belongs to this session.
+owner = author.strip() or f"session-{st.session_state.setdefault('draft_session', uuid4().hex[:12])}"
+if not author.strip():
+    st.sidebar.caption("Enter an author name to keep drafts across sessions.")
+if not package_id:
+    st.info("📦 Enter a package ID in the sidebar to start (or resume) a question set.")
+    st.stop()
+
+draft = get_draft(package_id, owner)
+draft_status = st.sidebar.empty()  # filled at the end of the run, after this run's edits
+saved_drafts = [d for d in list_drafts(owner) if d != draft.path.stem]
+if saved_drafts:
+    st.sidebar.caption("Other saved drafts: " + ", ".join(f"`{d}`" for d in saved_drafts[:10]))
+if len(draft) and st.sidebar.button("🧹 Clear this draft"):
+    draft.clear()
+    st.rerun()
+
+mode = st.radio("Mode", ["✏️ One at a time", "📥 Bulk import"], horizontal=True)
+if mode == "📥 Bulk import":
+    draft_status.caption(f"Draft: {len(draft)} question(s) · saved to `results/drafts/{draft.path.parent.name}/{draft.path.name}`")
+    render_bulk_import()
+    st.stop()
+
 # =====================================================
 # QUESTION INPUT
 # =====================================================
@@ -77,6 +228,13 @@ if raw_text:
         for k, v in options.items():
             st.write(f"{k}. {v}")
 
+        duplicates = near_duplicates(question, options, draft.questions())
+        if duplicates:
+            st.warning(
+                "⚠️ This looks like a near-duplicate of: "
+                + ", ".join(f"`{key}` ({sim:.0%})" for key, sim in duplicates[:5])
+            )
+
         correct_option = st.selectbox(
             "Correct Option",
             list(options.keys())
@@ -84,7 +242,7 @@ if raw_text:
 
         difficulty = st.selectbox(
             "Difficulty",
-            ["easy", "medium", "hard"]
+            DIFFICULTY_LEVELS
         )
 
         learning_objective = st.text_input(
@@ -98,7 +256,7 @@ if raw_text:
         )
 
         if st.button("➕ Add Question"):
-            st.session_state.questions.append({
+            draft.add({
                 "id": f"{package_id}_mcq_{uuid4().hex[:6]}",
                 "question": question,
                 "options": options,
@@ -121,14 +279,16 @@ if raw_text:
 # =====================================================
 st.header("📚 Current Questions")
 
-if st.session_state.questions:
-    for i, q in enumerate(st.session_state.questions, 1):
-        with st.expander(f"Question {i}"):
-            st.write(q["question"])
-            for k, v in q["options"].items():
-                marker = "✅" if k == q["correct_option"] else ""
-                st.write(f"{k}. {v} {marker}")
-            st.caption(f"Difficulty: {q['difficulty']}")
+questions = draft.questions()
+if questions:
+    # Only one page of questions is rendered per rerun, however long the draft gets.
+    pages = max(1, -(-len(questions) // QUESTION_PAGE_SIZE))
+    page = 0
+    if pages > 1:
+        page = st.number_input(f"Page (1–{pages})", min_value=1, max_value=pages, value=pages) - 1
+    start = page * QUESTION_PAGE_SIZE
+    for i, q in enumerate(questions[start:start + QUESTION_PAGE_SIZE], start + 1):
+        render_question(draft, i, q)
 else:
     st.info("No questions added yet.")
 
@@ -137,16 +297,11 @@ else:
 # =====================================================
 st.header("📤 Export")
 
-export_data = {
-    "package_id": package_id,
-    "source": source,
-    "level": level,
-    "mcqs": st.session_state.questions
-}
-
 st.download_button(
     "⬇️ Download JSON",
-    data=json.dumps(export_data, indent=2),
+    data=draft.export_bytes(source, level),
     file_name=f"{package_id}.json",
     mime="application/json"
 )
+
+draft_status.caption(f"Draft: {len(draft)} question(s) · saved to `results/drafts/{draft.path.parent.name}/{draft.path.name}`")
@@ -0,0 +1,115 @@
+import streamlit as st
+import pandas as pd
+
+from evaluation.item_analysis import essay_keyword_rows, mcq_item_rows, update_stats
+from storage.packfile import load_package_view
+from storage.timing import start_rerun, timed
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+st.set_page_config(page_title="📈 Item Analysis", layout="wide")
+rerun_timer = start_rerun("item_analysis")
+st.title("📈 Item Analysis")
+st.caption("Classical item statistics across all stored submissions")
+
+# -------------------------------
+# UTILITY FUNCTIONS
+# -------------------------------
+
+def question_texts(subject: str, package_id: str) -> dict:
+    """Map MCQ ids to question text for display."""
+    package = load_package_view(subject, package_id) or {}
+    return {q["id"]: q.get("question", "") for q in package.get("mcqs", []) or []}
+
+@timed("item_analysis.build_mcq_frame")
+def build_mcq_frame(rows: list) -> pd.DataFrame:
+    """Flatten MCQ item rows (one column per option share)."""
+    texts = {}
+    records = []
+    for row in rows:
+        key = (row["subject"], row["package_id"])
+        if key not in texts:
+            texts[key] = question_texts(*key)
+        record = {
+            "Package": row["package_id"],
+            "Question ID": row["question_id"],
+            "Question": texts[key].get(row["question_id"], ""),
+            "Attempts": row["attempts"],
+            "p-value": row["p_value"],
+            "Point-biserial": row["point_biserial"] if row["point_biserial"] is not None else float("nan"),
+        }
+        for option, share in row["options"].items():
+            record[f"Chose {option}"] = share
+        records.append(record)
+    return pd.DataFrame(records)
+
+# -------------------------------
+# UI LAYOUT
+# -------------------------------
+
+# Only submissions appended since the last visit are folded in.
+rebuild = st.sidebar.button("♻️ Rebuild statistics from scratch")
+stats = update_stats(rebuild=rebuild)
+
+if not stats["packages"]:
+    st.warning("⚠️ No submissions analysed yet.")
+    st.stop()
+
+subjects = sorted({entry["subject"] for entry in stats["packages"].values()})
+subject = st.selectbox("📘 Subject", subjects)
+
+packages = sorted(
+    entry["package_id"] for entry in stats["packages"].values() if entry["subject"] == subject
+)
+package_choice = st.selectbox("📦 Package", ["All packages"] + packages)
+package_id = None if package_choice == "All packages" else package_choice
+
+st.caption(f"Statistics include submissions up to #{stats['last_seq']} (updated {stats.get('updated_at', '-')[:19]}).")
+
+# -------------------------------
+# MCQ STATISTICS
+# -------------------------------
+st.markdown("## 🧮 MCQ Item Statistics")
+
+mcq_df = build_mcq_frame(mcq_item_rows(stats, subject, package_id))
+if mcq_df.empty:
+    st.info("No MCQ responses for this selection.")
+else:
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Items", len(mcq_df))
+    c2.metric("Mean p-value", f"{mcq_df['p-value'].mean():.2f}")
+    c3.metric("Items with r_pb < 0.2", int((mcq_df["Point-biserial"] < 0.2).sum()))
+    st.dataframe(
+        mcq_df.sort_values("p-value"),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "p-value": st.column_config.NumberColumn(format="%.2f"),
+            "Point-biserial": st.column_config.NumberColumn(format="%.2f"),
+        },
+    )
+
+st.divider()
+
+# -------------------------------
+# ESSAY KEYWORD HIT RATES
+# -------------------------------
+st.markdown("## ✍️ Essay Keyword Hit Rates")
+
+essay_df = pd.DataFrame(essay_keyword_rows(stats, subject, package_id))
+if essay_df.empty:
+    st.info("No essay responses for this selection.")
+else:
+    essay_df = essay_df.rename(columns={
+        "package_id": "Package", "essay_id": "Essay ID", "keyword": "Keyword",
+        "attempts": "Attempts", "hit_rate": "Hit rate",
+    }).drop(columns=["subject"])
+    st.dataframe(
+        essay_df.sort_values("Hit rate"),
+        use_container_width=True,
+        hide_index=True,
+        column_config={"Hit rate": st.column_config.ProgressColumn(min_value=0.0, max_value=1.0, format="%.2f")},
+    )
+
+rerun_timer.finish()
@@ -0,0 +1,71 @@
+import time
+
+import streamlit as st
+
+from storage.packfile import load_question
+from storage.registry import get_registry
+from storage.search import get_search_index
+from storage.timing import start_rerun
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+st.set_page_config(page_title="🔎 Search Questions", layout="wide")
+rerun_timer = start_rerun("search")
+st.title("🔎 Search Questions")
+st.caption("Full-text search over questions, options, essay prompts, keywords and learning objectives")
+
+# -------------------------------
+# UI LAYOUT
+# -------------------------------
+
+# Only packages whose content hash changed since the last visit are re-indexed.
+registry = get_registry()
+registry.refresh()
+index = get_search_index()
+reindexed = index.sync(registry.entries())
+if reindexed:
+    st.toast(f"Search index updated for {reindexed} package(s).")
+
+facets = index.facets()
+query = st.text_input("Search", placeholder="e.g. chromatic aberration, Lagrangian, homography")
+
+c1, c2, c3, c4 = st.columns(4)
+subjects = c1.multiselect("📘 Subject", facets["subject"])
+levels = c2.multiselect("🎓 Level", facets["level"])
+difficulties = c3.multiselect("📶 Difficulty", facets["difficulty"])
+kinds = c4.multiselect("🧩 Type", ["mcq", "essay"])
+limit = st.sidebar.slider("Max results", min_value=10, max_value=200, value=50, step=10)
+
+if not query.strip():
+    st.info(f"🔍 {index.count()} questions indexed. Type a query to search.")
+    st.stop()
+
+start = time.perf_counter()
+hits = index.search(query, subjects=subjects, levels=levels, difficulties=difficulties,
+                    kinds=kinds, limit=limit)
+elapsed_ms = (time.perf_counter() - start) * 1000
+
+st.caption(f"{len(hits)} result(s) in {elapsed_ms:.1f} ms")
+if not hits:
+    st.warning("⚠️ No questions match this query.")
+    st.stop()
+
+for hit in hits:
+    badge = "📝 Essay" if hit["kind"] == "essay" else "❓ MCQ"
+    with st.expander(f"{badge} · {hit['subject']} / {hit['package_id']} · {hit['item_id']}"):
+        st.markdown(hit["snippet"])
+        st.caption(f"Difficulty: {hit['difficulty'] or '-'} · Level: {hit['level'] or '-'} · Score: {hit['score']:.2f}")
+        item = load_question(hit["subject"], hit["package_id"], hit["item_id"])
+        if item and hit["kind"] == "mcq":
+            for key, value in (item.get("options", {}) or {}).items():
+                marker = "✅" if key == item.get("correct_option") else ""
+                st.write(f"{key}. {value} {marker}")
+            if item.get("learning_objective"):
+                st.caption(f"Learning objective: {item['learning_objective']}")
+        elif item:
+            keywords = item.get("expected_keywords", []) or []
+            if keywords:
+                st.caption("Expected keywords: " + ", ".join(str(k) for k in keywords))
+
+rerun_timer.finish()
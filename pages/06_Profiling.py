@@ -0,0 +1,115 @@
+import streamlit as st
+import pandas as pd
+from datetime import datetime
+
+from storage.startup import startup_report
+from storage.timing import PROCESS_STARTED, TRACE_FILE, enable, first_renders, get_recorder, trace
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+st.set_page_config(page_title="⏱️ Profiling", layout="wide")
+st.title("⏱️ Profiling")
+st.caption("Per-stage timings of package loading, grading, PDF extraction, submission saving and the viewer tables, "
+           "plus the cold-start report")
+
+recorder = get_recorder()
+
+# -------------------------------
+# UTILITY FUNCTIONS
+# -------------------------------
+
+def stage_frame(rows: list) -> pd.DataFrame:
+    """Percentile table, one row per stage."""
+    frame = pd.DataFrame(rows)
+    if frame.empty:
+        return frame
+    frame = frame.rename(columns={
+        "stage": "Stage", "count": "Samples", "p50_ms": "p50 (ms)", "p95_ms": "p95 (ms)",
+        "p99_ms": "p99 (ms)", "max_ms": "Max (ms)", "total_ms": "Total (ms)",
+    })
+    return frame.round(2)
+
+# -------------------------------
+# UI LAYOUT
+# -------------------------------
+
+# Settings are process-wide: they apply to every session of this server.
+with st.sidebar:
+    enabled = st.toggle("Record timings", value=recorder.enabled)
+    if enabled != recorder.enabled:
+        enable(enabled)
+    tracing = st.toggle(f"Append samples to {TRACE_FILE.name}", value=recorder.trace_path is not None,
+                        help=f"JSONL trace file: {TRACE_FILE} (set with QB_TIMING_TRACE)")
+    if tracing != (recorder.trace_path is not None):
+        try:
+            trace(tracing)
+        except OSError as exc:
+            st.error(f"❌ Cannot open the trace file: {exc}")
+    if st.button("🗑️ Clear samples"):
+        recorder.clear()
+    st.caption(f"{len(recorder.samples)} / {recorder.samples.maxlen} samples in the ring buffer")
+
+st.markdown("### 🚀 Startup")
+started = datetime.fromtimestamp(PROCESS_STARTED).strftime("%Y-%m-%d %H:%M:%S")
+renders = first_renders()
+if renders:
+    st.caption(f"First completed run of each page since this server process started ({started}).")
+    st.dataframe(
+        pd.DataFrame(renders).rename(columns={
+            "page": "Page", "since_process_start_ms": "Since process start (ms)", "rerun_ms": "First run (ms)",
+        }).round(1),
+        use_container_width=True,
+        hide_index=True,
+    )
+
+# Runs a fresh interpreter per entry point, so it costs a few seconds; only on request.
+if st.button("📦 Measure cold import times"):
+    with st.spinner("Importing every page in a fresh interpreter..."):
+        st.session_state.startup_report = startup_report()
+if "startup_report" in st.session_state:
+    report = st.session_state.startup_report
+    st.dataframe(
+        pd.DataFrame([{"Entry point": r["entry"], "Import (ms)": r["total_ms"], "Error": r["error"] or ""}
+                      for r in report]).round(1),
+        use_container_width=True,
+        hide_index=True,
+    )
+    for row in report:
+        with st.expander(f"{row['entry']} · {row['total_ms']:.0f} ms"):
+            st.dataframe(pd.DataFrame(row["modules"]).round(2), use_container_width=True, hide_index=True)
+
+if not recorder.enabled:
+    st.info("Timing is off. Switch it on in the sidebar or start the app with `QB_TIMING=1`.")
+
+summary = recorder.summary()
+if not summary:
+    st.warning("⚠️ No timings recorded yet. Use the app with timing on, then come back.")
+    st.stop()
+
+stages = [row for row in summary if not row["stage"].startswith("rerun:")]
+reruns = [row for row in summary if row["stage"].startswith("rerun:")]
+
+st.markdown("### 🧩 Stages")
+stage_df = stage_frame(stages)
+if not stage_df.empty:
+    st.dataframe(stage_df, use_container_width=True)
+    st.bar_chart(stage_df.set_index("Stage")[["p50 (ms)", "p95 (ms)", "p99 (ms)"]])
+
+st.markdown("### 🔁 Reruns per page")
+if reruns:
+    st.dataframe(stage_frame(reruns), use_container_width=True)
+else:
+    st.info("No complete reruns recorded yet.")
+
+st.markdown("### 🐢 Slowest reruns")
+for rerun in recorder.slowest_reruns(limit=10):
+    started = datetime.fromtimestamp(rerun["started_at"]).strftime("%H:%M:%S")
+    with st.expander(f"{rerun['page']} · {rerun['ms']:.1f} ms · {started}"):
+        if rerun["stages"]:
+            st.dataframe(
+                pd.DataFrame({"Stage": list(rerun["stages"]), "ms": list(rerun["stages"].values())}).round(2),
+                use_container_width=True,
+            )
+        else:
+            st.caption("No instrumented stage ran in this rerun.")
@@ -1,143 +1,81 @@
 import streamlit as st
-import json
-import os
-from pathlib import Path
-import pandas as pd
+
+from evaluation.result_views import (
+    essay_review, mcq_review, option_text, preview, rows_to_csv, submission_label,
+)
+from storage.packfile import load_package_view
+from storage.submissions import get_store
+from storage.timing import start_rerun
 
 # -------------------------------
 # CONFIG
 # -------------------------------
-BASE_DIR = Path(__file__).resolve().parents[1]
-DB_DIR = BASE_DIR / "database"
-RESULTS_DIR = BASE_DIR / "results" / "user_submissions"
-
-RESULTS_DIR.mkdir(parents=True, exist_ok=True)
-
 st.set_page_config(page_title="📊 View Results", layout="wide")
+rerun_timer = start_rerun("view_results_table")
 st.title("📊 Test Results Viewer")
 
 # -------------------------------
 # HELPERS
 # -------------------------------
 
-def list_results():
-    return sorted([f for f in os.listdir(RESULTS_DIR) if f.endswith(".json")])
-
-
-def load_json(path: Path):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-def get_package_file(subject: str, package_id: str):
-    path = DB_DIR / subject / package_id / "package.json"
-    return path if path.exists() else None
-
-
 def build_mcq_table(package_data, result_data):
-    mcqs = package_data.get("mcqs", [])
-    user_answers = result_data.get("user_answers", {})
-
-    rows = []
-
-    for i, q in enumerate(mcqs, 1):
-        qid = q["id"]
-        options = q.get("options", {})
-
-        user_key = user_answers.get(qid, "-")
-        correct_key = q.get("correct_option", "-")
-
-        user_text = options.get(user_key, "-")
-        correct_text = options.get(correct_key, "-")
-
-        rows.append({
-            "No": i,
-            "Question": q["question"],
-            "Your Answer": f"({user_key}) {user_text}",
-            "Correct Answer": f"({correct_key}) {correct_text}",
-            "Result": "✅ Correct" if user_key == correct_key else "❌ Incorrect"
-        })
-
-    return pd.DataFrame(rows)
+    return [{
+        "No": r.number,
+        "Question": r.question,
+        "Your Answer": f"({r.user_key}) {option_text(r.options, r.user_key)}",
+        "Correct Answer": f"({r.correct_key}) {option_text(r.options, r.correct_key)}",
+        "Result": "✅ Correct" if r.is_correct else "❌ Incorrect"
+    } for r in mcq_review(package_data, result_data)]
 
 
 def build_essay_table(package_data, result_data):
-    essays = package_data.get("essay", [])
-    if isinstance(essays, dict):
-        essays = [essays]
-
-    user_essays = result_data.get("user_essay_answers", {})
-    rows = []
-
-    for i, e in enumerate(essays, 1):
-        eid = e["id"]
-        rubric = e.get("rubric", {})
-        expected_keywords = [c["keyword"] for c in rubric.get("criteria", [])]
-        user_response = user_essays.get(eid, "")
-
-        matched = [kw for kw in expected_keywords if kw.lower() in user_response.lower()]
-
-        rows.append({
-            "No": i,
-            "Prompt": e["prompt"],
-            "Expected Keywords": ", ".join(expected_keywords),
-            "Matched Keywords": ", ".join(matched) if matched else "None",
-            "Your Answer (preview)": user_response[:300] + ("..." if len(user_response) > 300 else "")
-        })
-
-    return pd.DataFrame(rows)
+    return [{
+        "No": r.number,
+        "Prompt": r.prompt,
+        "Expected Keywords": ", ".join(r.expected),
+        "Matched Keywords": ", ".join(r.matched) if r.matched else "None",
+        "Your Answer (preview)": preview(r.response, 300)
+    } for r in essay_review(package_data, result_data)]
 
 # -------------------------------
 # UI — SELECT RESULT
 # -------------------------------
 
-files = list_results()
+store = get_store()
+subjects = store.subjects()
 
-if not files:
-    st.warning("No result files found in results/user_submissions/")
+if not subjects:
+    st.warning("No submissions found in the results store.")
     st.stop()
 
-subjects = sorted(set([f.split("_package_")[0] for f in files]))
 subject = st.selectbox("📘 Subject", subjects)
 
-subject_files = [f for f in files if f.startswith(subject)]
-
-packages = []
-for f in subject_files:
-    parts = f.split("_")
-    if "package" in parts:
-        idx = parts.index("package")
-        if idx + 1 < len(parts):
-            packages.append(parts[idx + 1])
-
-packages = sorted(set(packages))
+packages = store.packages(subject)
 package_id = st.selectbox("📦 Package ID", packages)
 
-package_files = [f for f in subject_files if f"package_{package_id}" in f]
-selected_file = st.selectbox("🧾 Submission File", package_files)
+submissions = store.query(subject=subject, package_id=package_id)
+selected = st.selectbox("🧾 Submission", submissions, format_func=submission_label)
 
-if not selected_file:
+if not selected:
     st.stop()
 
 # -------------------------------
 # LOAD DATA
 # -------------------------------
 
-result_path = RESULTS_DIR / selected_file
-result_data = load_json(result_path)
+result_data = store.get(selected["submission_id"])
 
-package_path = get_package_file(result_data["subject"], result_data["package_id"])
-if not package_path:
+package_data = load_package_view(result_data["subject"], result_data["package_id"])
+if package_data is None:
     st.error("Question package not found in database.")
     st.stop()
 
-package_data = load_json(package_path)
 
 # -------------------------------
 # SUMMARY
 # -------------------------------
 
-st.success(f"Loaded: {selected_file}")
+st.success(f"Loaded: {selected['submission_id']}")
 
 c1, c2, c3, c4 = st.columns(4)
 c1.metric("Subject", result_data["subject"])
@@ -153,14 +91,14 @@ st.divider()
 
 st.markdown("## 🧮 Multiple Choice Questions — Review Table")
 
-mcq_df = build_mcq_table(package_data, result_data)
+mcq_rows = build_mcq_table(package_data, result_data)
 
 show_wrong_only = st.checkbox("Show only incorrect questions")
 
 if show_wrong_only:
-    mcq_df = mcq_df[mcq_df["Result"] == "❌ Incorrect"]
+    mcq_rows = [row for row in mcq_rows if row["Result"] == "❌ Incorrect"]
 
-st.dataframe(mcq_df, use_container_width=True, hide_index=True)
+st.dataframe(mcq_rows, use_container_width=True, hide_index=True)
 
 st.divider()
 
@@ -170,12 +108,12 @@ st.divider()
 
 st.markdown("## ✍️ Essay Questions — Review Table")
 
-essay_df = build_essay_table(package_data, result_data)
+essay_rows = build_essay_table(package_data, result_data)
 
-if essay_df.empty:
+if not essay_rows:
     st.info("No essay questions in this package.")
 else:
-    st.dataframe(essay_df, use_container_width=True, hide_index=True)
+    st.dataframe(essay_rows, use_container_width=True, hide_index=True)
 
 st.divider()
 
@@ -183,13 +121,7 @@ st.divider()
 # DOWNLOAD CSV
 # -------------------------------
 
-combined_df = pd.concat(
-    [mcq_df, essay_df],
-    axis=0,
-    ignore_index=True
-)
-
-csv_data = combined_df.to_csv(index=False).encode("utf-8")
+csv_data = rows_to_csv(mcq_rows, essay_rows)
 
 st.download_button(
     "⬇️ Download Results as CSV",
@@ -197,3 +129,5 @@ st.download_button(
     file_name=f"{subject}_{package_id}_results.csv",
     mime="text/csv"
 )
+
+rerun_timer.finish()
@@ -0,0 +1 @@
+"""Shared storage helpers used by app.py and the pages."""
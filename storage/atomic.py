@@ -0,0 +1,83 @@
+"""
+Atomic file writes.
+
+Every file the app rewrites in place (packages, the registry, caches,
+manifests, job state) is written to a temp file next to the target and
+renamed over it with os.replace, so a concurrent reader sees either the old
+file or the new one, never a half-written one. Temp names include the
+process and thread id, so two threads writing the same target cannot
+clobber each other's temp file.
+
+How hard a write is pushed to disk is set by QB_FSYNC:
+    none  rename only (fast; a power loss may leave an empty or stale file)
+    file  fsync the temp file before the rename (default)
+    full  also fsync the directory, so the rename itself is durable
+
+Caches that can be rebuilt pass fsync="none" explicitly.
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+FSYNC_POLICIES = ("none", "file", "full")
+FSYNC_POLICY = os.getenv("QB_FSYNC", "file").lower()
+if FSYNC_POLICY not in FSYNC_POLICIES:
+    FSYNC_POLICY = "file"
+
+
+def _tmp_path(path: Path) -> Path:
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def _fsync_dir(directory: Path):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:  # e.g. directories cannot be opened on Windows
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_open(path, mode: str = "w", fsync: Optional[str] = None, encoding: Optional[str] = "utf-8"):
+    """Open a temp file for writing; it replaces `path` only if the block succeeds."""
+    path = Path(path)
+    policy = fsync or FSYNC_POLICY
+    tmp_file = _tmp_path(path)
+    f = open(tmp_file, mode, encoding=None if "b" in mode else encoding)
+    try:
+        yield f
+        f.flush()
+        if policy != "none":
+            os.fsync(f.fileno())
+        f.close()
+        os.replace(tmp_file, path)
+    except BaseException:
+        f.close()
+        try:
+            os.unlink(tmp_file)
+        except OSError:
+            pass
+        raise
+    if policy == "full":
+        _fsync_dir(path.parent)
+
+
+def atomic_write_bytes(path, data: bytes, fsync: Optional[str] = None):
+    with atomic_open(path, "wb", fsync=fsync) as f:
+        f.write(data)
+
+
+def atomic_write_json(path, data, fsync: Optional[str] = None, **dump_kwargs):
+    """json.dump `data` to `path` atomically (dump_kwargs go to json.dump)."""
+    dump_kwargs.setdefault("ensure_ascii", False)
+    with atomic_open(path, "w", fsync=fsync) as f:
+        json.dump(data, f, **dump_kwargs)
@@ -0,0 +1,217 @@
+"""
+Disk-backed question drafts for the Question Bank Builder.
+
+Each draft package is an append-only log, results/drafts/<owner>/<package_id>.jsonl,
+with one operation per line:
+
+    {"op": "add", "question": {...}}
+    {"op": "update", "id": "...", "changes": {...}}
+    {"op": "delete", "id": "..."}
+    {"op": "clear"}
+
+Adding, editing or deleting a question appends one short line (fsync per
+QB_FSYNC), so a dropped session loses nothing and a change never rewrites the
+whole set. The log is replayed when a draft is opened and compacted (rewritten
+atomically as plain adds) once it holds many more operations than questions.
+
+Drafts belong to an owner (the author name, or a per-session id when none
+is given), so authors who pick the same package id never edit, or clear,
+each other's draft.
+
+The download payload is assembled from per-question JSON fragments that are
+serialized once and re-serialized only when that question changes; the
+assembled bytes are cached until the next change. They are identical to
+`json.dumps(payload, indent=2)`.
+"""
+import hashlib
+import json
+import os
+import re
+import textwrap
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from storage.atomic import FSYNC_POLICY, atomic_open
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+DRAFTS_DIR = BASE_DIR / "results" / "drafts"
+# Compact once the log has this many operations and more than twice as many as live questions.
+COMPACT_MIN_OPS = 200
+
+_UNSAFE_RE = re.compile(r"[^\w.-]+", re.UNICODE)
+
+
+def _file_name(name: str) -> str:
+    """`name` if it is file-name safe, else a sanitized form with a hash suffix."""
+    safe = _UNSAFE_RE.sub("_", name).strip("._") or "draft"
+    if safe != name:
+        safe += "-" + hashlib.sha1(name.encode("utf-8")).hexdigest()[:8]
+    return safe
+
+
+def owner_dir(owner: str, drafts_dir: Path = DRAFTS_DIR) -> Path:
+    """Directory holding one owner's drafts."""
+    return Path(drafts_dir) / _file_name(owner)
+
+
+def draft_path(package_id: str, drafts_dir: Path = DRAFTS_DIR) -> Path:
+    """Log file for a package id in an owner's directory."""
+    return Path(drafts_dir) / f"{_file_name(package_id)}.jsonl"
+
+
+class DraftLog:
+    """Questions of one draft package, replayed from and appended to its log file in `drafts_dir`."""
+
+    def __init__(self, package_id: str, drafts_dir: Path):
+        self.package_id = package_id
+        self.path = draft_path(package_id, drafts_dir)
+        self._lock = threading.RLock()
+        self._questions: Dict[str, Dict] = {}
+        self._fragments: Dict[str, str] = {}
+        self._export: Optional[Tuple[tuple, bytes]] = None
+        self._ops = 0
+        self._size = -1
+        self.version = 0
+        self._load()
+
+    # ---------- log ----------
+    def _load(self):
+        self._questions, self._fragments, self._export = {}, {}, None
+        self._ops = 0
+        torn = False
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        for line in data.splitlines():
+            try:
+                self._apply(json.loads(line))
+            except (ValueError, KeyError, TypeError):
+                torn = True  # a write cut short by a crash; the rest of the log is intact
+        self._size = len(data)
+        self.version += 1
+        if torn or (data and not data.endswith(b"\n")):
+            self._compact()
+
+    def _sync(self):
+        """Reload if another process (or a restore from backup) changed the file."""
+        try:
+            size = os.stat(self.path).st_size
+        except FileNotFoundError:
+            size = 0
+        if size != self._size:
+            self._load()
+
+    def _apply(self, op: Dict):
+        kind = op["op"]
+        if kind == "add":
+            question = op["question"]
+            self._questions[question["id"]] = question
+            self._fragments.pop(question["id"], None)
+        elif kind == "update":
+            if op["id"] in self._questions:
+                self._questions[op["id"]] = dict(self._questions[op["id"]], **op["changes"])
+                self._fragments.pop(op["id"], None)
+        elif kind == "delete":
+            self._questions.pop(op["id"], None)
+            self._fragments.pop(op["id"], None)
+        elif kind == "clear":
+            self._questions.clear()
+            self._fragments.clear()
+        else:
+            raise KeyError(kind)
+        self._ops += 1
+
+    def _append(self, op: Dict):
+        with self._lock:
+            self._sync()
+            self._apply(op)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            line = (json.dumps(op, ensure_ascii=False) + "\n").encode("utf-8")
+            with open(self.path, "ab") as f:
+                f.write(line)
+                f.flush()
+                if FSYNC_POLICY != "none":
+                    os.fsync(f.fileno())
+            self._size += len(line)
+            self.version += 1
+            self._export = None
+            if self._ops >= COMPACT_MIN_OPS and self._ops > 2 * len(self._questions):
+                self._compact()
+
+    def _compact(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_open(self.path, "wb") as f:
+            for question in self._questions.values():
+                f.write((json.dumps({"op": "add", "question": question}, ensure_ascii=False) + "\n").encode("utf-8"))
+        self._size = self.path.stat().st_size
+        self._ops = len(self._questions)
+
+    # ---------- edits ----------
+    def add(self, question: Dict):
+        self._append({"op": "add", "question": question})
+
+    def update(self, question_id: str, **changes):
+        self._append({"op": "update", "id": question_id, "changes": changes})
+
+    def delete(self, question_id: str):
+        self._append({"op": "delete", "id": question_id})
+
+    def clear(self):
+        self._append({"op": "clear"})
+
+    # ---------- reads ----------
+    def questions(self) -> List[Dict]:
+        with self._lock:
+            self._sync()
+            return list(self._questions.values())
+
+    def __len__(self):
+        with self._lock:
+            self._sync()
+            return len(self._questions)
+
+    def export_bytes(self, source: str, level: str) -> bytes:
+        """`json.dumps({"package_id", "source", "level", "mcqs"}, indent=2)`, cached until the draft changes."""
+        with self._lock:
+            self._sync()
+            key = (self.version, source, level)
+            if self._export is not None and self._export[0] == key:
+                return self._export[1]
+            for qid, question in self._questions.items():
+                if qid not in self._fragments:
+                    self._fragments[qid] = textwrap.indent(json.dumps(question, indent=2), "    ")
+            header = json.dumps({"package_id": self.package_id, "source": source, "level": level}, indent=2)[:-2]
+            if self._questions:
+                mcqs = "[\n" + ",\n".join(self._fragments[qid] for qid in self._questions) + "\n  ]"
+            else:
+                mcqs = "[]"
+            data = f'{header},\n  "mcqs": {mcqs}\n}}'.encode("utf-8")
+            self._export = (key, data)
+            return data
+
+
+_drafts: Dict[Tuple[str, str], DraftLog] = {}
+_drafts_lock = threading.Lock()
+
+
+def get_draft(package_id: str, owner: str, drafts_dir: Path = DRAFTS_DIR) -> DraftLog:
+    """Return the draft of a package id for one owner (shared by that owner's sessions)."""
+    directory = owner_dir(owner, drafts_dir)
+    key = (str(directory), package_id)
+    with _drafts_lock:
+        draft = _drafts.get(key)
+        if draft is None:
+            draft = _drafts[key] = DraftLog(package_id, directory)
+    return draft
+
+
+def list_drafts(owner: str, drafts_dir: Path = DRAFTS_DIR) -> List[str]:
+    """File stems of an owner's saved drafts, most recently changed first."""
+    files = sorted(owner_dir(owner, drafts_dir).glob("*.jsonl"), key=lambda p: p.stat().st_mtime, reverse=True)
+    return [p.stem for p in files]
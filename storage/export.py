@@ -0,0 +1,393 @@
+"""
+Streaming columnar export of submissions and question banks (Parquet or Arrow).
+
+    python -m storage.export results/export                      # Parquet, every subject
+    python -m storage.export results/export --format arrow       # Arrow IPC files
+    python -m storage.export results/export --subject machine_vision --since 2025-11-01
+
+Three tables are written as Hive-style partitions, readable by
+pyarrow.dataset, DuckDB, Spark or pandas:
+
+    <out>/answers/subject=<s>/date=<YYYY-MM-DD>/part-00000.parquet      one row per question per submission
+    <out>/submissions/subject=<s>/date=<YYYY-MM-DD>/part-00000.parquet  one row per submission (scores)
+    <out>/questions/subject=<s>/part-00000.parquet                      one row per question of every package
+
+Submissions are streamed from the store in insertion order and rows are
+buffered per partition. A buffer is written out as one row group when it
+reaches `chunk_rows`, and the largest buffers are flushed early whenever all
+of them together pass `max_buffered_rows`, so memory stays bounded no matter
+how many answers are exported. At most `max_open_files` partition files are
+open at once (least recently used are closed, and a later row for that
+partition starts a new part file). Each table is written next to its target
+and swapped in at the end, so a reader never sees a half-written export.
+
+Requires pyarrow (`pip install pyarrow`); nothing else in the app does.
+"""
+import argparse
+import os
+import shutil
+import sys
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from evaluation.essay_grader import find_matched_keywords, get_rubric, rubric_keywords
+from evaluation.mcq_evaluator import package_essays
+from storage.loader import load_package, thaw
+from storage.registry import get_registry
+from storage.submissions import SubmissionStore, get_store
+from storage.timing import timed
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_OUT_DIR = BASE_DIR / "results" / "export"
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+TABLES = ("answers", "submissions", "questions")
+DEFAULT_CHUNK_ROWS = 50_000
+DEFAULT_MAX_BUFFERED_ROWS = 200_000
+DEFAULT_MAX_OPEN_FILES = 32
+MAX_CACHED_PACKAGES = 256
+UNKNOWN_DATE = "unknown"
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise RuntimeError("Columnar export needs pyarrow: pip install pyarrow") from None
+    return pa
+
+
+def table_schemas() -> Dict:
+    """Arrow schema per table (partition columns are part of the path, not the files)."""
+    pa = _pyarrow()
+    return {
+        "answers": pa.schema([
+            ("submission_id", pa.string()),
+            ("user_id", pa.string()),
+            ("package_id", pa.string()),
+            ("timestamp", pa.string()),
+            ("question_id", pa.string()),
+            ("kind", pa.string()),
+            ("source_package", pa.string()),
+            ("user_answer", pa.string()),
+            ("correct_option", pa.string()),
+            ("is_correct", pa.bool_()),
+            ("matched_keywords", pa.list_(pa.string())),
+        ]),
+        "submissions": pa.schema([
+            ("submission_id", pa.string()),
+            ("user_id", pa.string()),
+            ("package_id", pa.string()),
+            ("timestamp", pa.string()),
+            ("mcq_score", pa.float64()),
+            ("mcq_total", pa.int64()),
+            ("essay_score", pa.float64()),
+            ("essay_total", pa.float64()),
+            ("final_score", pa.float64()),
+        ]),
+        "questions": pa.schema([
+            ("package_id", pa.string()),
+            ("question_id", pa.string()),
+            ("kind", pa.string()),
+            ("text", pa.string()),
+            ("options", pa.list_(pa.struct([("key", pa.string()), ("text", pa.string())]))),
+            ("correct_option", pa.string()),
+            ("keywords", pa.list_(pa.string())),
+            ("total_points", pa.float64()),
+            ("level", pa.string()),
+            ("source", pa.string()),
+            ("package_sha256", pa.string()),
+        ]),
+    }
+
+
+# -------------------------------
+# PARTITIONED WRITER
+# -------------------------------
+class PartitionedWriter:
+    """Rows -> <root>/<key=value>/.../part-NNNNN files, in bounded row groups."""
+
+    def __init__(self, root: Path, schema, fmt: str = "parquet", chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                 max_buffered_rows: int = DEFAULT_MAX_BUFFERED_ROWS, max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+                 compression: Optional[str] = "zstd"):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format {fmt!r}; expected one of {sorted(FORMATS)}")
+        self.root = Path(root)
+        self.schema = schema
+        self.fmt = fmt
+        self.chunk_rows = chunk_rows
+        self.max_buffered_rows = max(max_buffered_rows, chunk_rows)
+        self.max_open_files = max_open_files
+        self.compression = compression
+        self._buffers: Dict[Tuple, List[Dict]] = {}
+        self._buffered = 0
+        self._open: "OrderedDict[Tuple, object]" = OrderedDict()
+        self._parts: Dict[Tuple, int] = {}
+        self.rows = 0
+        self.files = 0
+
+    def add(self, partition: Tuple[Tuple[str, str], ...], row: Dict):
+        buffer = self._buffers.setdefault(partition, [])
+        buffer.append(row)
+        self._buffered += 1
+        self.rows += 1
+        if len(buffer) >= self.chunk_rows:
+            self._flush(partition)
+        elif self._buffered > self.max_buffered_rows:
+            # Many half-full partitions: write out the largest until back under the cap.
+            for key in sorted(self._buffers, key=lambda k: len(self._buffers[k]), reverse=True):
+                self._flush(key)
+                if self._buffered <= self.max_buffered_rows // 2:
+                    break
+
+    def _writer(self, partition: Tuple):
+        writer = self._open.get(partition)
+        if writer is not None:
+            self._open.move_to_end(partition)
+            return writer
+        if len(self._open) >= self.max_open_files:
+            _, oldest = self._open.popitem(last=False)
+            oldest.close()
+
+        directory = self.root.joinpath(*(f"{key}={quote(str(value), safe='')}" for key, value in partition))
+        directory.mkdir(parents=True, exist_ok=True)
+        part = self._parts.get(partition, 0)
+        self._parts[partition] = part + 1
+        path = directory / f"part-{part:05d}{FORMATS[self.fmt]}"
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+            writer = pq.ParquetWriter(path, self.schema, compression=self.compression)
+        else:
+            import pyarrow.ipc as ipc
+            options = ipc.IpcWriteOptions(compression=self.compression) if self.compression else None
+            writer = ipc.new_file(path, self.schema, options=options)
+        self._open[partition] = writer
+        self.files += 1
+        return writer
+
+    def _flush(self, partition: Tuple):
+        rows = self._buffers.pop(partition, None)
+        if not rows:
+            return
+        self._buffered -= len(rows)
+        pa = _pyarrow()
+        self._writer(partition).write_table(pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self) -> Dict:
+        for partition in list(self._buffers):
+            self._flush(partition)
+        while self._open:
+            _, writer = self._open.popitem(last=False)
+            writer.close()
+        return {"rows": self.rows, "files": self.files}
+
+
+# -------------------------------
+# ROWS
+# -------------------------------
+def _text(value) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def _number(value) -> Optional[float]:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _date(timestamp: str) -> str:
+    date = (timestamp or "")[:10]
+    return date if len(date) == 10 and date[4] == "-" and date[7] == "-" else UNKNOWN_DATE
+
+
+class _PackageCache:
+    """Recently used packages (answer keys and essays) for flattening submissions."""
+
+    def __init__(self, size: int = MAX_CACHED_PACKAGES):
+        self.size = size
+        self._packages: "OrderedDict[Tuple[str, str], Optional[Dict]]" = OrderedDict()
+
+    def get(self, subject: str, package_id: str) -> Optional[Dict]:
+        key = (subject, package_id)
+        if key in self._packages:
+            self._packages.move_to_end(key)
+            return self._packages[key]
+        package = load_package(subject, package_id)
+        self._packages[key] = package
+        if len(self._packages) > self.size:
+            self._packages.popitem(last=False)
+        return package
+
+
+def answer_rows(submission: Dict, package: Optional[Dict]) -> Iterator[Dict]:
+    """One row per MCQ and essay of the submission's package (unanswered questions included)."""
+    base = {
+        "submission_id": submission.get("submission_id"),
+        "user_id": submission.get("user_id"),
+        "package_id": submission.get("package_id"),
+        "timestamp": submission.get("timestamp"),
+    }
+    answers = submission.get("user_answers", {}) or {}
+    if package is None:
+        # Package deleted since: keep the raw answers, without a key to compare against.
+        for qid, answer in answers.items():
+            yield dict(base, question_id=qid, kind="mcq", source_package=None, user_answer=_text(answer),
+                       correct_option=None, is_correct=None, matched_keywords=None)
+        return
+
+    for q in package.get("mcqs", []) or []:
+        answer = answers.get(q["id"])
+        yield dict(base, question_id=q["id"], kind="mcq", source_package=q.get("source_package"),
+                   user_answer=_text(answer), correct_option=_text(q.get("correct_option")),
+                   is_correct=answer == q.get("correct_option"), matched_keywords=None)
+
+    essay_answers = submission.get("user_essay_answers", {}) or {}
+    essay_matches = submission.get("essay_matches", {}) or {}
+    for essay in package_essays(package):
+        text = essay_answers.get(essay["id"], "")
+        matched = find_matched_keywords(essay, text, essay_matches.get(essay["id"]))
+        yield dict(base, question_id=essay["id"], kind="essay", source_package=essay.get("source_package"),
+                   user_answer=text, correct_option=None, is_correct=None, matched_keywords=list(matched))
+
+
+def submission_row(submission: Dict) -> Dict:
+    return {
+        "submission_id": submission.get("submission_id"),
+        "user_id": submission.get("user_id"),
+        "package_id": submission.get("package_id"),
+        "timestamp": submission.get("timestamp"),
+        "mcq_score": _number(submission.get("mcq_score")),
+        "mcq_total": int(submission["mcq_total"]) if isinstance(submission.get("mcq_total"), int) else None,
+        "essay_score": _number(submission.get("essay_score")),
+        "essay_total": _number(submission.get("essay_total")),
+        "final_score": _number(submission.get("final_score")),
+    }
+
+
+def question_rows(entry: Dict, package: Dict) -> Iterator[Dict]:
+    base = {
+        "package_id": entry["package_id"],
+        "level": _text(package.get("level")),
+        "source": _text(package.get("source")),
+        "package_sha256": entry.get("sha256"),
+    }
+    for q in package.get("mcqs", []) or []:
+        options = q.get("options", {}) or {}
+        yield dict(base, question_id=q["id"], kind="mcq", text=q.get("question"),
+                   options=[{"key": str(k), "text": _text(v)} for k, v in options.items()],
+                   correct_option=_text(q.get("correct_option")), keywords=None, total_points=None)
+    for essay in package_essays(package):
+        yield dict(base, question_id=essay["id"], kind="essay", text=essay.get("prompt"), options=None,
+                   correct_option=None, keywords=rubric_keywords(essay),
+                   total_points=_number(get_rubric(essay).get("total_points")))
+
+
+# -------------------------------
+# EXPORT
+# -------------------------------
+def _swap_in(partial: Path, target: Path):
+    if target.exists():
+        shutil.rmtree(target)
+    os.replace(partial, target)
+
+
+@timed("export")
+def export(out_dir: Path = DEFAULT_OUT_DIR, fmt: str = "parquet", subject: Optional[str] = None,
+           since: Optional[str] = None, until: Optional[str] = None, tables=TABLES,
+           store: Optional[SubmissionStore] = None, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+           max_buffered_rows: int = DEFAULT_MAX_BUFFERED_ROWS, max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+           compression: Optional[str] = "zstd", progress: Optional[Callable[[int], None]] = None) -> Dict:
+    """Write the selected tables under `out_dir`; returns rows and files per table.
+
+    `since`/`until` are inclusive dates (YYYY-MM-DD) on the submission timestamp.
+    """
+    unknown = set(tables) - set(TABLES)
+    if unknown:
+        raise ValueError(f"Unknown table(s): {', '.join(sorted(unknown))}")
+    schemas = table_schemas()
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    partial = {name: out_dir / f".{name}.partial-{os.getpid()}" for name in tables}
+    for path in partial.values():
+        shutil.rmtree(path, ignore_errors=True)
+
+    def writer(name):
+        return PartitionedWriter(partial[name], schemas[name], fmt, chunk_rows=chunk_rows,
+                                 max_buffered_rows=max_buffered_rows, max_open_files=max_open_files,
+                                 compression=compression)
+
+    report = {}
+    try:
+        if "answers" in tables or "submissions" in tables:
+            answers = writer("answers") if "answers" in tables else None
+            submissions = writer("submissions") if "submissions" in tables else None
+            packages = _PackageCache()
+            count = 0
+            for submission in (store or get_store()).iter_payloads(subject=subject):
+                date = _date(submission.get("timestamp"))
+                if (since and date < since) or (until and date > until):
+                    continue
+                partition = (("subject", submission["subject"]), ("date", date))
+                if submissions is not None:
+                    submissions.add(partition, submission_row(submission))
+                if answers is not None:
+                    package = packages.get(submission["subject"], submission["package_id"])
+                    for row in answer_rows(submission, package):
+                        answers.add(partition, row)
+                count += 1
+                if progress is not None and count % 1000 == 0:
+                    progress(count)
+            for name, w in (("answers", answers), ("submissions", submissions)):
+                if w is not None:
+                    report[name] = w.close()
+
+        if "questions" in tables:
+            questions = writer("questions")
+            for entry in get_registry().entries(subject):
+                package = load_package(entry["subject"], entry["package_id"])
+                if package is None:
+                    continue
+                for row in question_rows(entry, thaw(package)):
+                    questions.add((("subject", entry["subject"]),), row)
+            report["questions"] = questions.close()
+
+        for name in tables:
+            partial[name].mkdir(parents=True, exist_ok=True)  # empty if nothing matched, never stale
+            _swap_in(partial[name], out_dir / name)
+    finally:
+        for path in partial.values():
+            shutil.rmtree(path, ignore_errors=True)
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export submissions and question banks as Parquet/Arrow.")
+    parser.add_argument("out_dir", nargs="?", default=str(DEFAULT_OUT_DIR), help="Output directory.")
+    parser.add_argument("--format", dest="fmt", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--subject", help="Only export this subject.")
+    parser.add_argument("--since", help="First submission date to include (YYYY-MM-DD).")
+    parser.add_argument("--until", help="Last submission date to include (YYYY-MM-DD).")
+    parser.add_argument("--tables", default=",".join(TABLES), help=f"Comma-separated subset of {', '.join(TABLES)}.")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows per row group / batch.")
+    parser.add_argument("--compression", default="zstd", help="Codec (zstd, lz4, snappy, none).")
+    args = parser.parse_args(argv)
+
+    try:
+        report = export(
+            Path(args.out_dir), fmt=args.fmt, subject=args.subject, since=args.since, until=args.until,
+            tables=[t.strip() for t in args.tables.split(",") if t.strip()], chunk_rows=args.chunk_rows,
+            compression=None if args.compression == "none" else args.compression,
+            progress=lambda n: print(f"{n} submissions...", file=sys.stderr),
+        )
+    except (RuntimeError, ValueError) as exc:
+        print(exc, file=sys.stderr)
+        return 2
+    for name, stats in report.items():
+        print(f"{name}: {stats['rows']} rows in {stats['files']} file(s) -> {Path(args.out_dir) / name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
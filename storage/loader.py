@@ -0,0 +1,198 @@
+"""
+Process-wide, version-aware JSON loader shared by app.py and the pages.
+
+Parsed documents are cached by (path, mtime, size) so an edited file is
+picked up on the next read, and every Streamlit session reuses the same
+parsed object instead of holding its own copy. Cached objects are frozen
+(read-only dict/list subclasses); call `thaw()` for a mutable copy.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from storage.timing import timed
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+DB_DIR = BASE_DIR / "database"
+# Exams assembled from the pooled bank (evaluation.assembly) live outside database/.
+ASSEMBLED_DIR = BASE_DIR / "results" / "assembled"
+
+# Upper bound for cached documents, measured in on-disk bytes.
+DEFAULT_MAX_BYTES = int(os.getenv("QB_JSON_CACHE_BYTES", 64 * 1024 * 1024))
+
+
+# -------------------------------
+# READ-ONLY CONTAINERS
+# -------------------------------
+def _readonly(self, *args, **kwargs):
+    raise TypeError("Cached JSON objects are read-only; use thaw() for a mutable copy.")
+
+
+class FrozenDict(dict):
+    """dict that refuses mutation; still JSON-serializable and isinstance(dict)."""
+    __slots__ = ()
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+
+class FrozenList(list):
+    """list that refuses mutation; still JSON-serializable and isinstance(list)."""
+    __slots__ = ()
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = pop = remove = clear = sort = reverse = _readonly
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+
+def freeze(obj: Any) -> Any:
+    """Recursively convert parsed JSON into read-only containers."""
+    if isinstance(obj, dict):
+        return FrozenDict((k, freeze(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        return FrozenList(freeze(v) for v in obj)
+    return obj
+
+
+def thaw(obj: Any) -> Any:
+    """Return a plain, mutable deep copy of a (possibly frozen) JSON object."""
+    if isinstance(obj, dict):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [thaw(v) for v in obj]
+    return obj
+
+
+# -------------------------------
+# CACHE
+# -------------------------------
+class JsonCache:
+    """LRU cache of parsed JSON files, bounded by total file bytes."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.parse_seconds = 0.0
+
+    def load(self, path) -> Any:
+        path = os.path.abspath(os.fspath(path))
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached and cached[0] == version:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        # Parse outside the lock so slow files do not block other sessions.
+        start = time.perf_counter()
+        with open(path, "r", encoding="utf-8") as f:
+            data = freeze(json.load(f))
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.parse_seconds += elapsed
+            old = self._entries.pop(path, None)
+            if old:
+                self._bytes -= old[0][1]
+            if stat.st_size <= self.max_bytes:
+                self._entries[path] = (version, data)
+                self._bytes += stat.st_size
+                while self._bytes > self.max_bytes:
+                    _, (old_version, _) = self._entries.popitem(last=False)
+                    self._bytes -= old_version[1]
+                    self.evictions += 1
+        return data
+
+    def invalidate(self, path=None):
+        """Drop one path (or everything) from the cache."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            old = self._entries.pop(os.path.abspath(os.fspath(path)), None)
+            if old:
+                self._bytes -= old[0][1]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "parse_seconds": self.parse_seconds,
+            }
+
+
+_cache = JsonCache()
+
+
+@timed("load_json")
+def load_json(path) -> Any:
+    """Load a JSON file through the shared cache (result is read-only)."""
+    return _cache.load(path)
+
+
+def cache_stats() -> Dict:
+    """Hit/miss/byte counters of the shared cache."""
+    return _cache.stats()
+
+
+def invalidate(path=None):
+    _cache.invalidate(path)
+
+
+def get_package_file(subject: str, package_id: str, db_dir: Path = DB_DIR) -> Optional[Path]:
+    """Get the package file path for a given subject and package (or assembled exam)."""
+    pkg_path = Path(db_dir) / subject / package_id / "package.json"
+    if pkg_path.exists():
+        return pkg_path
+    assembled_path = ASSEMBLED_DIR / subject / f"{package_id}.json"
+    return assembled_path if assembled_path.exists() else None
+
+
+def load_package(subject: str, package_id: str, db_dir: Path = DB_DIR) -> Optional[Dict]:
+    """Load `database/<subject>/<package_id>/package.json` (or an assembled exam), or None."""
+    path = get_package_file(subject, package_id, db_dir)
+    if path is None:
+        return None
+    try:
+        return load_json(path)
+    except FileNotFoundError:
+        return None
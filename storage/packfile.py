@@ -0,0 +1,361 @@
+"""
+Compiled package format (package.qbp) with lazy per-question access.
+
+A package.json is parsed in full on every cold read, including essay
+rubrics with long grading notes that a results viewer never shows. The
+compiled form stores each question as its own compact JSON record behind a
+fixed-size offset table, so a single question, the MCQ answer key or just
+the MCQs can be read from a memory-mapped file without decoding the rest.
+
+Layout (little-endian):
+
+    header   magic "QBPK", version, flags, source mtime_ns/size/sha256,
+             record count and (offset, length) of the meta/key/ids blobs
+    toc      one (kind, offset, length) entry per question, in package order
+    meta     package fields other than the questions (JSON)
+    key      {mcq id: correct_option} (JSON)
+    ids      question ids in toc order (JSON list)
+    records  one compact JSON array of MCQs and one of essays; the toc
+             points at each element
+
+package.json stays the source of truth. A compiled file is used only while
+its recorded source mtime and size match package.json; otherwise readers
+fall back to the JSON. Convert with:
+
+    python -m storage.packfile compile [database/...]
+    python -m storage.packfile decompile database/<subject>/<pkg>/package.qbp
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from storage.atomic import atomic_open, atomic_write_json
+from storage.loader import DB_DIR, freeze, get_package_file, load_package, thaw
+from storage.timing import timed
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+MAGIC = b"QBPK"
+FORMAT_VERSION = 2
+COMPILED_SUFFIX = ".qbp"
+
+# magic, version, flags, src mtime_ns, src size, src sha256, n_records,
+# meta (offset, length), key (offset, length), ids (offset, length)
+HEADER = struct.Struct("<4sHHqQ32sIQIQIQI")
+# kind, record offset, record length
+TOC_ENTRY = struct.Struct("<BQI")
+
+KIND_MCQ = 0
+KIND_ESSAY = 1
+# Set when the package stores a single essay as `essay: {...}`.
+FLAG_SINGLE_ESSAY = 1
+# Set when `mcqs` / `essay` were moved into records; their meta value is then a
+# placeholder, and any other value (a JSON null included) is kept as it was.
+FLAG_MCQ_RECORDS = 2
+FLAG_ESSAY_RECORDS = 4
+
+MAX_OPEN = 256
+
+_open: "OrderedDict[str, tuple]" = OrderedDict()
+_open_lock = threading.Lock()
+
+
+def _dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def compiled_path(package_file) -> Path:
+    """package.json -> package.qbp next to it."""
+    return Path(package_file).with_suffix(COMPILED_SUFFIX)
+
+
+# -------------------------------
+# CONVERTERS
+# -------------------------------
+def compile_package(package_file, out_file=None) -> Path:
+    """Write the compiled form of one package.json (atomically); returns its path."""
+    package_file = Path(package_file)
+    raw = package_file.read_bytes()
+    stat = package_file.stat()
+    package = json.loads(raw)
+    if not isinstance(package, dict):
+        raise ValueError(f"{package_file}: package must be a JSON object")
+
+    meta, flags = dict(package), 0
+    mcqs = package.get("mcqs")
+    essays = package.get("essay")
+    records = []
+    if isinstance(mcqs, list):
+        meta["mcqs"], flags = None, flags | FLAG_MCQ_RECORDS
+        records += [(KIND_MCQ, q) for q in mcqs]
+    if isinstance(essays, dict):
+        essays, flags = [essays], flags | FLAG_SINGLE_ESSAY
+    if isinstance(essays, list):
+        meta["essay"], flags = None, flags | FLAG_ESSAY_RECORDS
+        records += [(KIND_ESSAY, e) for e in essays]
+
+    key_blob = _dumps({
+        q["id"]: q.get("correct_option")
+        for kind, q in records if kind == KIND_MCQ and isinstance(q, dict) and "id" in q
+    })
+    ids_blob = _dumps([item.get("id") if isinstance(item, dict) else None for _, item in records])
+    meta_blob = _dumps(meta)
+
+    offset = HEADER.size + TOC_ENTRY.size * len(records)
+    sections = []
+    for blob in (meta_blob, key_blob, ids_blob):
+        sections.append((offset, len(blob)))
+        offset += len(blob)
+    # Records of one kind are written as a JSON array, so each record is its own
+    # slice and the whole MCQ (or essay) list still decodes in one json.loads.
+    toc, bodies = [], []
+    for kind in (KIND_MCQ, KIND_ESSAY):
+        items = [_dumps(item) for item_kind, item in records if item_kind == kind]
+        if not items:
+            continue
+        offset += 1
+        for body in items:
+            toc.append(TOC_ENTRY.pack(kind, offset, len(body)))
+            offset += len(body) + 1
+        bodies.append(b"[" + b",".join(items) + b"]")
+
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, flags, stat.st_mtime_ns, stat.st_size,
+        hashlib.sha256(raw).digest(), len(records), *[v for section in sections for v in section],
+    )
+    out_file = Path(out_file) if out_file else compiled_path(package_file)
+    # Derived from package.json, so a torn write is simply recompiled.
+    with atomic_open(out_file, "wb", fsync="none") as f:
+        f.write(header)
+        f.writelines(toc)
+        f.writelines((meta_blob, key_blob, ids_blob))
+        f.writelines(bodies)
+    return out_file
+
+
+def decompile_package(compiled_file, out_file=None) -> Path:
+    """Rebuild package.json from a compiled file, then re-stamp the compiled file."""
+    compiled_file = Path(compiled_file)
+    package = CompiledPackage(compiled_file).to_dict()
+    out_file = Path(out_file) if out_file else compiled_file.with_suffix(".json")
+    atomic_write_json(out_file, package, indent=2)
+    compile_package(out_file, compiled_file)
+    return out_file
+
+
+# -------------------------------
+# READER
+# -------------------------------
+class CompiledPackage(Mapping):
+    """Read-only, lazily decoded view of a package.qbp.
+
+    Behaves like the frozen package dict for `.get("mcqs")`, `["essay"]`,
+    iteration and `in`; questions are decoded on first access and kept.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < HEADER.size:
+            raise ValueError(f"{self.path}: truncated compiled package")
+        (magic, version, self.flags, self.source_mtime_ns, self.source_size, digest, self.n_records,
+         meta_off, meta_len, key_off, key_len, ids_off, ids_len) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{self.path}: not a version {FORMAT_VERSION} compiled package")
+        self.source_sha256 = digest.hex()
+        self._sections = {"meta": (meta_off, meta_len), "key": (key_off, key_len), "ids": (ids_off, ids_len)}
+        self._meta: Optional[Dict] = None
+        self._ids: Optional[List] = None
+        self._positions: Optional[Dict[str, int]] = None
+        self._lists: Dict[int, List] = {}
+
+    def _blob(self, name: str) -> Any:
+        offset, length = self._sections[name]
+        return json.loads(self._mm[offset:offset + length])
+
+    def _entry(self, position: int):
+        return TOC_ENTRY.unpack_from(self._mm, HEADER.size + TOC_ENTRY.size * position)
+
+    def _record(self, position: int) -> Any:
+        _, offset, length = self._entry(position)
+        return freeze(json.loads(self._mm[offset:offset + length]))
+
+    # ---------- lazy parts ----------
+    @property
+    def meta(self) -> Dict:
+        if self._meta is None:
+            self._meta = freeze(self._blob("meta"))
+        return self._meta
+
+    def ids(self) -> List[Optional[str]]:
+        """Question ids in package order (MCQs first, then essays)."""
+        if self._ids is None:
+            self._ids = self._blob("ids")
+        return self._ids
+
+    def answer_key(self) -> Dict[str, Any]:
+        """{mcq id: correct_option} without decoding any question."""
+        return freeze(self._blob("key"))
+
+    def question(self, question_id: str) -> Optional[Dict]:
+        """Decode a single MCQ or essay by id."""
+        if self._positions is None:
+            positions = {}
+            for position, qid in enumerate(self.ids()):
+                positions.setdefault(qid, position)
+            self._positions = positions
+        position = self._positions.get(question_id)
+        return None if position is None else self._record(position)
+
+    def _items(self, kind: int) -> List:
+        items = self._lists.get(kind)
+        if items is None:
+            positions = [p for p in range(self.n_records) if self._entry(p)[0] == kind]
+            if positions:
+                _, start, _ = self._entry(positions[0])
+                _, last, length = self._entry(positions[-1])
+                items = freeze(json.loads(self._mm[start - 1:last + length + 1]))
+            else:
+                items = freeze([])
+            self._lists[kind] = items
+        return items
+
+    def is_fresh(self, package_file) -> bool:
+        try:
+            stat = os.stat(package_file)
+        except OSError:
+            return False
+        return (stat.st_mtime_ns, stat.st_size) == (self.source_mtime_ns, self.source_size)
+
+    # ---------- mapping protocol ----------
+    def __getitem__(self, key: str) -> Any:
+        value = self.meta[key]
+        if key == "mcqs" and self.flags & FLAG_MCQ_RECORDS:
+            return self._items(KIND_MCQ)
+        if key == "essay" and self.flags & FLAG_ESSAY_RECORDS:
+            essays = self._items(KIND_ESSAY)
+            return essays[0] if self.flags & FLAG_SINGLE_ESSAY and essays else essays
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.meta)
+
+    def __len__(self) -> int:
+        return len(self.meta)
+
+    def to_dict(self) -> Dict:
+        """Plain, mutable package dict (decodes everything)."""
+        return {key: thaw(self[key]) for key in self}
+
+
+def open_compiled(package_file) -> Optional[CompiledPackage]:
+    """Shared compiled view of package.json, or None when missing, stale or unreadable."""
+    path = compiled_path(package_file)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = os.path.abspath(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _open_lock:
+        cached = _open.get(key)
+        if cached and cached[0] == version:
+            _open.move_to_end(key)
+            compiled = cached[1]
+        else:
+            compiled = None
+    if compiled is None:
+        try:
+            compiled = CompiledPackage(path)
+        except (OSError, ValueError):
+            return None
+        with _open_lock:
+            _open[key] = (version, compiled)
+            while len(_open) > MAX_OPEN:
+                _open.popitem(last=False)
+    return compiled if compiled.is_fresh(package_file) else None
+
+
+# -------------------------------
+# LOADERS
+# -------------------------------
+@timed("load_package_view")
+def load_package_view(subject: str, package_id: str, db_dir: Path = DB_DIR) -> Optional[Mapping]:
+    """Package for read-only use: the compiled view when fresh, else the cached JSON."""
+    path = get_package_file(subject, package_id, db_dir)
+    if path is None:
+        return None
+    return open_compiled(path) or load_package(subject, package_id, db_dir)
+
+
+@timed("load_question")
+def load_question(subject: str, package_id: str, question_id: str, db_dir: Path = DB_DIR) -> Optional[Dict]:
+    """One MCQ or essay by id, decoding only that record when a compiled file is fresh."""
+    path = get_package_file(subject, package_id, db_dir)
+    if path is None:
+        return None
+    compiled = open_compiled(path)
+    if compiled is not None:
+        return compiled.question(question_id)
+    package = load_package(subject, package_id, db_dir) or {}
+    essays = package.get("essay", []) or []
+    for item in (package.get("mcqs", []) or []) + ([essays] if isinstance(essays, dict) else essays):
+        if isinstance(item, dict) and item.get("id") == question_id:
+            return item
+    return None
+
+
+def refresh_compiled(package_file) -> Optional[Path]:
+    """Recompile after package.json changed, but only where a compiled file is already kept."""
+    if not compiled_path(package_file).exists():
+        return None
+    return compile_package(package_file)
+
+
+# -------------------------------
+# CLI
+# -------------------------------
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Convert packages to and from the compiled .qbp format.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    comp = sub.add_parser("compile", help="compile package.json files (a file or a directory tree)")
+    comp.add_argument("paths", nargs="*", default=[str(DB_DIR)])
+    comp.add_argument("--stale-only", action="store_true", help="skip packages whose compiled file is fresh")
+    dec = sub.add_parser("decompile", help="rebuild package.json from a .qbp file")
+    dec.add_argument("path")
+    dec.add_argument("--output", help="target JSON path (default: next to the .qbp)")
+    args = parser.parse_args(argv)
+
+    if args.command == "decompile":
+        print(f"Wrote {decompile_package(args.path, args.output)}")
+        return 0
+
+    failed = 0
+    for root in map(Path, args.paths):
+        files = [root] if root.is_file() else sorted(root.rglob("package.json"))
+        for package_file in files:
+            if args.stale_only and open_compiled(package_file) is not None:
+                continue
+            try:
+                out_file = compile_package(package_file)
+            except (OSError, ValueError) as exc:
+                failed += 1
+                print(f"⚠️ {package_file}: {exc}", file=sys.stderr)
+                continue
+            print(f"{package_file} -> {out_file.name} ({out_file.stat().st_size} bytes)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+Persistent catalog of subjects and packages (database/registry.json).
+
+The registry holds one entry per `database/<subject>/<package_id>/package.json`
+with the metadata the selectors and header need, so a Streamlit rerun never
+has to list directories or parse package files just to draw the UI.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from storage.atomic import atomic_write_json
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+DB_DIR = BASE_DIR / "database"
+REGISTRY_FILE = DB_DIR / "registry.json"
+REGISTRY_VERSION = 1
+
+# Minimum seconds between two mtime scans of database/.
+REFRESH_INTERVAL = 2.0
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _build_entry(db_dir: Path, package_file: Path, package_id: str, stat: os.stat_result) -> Dict:
+    """Parse one package.json and summarize it for the catalog."""
+    try:
+        with open(package_file, "r", encoding="utf-8") as f:
+            package = json.load(f)
+        error = None
+    except (OSError, ValueError) as exc:
+        package, error = {}, str(exc)
+    if not isinstance(package, dict):
+        package, error = {}, f"top level is a {type(package).__name__}, not an object"
+
+    mcqs = package.get("mcqs") or []
+    essays = package.get("essay") or []
+    if isinstance(essays, dict):
+        essays = [essays]
+
+    return {
+        "package_id": package_id,
+        "declared_id": package.get("package_id", package_id),
+        "source": package.get("source", "Unknown source"),
+        "level": package.get("level", "Unknown"),
+        "mcq_count": len(mcqs) if isinstance(mcqs, list) else 0,
+        "essay_count": len(essays) if isinstance(essays, list) else 0,
+        "path": package_file.relative_to(db_dir).as_posix(),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": _file_sha256(package_file),
+        "error": error,
+    }
+
+
+class PackageRegistry:
+    """In-memory catalog backed by registry.json, refreshed incrementally."""
+
+    def __init__(self, db_dir: Path = DB_DIR, registry_file: Path = REGISTRY_FILE,
+                 refresh_interval: float = REFRESH_INTERVAL):
+        self.db_dir = Path(db_dir)
+        self.registry_file = Path(registry_file)
+        self.refresh_interval = refresh_interval
+        self._subjects: Dict[str, Dict[str, Dict]] = {}
+        self._last_scan = 0.0
+        self._lock = threading.RLock()
+        self._load()
+
+    # ---------- persistence ----------
+    def _load(self):
+        if not self.registry_file.exists():
+            return
+        try:
+            with open(self.registry_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == REGISTRY_VERSION:
+            self._subjects = data.get("subjects", {})
+
+    def _save(self):
+        data = {
+            "version": REGISTRY_VERSION,
+            "generated_at": datetime.now().isoformat(),
+            "subjects": self._subjects,
+        }
+        # A rebuildable cache: losing it on power failure only costs a rescan.
+        atomic_write_json(self.registry_file, data, indent=2, sort_keys=True, fsync="none")
+
+    # ---------- updates ----------
+    def refresh(self, force: bool = False) -> bool:
+        """Rescan database/ and re-parse only packages whose mtime/size changed.
+
+        Scans are throttled to one per `refresh_interval` seconds unless
+        `force` is set. Returns True when the catalog changed.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._last_scan and now - self._last_scan < self.refresh_interval:
+                return False
+            self._last_scan = now
+
+            if not self.db_dir.exists():
+                changed = bool(self._subjects)
+                self._subjects = {}
+                return changed
+
+            changed = False
+            seen_subjects = {}
+            with os.scandir(self.db_dir) as subject_entries:
+                for subject_entry in subject_entries:
+                    if subject_entry.name.startswith(".") or not subject_entry.is_dir():
+                        continue
+                    subject = subject_entry.name
+                    old_packages = self._subjects.get(subject, {})
+                    packages = {}
+                    with os.scandir(subject_entry.path) as package_entries:
+                        for package_entry in package_entries:
+                            if package_entry.name.startswith(".") or not package_entry.is_dir():
+                                continue
+                            package_file = Path(package_entry.path) / "package.json"
+                            try:
+                                stat = package_file.stat()
+                            except FileNotFoundError:
+                                continue
+                            old = old_packages.get(package_entry.name)
+                            if old and old["mtime_ns"] == stat.st_mtime_ns and old["size"] == stat.st_size:
+                                packages[package_entry.name] = old
+                            else:
+                                packages[package_entry.name] = _build_entry(self.db_dir, package_file, package_entry.name, stat)
+                                changed = True
+                    if set(packages) != set(old_packages):
+                        changed = True
+                    seen_subjects[subject] = packages
+
+            if set(seen_subjects) != set(self._subjects):
+                changed = True
+            self._subjects = seen_subjects
+            if changed or not self.registry_file.exists():
+                self._save()
+            return changed
+
+    def update(self, subject: str, package_id: str) -> Optional[Dict]:
+        """Re-index a single package right after it was written."""
+        package_file = self.db_dir / subject / package_id / "package.json"
+        with self._lock:
+            packages = self._subjects.setdefault(subject, {})
+            try:
+                stat = package_file.stat()
+            except FileNotFoundError:
+                packages.pop(package_id, None)
+                self._save()
+                return None
+            entry = _build_entry(self.db_dir, package_file, package_id, stat)
+            packages[package_id] = entry
+            self._save()
+            return entry
+
+    # ---------- queries ----------
+    def subjects(self) -> List[str]:
+        with self._lock:
+            return sorted(self._subjects)
+
+    def packages(self, subject: str) -> List[str]:
+        with self._lock:
+            return sorted(self._subjects.get(subject, {}))
+
+    def get(self, subject: str, package_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._subjects.get(subject, {}).get(package_id)
+
+    def entries(self, subject: Optional[str] = None) -> List[Dict]:
+        """Return catalog entries, optionally restricted to one subject."""
+        with self._lock:
+            subjects = [subject] if subject else sorted(self._subjects)
+            return [
+                dict(entry, subject=s)
+                for s in subjects
+                for _, entry in sorted(self._subjects.get(s, {}).items())
+            ]
+
+
+_registry: Optional[PackageRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> PackageRegistry:
+    """Return the process-wide registry, building it on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = PackageRegistry()
+                registry.refresh(force=True)
+                _registry = registry
+    return _registry
+
+
+if __name__ == "__main__":
+    registry = PackageRegistry()
+    registry.refresh(force=True)
+    for item in registry.entries():
+        print(f"{item['subject']}/{item['package_id']}: "
+              f"{item['mcq_count']} MCQs, {item['essay_count']} essays")
@@ -0,0 +1,301 @@
+"""
+Full-text search over the whole question bank (SQLite FTS5).
+
+Every MCQ (question, option texts, learning objective) and essay (prompt,
+expected keywords, rubric keywords) under database/ is one document in a
+persistent FTS5 index, database/search.sqlite3. A side table keeps the
+subject/package/difficulty/level columns the filters need, indexed so a
+package can be replaced in place.
+
+The index is updated incrementally: `index_package` after a package is
+written (save_json), and `sync` against the registry, which re-indexes only
+packages whose SHA-256 changed and drops packages that disappeared.
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from evaluation.essay_grader import rubric_keywords
+from evaluation.mcq_evaluator import package_essays
+from storage.loader import load_json
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+DB_DIR = BASE_DIR / "database"
+INDEX_FILE = DB_DIR / "search.sqlite3"
+
+# bm25 column weights: text, options, keywords, objective.
+COLUMN_WEIGHTS = (10.0, 2.0, 5.0, 3.0)
+
+# Every match is ranked by default. Ranking a very common term is O(matches);
+# callers that need a latency bound at hundreds of thousands of items can pass
+# max_candidates to rank only the newest matches (results then depend on
+# indexing order).
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    rowid       INTEGER PRIMARY KEY,
+    subject     TEXT NOT NULL,
+    package_id  TEXT NOT NULL,
+    item_id     TEXT NOT NULL,
+    kind        TEXT NOT NULL,
+    difficulty  TEXT,
+    level       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_items_package ON items (subject, package_id);
+CREATE TABLE IF NOT EXISTS packages (
+    subject     TEXT NOT NULL,
+    package_id  TEXT NOT NULL,
+    sha256      TEXT NOT NULL,
+    indexed_at  TEXT NOT NULL,
+    PRIMARY KEY (subject, package_id)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+    text, options, keywords, objective,
+    tokenize = 'porter unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _facet(value) -> Optional[str]:
+    """Filter values are case-folded so 'Easy' and 'easy' land in one bucket."""
+    if value is None:
+        return None
+    return str(value).strip().lower() or None
+
+
+def package_documents(package: Dict) -> List[Dict]:
+    """Searchable documents for one package (one per MCQ and per essay)."""
+    docs = []
+    level = _facet(package.get("level"))
+    for q in package.get("mcqs", []) or []:
+        if not isinstance(q, dict) or "id" not in q:
+            continue
+        options = q.get("options", {})
+        docs.append({
+            "item_id": q["id"],
+            "kind": "mcq",
+            "difficulty": _facet(q.get("difficulty")),
+            "level": level,
+            "text": q.get("question", ""),
+            "options": " \n".join(str(v) for v in options.values()) if isinstance(options, dict) else "",
+            "keywords": "",
+            "objective": q.get("learning_objective", "") or "",
+        })
+    for essay in package_essays(package):
+        if not isinstance(essay, dict) or "id" not in essay:
+            continue
+        keywords = list(essay.get("expected_keywords", []) or []) + rubric_keywords(essay)
+        docs.append({
+            "item_id": essay["id"],
+            "kind": "essay",
+            "difficulty": _facet(essay.get("difficulty")),
+            "level": level,
+            "text": essay.get("prompt", ""),
+            "options": "",
+            "keywords": " \n".join(str(k) for k in dict.fromkeys(keywords)),
+            "objective": essay.get("learning_objective", "") or "",
+        })
+    return docs
+
+
+def build_match(query: str) -> Optional[str]:
+    """Turn free text into a safe FTS5 query: all terms required, last one as a prefix."""
+    tokens = _TOKEN_RE.findall(query)
+    if not tokens:
+        return None
+    terms = [f'"{t}"' for t in tokens]
+    if len(tokens[-1]) >= 2:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def highlight(text: str, tokens: List[str], width: int = 200) -> str:
+    """Bold words starting with a query token and crop around the first hit."""
+    if not tokens:
+        return text[:width]
+    pattern = re.compile(r"\b(" + "|".join(re.escape(t) for t in tokens) + r")\w*", re.IGNORECASE)
+    first = pattern.search(text)
+    start = max(0, first.start() - width // 4) if first else 0
+    excerpt = text[start:start + width]
+    excerpt = pattern.sub(lambda m: f"**{m.group(0)}**", excerpt)
+    return ("…" if start else "") + excerpt + ("…" if start + width < len(text) else "")
+
+
+class SearchIndex:
+    """Persistent FTS5 index of every question in database/."""
+
+    def __init__(self, path: Path = INDEX_FILE, db_dir: Path = DB_DIR):
+        self.path = Path(path)
+        self.db_dir = Path(db_dir)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------- writes ----------
+    def _replace(self, conn: sqlite3.Connection, subject: str, package_id: str,
+                 package: Optional[Dict], sha256: Optional[str]):
+        rowids = [r[0] for r in conn.execute(
+            "SELECT rowid FROM items WHERE subject = ? AND package_id = ?", (subject, package_id)
+        )]
+        if rowids:
+            conn.executemany("DELETE FROM items_fts WHERE rowid = ?", [(r,) for r in rowids])
+            conn.execute("DELETE FROM items WHERE subject = ? AND package_id = ?", (subject, package_id))
+        if package is None:
+            conn.execute("DELETE FROM packages WHERE subject = ? AND package_id = ?", (subject, package_id))
+            return
+
+        for doc in package_documents(package):
+            cur = conn.execute(
+                "INSERT INTO items (subject, package_id, item_id, kind, difficulty, level) VALUES (?, ?, ?, ?, ?, ?)",
+                (subject, package_id, doc["item_id"], doc["kind"], doc["difficulty"], doc["level"]),
+            )
+            conn.execute(
+                "INSERT INTO items_fts (rowid, text, options, keywords, objective) VALUES (?, ?, ?, ?, ?)",
+                (cur.lastrowid, doc["text"], doc["options"], doc["keywords"], doc["objective"]),
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO packages (subject, package_id, sha256, indexed_at) VALUES (?, ?, ?, ?)",
+            (subject, package_id, sha256 or "", datetime.now().isoformat()),
+        )
+
+    def _read_package(self, relpath: str) -> Optional[Dict]:
+        try:
+            package = load_json(self.db_dir / relpath)
+        except (OSError, ValueError):
+            return None
+        return package if isinstance(package, dict) else None
+
+    def index_package(self, subject: str, package_id: str, sha256: Optional[str] = None):
+        """(Re-)index one package right after it was written; removes it if the file is gone."""
+        relpath = f"{subject}/{package_id}/package.json"
+        package = self._read_package(relpath)
+        if package is not None and sha256 is None:
+            sha256 = hashlib.sha256((self.db_dir / relpath).read_bytes()).hexdigest()
+        conn = self._connect()
+        with self._write_lock, conn:
+            self._replace(conn, subject, package_id, package, sha256)
+
+    def sync(self, entries: Iterable[Dict]) -> int:
+        """Bring the index in line with registry entries; returns packages re-indexed or dropped."""
+        conn = self._connect()
+        indexed = {
+            (r["subject"], r["package_id"]): r["sha256"]
+            for r in conn.execute("SELECT subject, package_id, sha256 FROM packages")
+        }
+        wanted = {(e["subject"], e["package_id"]): e for e in entries}
+        stale = [key for key, entry in wanted.items() if indexed.get(key) != entry["sha256"]]
+        gone = [key for key in indexed if key not in wanted]
+        if not stale and not gone:
+            return 0
+
+        with self._write_lock, conn:
+            for subject, package_id in stale:
+                entry = wanted[(subject, package_id)]
+                package = self._read_package(entry["path"])
+                self._replace(conn, subject, package_id, package or {}, entry["sha256"])
+            for subject, package_id in gone:
+                self._replace(conn, subject, package_id, None, None)
+        return len(stale) + len(gone)
+
+    # ---------- queries ----------
+    def search(self, query: str, subjects: Optional[List[str]] = None, levels: Optional[List[str]] = None,
+               difficulties: Optional[List[str]] = None, kinds: Optional[List[str]] = None,
+               limit: int = 50, max_candidates: Optional[int] = None) -> List[Dict]:
+        """Best-ranked items (bm25) matching all query terms, with a highlighted snippet.
+
+        Ranking covers every match that passes the filters, or only the newest
+        `max_candidates` of them when given.
+        """
+        match = build_match(query)
+        if match is None:
+            return []
+
+        clauses, params = ["items_fts MATCH ?"], [match]
+        for column, values in (("subject", subjects), ("level", levels),
+                               ("difficulty", difficulties), ("kind", kinds)):
+            if values:
+                clauses.append(f"i.{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        weights = ", ".join(str(w) for w in COLUMN_WEIGHTS)
+        candidates = (
+            f"SELECT i.rowid, i.subject, i.package_id, i.item_id, i.kind, i.difficulty, i.level, "
+            f"bm25(items_fts, {weights}) AS score "
+            f"FROM items_fts JOIN items i ON i.rowid = items_fts.rowid "
+            f"WHERE {' AND '.join(clauses)}"
+        )
+        if max_candidates is not None:
+            candidates += " ORDER BY items_fts.rowid DESC LIMIT ?"
+            params.append(int(max_candidates))
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT * FROM ({candidates}) ORDER BY score LIMIT ?", params + [int(limit)]
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return []
+        if not rows:
+            return []
+
+        # Texts only for the rows we return; rowid lookups skip the MATCH machinery.
+        rowids = [r["rowid"] for r in rows]
+        texts = dict(conn.execute(
+            f"SELECT rowid, text FROM items_fts WHERE rowid IN ({', '.join('?' * len(rowids))})", rowids
+        ).fetchall())
+        tokens = _TOKEN_RE.findall(query)
+        results = []
+        for r in rows:
+            text = texts.get(r["rowid"]) or ""
+            results.append(dict(
+                {k: r[k] for k in ("subject", "package_id", "item_id", "kind", "difficulty", "level")},
+                score=-r["score"], text=text, snippet=highlight(text, tokens),
+            ))
+        return results
+
+    def facets(self) -> Dict[str, List[str]]:
+        """Distinct values for the subject, level and difficulty filters."""
+        conn = self._connect()
+        return {
+            column: [r[0] for r in conn.execute(
+                f"SELECT DISTINCT {column} FROM items WHERE {column} IS NOT NULL AND {column} != '' ORDER BY 1"
+            )]
+            for column in ("subject", "level", "difficulty")
+        }
+
+    def count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+
+_index: Optional[SearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    """Return the process-wide search index."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SearchIndex()
+    return _index
@@ -0,0 +1,112 @@
+"""
+Cold-start report: import time of the app and of every page.
+
+Streamlit imports a page's modules on the first run of that page in a
+process, so on a fresh container the first user pays for all of them. Each
+entry point (app.py and pages/*.py) is parsed for its top-level imports,
+which are then imported in a fresh interpreter under `python -X importtime`,
+so the numbers are cold even when the report is produced by a warm server
+(the profiling page shows it next to the first-render times of this process).
+
+    python -m storage.startup                  # every entry point, slowest modules first
+    python -m storage.startup --max-ms 1500    # exit 1 if an entry point imports slower (CI)
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+ENTRY_POINTS = [BASE_DIR / "app.py"] + sorted((BASE_DIR / "pages").glob("*.py"))
+_MARKER = "-- qb startup --"
+
+
+def entry_imports(path: Path) -> List[str]:
+    """Modules imported at the top level of a script, in order (function-level imports are lazy)."""
+    tree = ast.parse(Path(path).read_text(encoding="utf-8"), filename=str(path))
+    modules: Dict[str, None] = {}
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.update(dict.fromkeys(alias.name for alias in node.names))
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules[node.module] = None
+    return list(modules)
+
+
+def measure_imports(modules: List[str], timeout: float = 120) -> Dict:
+    """Import `modules` in a fresh interpreter; total and per-module cumulative milliseconds.
+
+    Only imports made after interpreter startup count. A module shows up
+    under the first import that pulled it in, so `modules` lists what each
+    top-level import cost on top of the ones before it.
+    """
+    code = f"import sys; sys.stderr.write({_MARKER!r} + '\\n')\n" + "\n".join(f"import {m}" for m in modules)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(BASE_DIR), os.getenv("PYTHONPATH")])))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=BASE_DIR, env=env,
+                          capture_output=True, text=True, timeout=timeout)
+    _, _, trace = proc.stderr.partition(_MARKER + "\n")
+
+    top_level = []
+    for line in trace.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            micros = int(cumulative)
+        except ValueError:
+            continue  # the header line
+        if not name.startswith("  "):  # nested imports are indented below their importer
+            top_level.append({"module": name.strip(), "ms": micros / 1000})
+
+    error = None
+    if proc.returncode != 0:
+        error = (proc.stderr.strip().splitlines() or ["import failed"])[-1]
+    return {
+        "total_ms": sum(m["ms"] for m in top_level),
+        "modules": sorted(top_level, key=lambda m: m["ms"], reverse=True),
+        "error": error,
+    }
+
+
+def startup_report(entry_points: Optional[List[Path]] = None) -> List[Dict]:
+    """Cold import time of each entry point, slowest first."""
+    rows = []
+    for path in entry_points or ENTRY_POINTS:
+        result = measure_imports(entry_imports(path))
+        rows.append({"entry": Path(path).relative_to(BASE_DIR).as_posix(), **result})
+    return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Report cold import time of the app and its pages.")
+    parser.add_argument("entries", nargs="*", help="Scripts to check (default: app.py and pages/*.py).")
+    parser.add_argument("--top", type=int, default=5, help="Slowest modules to list per entry point.")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if an entry point imports slower.")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON.")
+    args = parser.parse_args(argv)
+
+    report = startup_report([Path(e).resolve() for e in args.entries] or None)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        for row in report:
+            print(f"{row['total_ms']:8.1f} ms  {row['entry']}" + (f"  (error: {row['error']})" if row["error"] else ""))
+            for module in row["modules"][:args.top]:
+                print(f"{module['ms']:17.1f} ms  {module['module']}")
+
+    failed = [row for row in report if row["error"] or (args.max_ms is not None and row["total_ms"] > args.max_ms)]
+    for row in failed:
+        reason = row["error"] or f"{row['total_ms']:.1f} ms > {args.max_ms} ms"
+        print(f"{row['entry']}: {reason}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,455 @@
+"""
+Indexed submission store (results/submissions.sqlite3).
+
+Submissions are appended to a SQLite table in WAL mode and indexed by
+(subject, package_id, timestamp) and by (user_id, timestamp), so the
+viewers can list and filter results with index lookups instead of scanning
+results/user_submissions/.
+Legacy per-submission JSON files are imported once with `import_legacy()`
+(or `python -m storage.submissions import`).
+
+The app does not insert on the request path: `get_writer().submit()` hands
+the submission to a background group-commit writer, which gathers whatever
+arrives within a short window (QB_GROUP_COMMIT_MS, default 20 ms) into one
+transaction. A class submitting at the same moment costs a handful of
+commits instead of one per student. Durability follows QB_FSYNC (see
+storage.atomic): none -> synchronous=OFF, file -> NORMAL, full -> FULL.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from storage.atomic import FSYNC_POLICY
+from storage.timing import span, timed
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+RESULTS_ROOT = BASE_DIR / "results"
+LEGACY_DIR = RESULTS_ROOT / "user_submissions"
+STORE_FILE = RESULTS_ROOT / "submissions.sqlite3"
+GROUP_COMMIT_WINDOW = float(os.getenv("QB_GROUP_COMMIT_MS", 20)) / 1000
+GROUP_COMMIT_MAX = 500
+_SYNCHRONOUS = {"none": "OFF", "file": "NORMAL", "full": "FULL"}[FSYNC_POLICY]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    seq           INTEGER PRIMARY KEY AUTOINCREMENT,
+    submission_id TEXT NOT NULL UNIQUE,
+    subject       TEXT NOT NULL,
+    package_id    TEXT NOT NULL,
+    timestamp     TEXT NOT NULL,
+    final_score   REAL,
+    source_file   TEXT UNIQUE,
+    payload       TEXT NOT NULL,
+    user_id       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_package
+    ON submissions (subject, package_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_submissions_timestamp
+    ON submissions (timestamp);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Added after the first release; older stores get the column on open.
+_USER_INDEX = "CREATE INDEX IF NOT EXISTS idx_submissions_user ON submissions (user_id, timestamp)"
+
+_SUMMARY_COLUMNS = "submission_id, subject, package_id, timestamp, final_score, source_file, user_id"
+_INSERT = (
+    "INSERT INTO submissions "
+    "(submission_id, subject, package_id, timestamp, final_score, source_file, payload, user_id) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+logger = logging.getLogger(__name__)
+
+
+class DuplicateSubmissionError(ValueError):
+    """Raised when a submission id (or legacy source file) is already stored."""
+
+
+def new_submission_id() -> str:
+    """Collision-free id: sortable timestamp prefix plus random suffix."""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:12]}"
+
+
+class SubmissionStore:
+    """Append-only submission log with a (subject, package_id, timestamp) index."""
+
+    def __init__(self, path: Path = STORE_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(submissions)")}
+            if "user_id" not in columns:
+                conn.execute("ALTER TABLE submissions ADD COLUMN user_id TEXT")
+            conn.execute(_USER_INDEX)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; Streamlit serves sessions from a thread pool.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={_SYNCHRONOUS}")
+            self._local.conn = conn
+        return conn
+
+    # ---------- writes ----------
+    @timed("submissions.append")
+    def append(self, result_data: Dict, submission_id: Optional[str] = None,
+               source_file: Optional[str] = None) -> str:
+        """Append one graded submission and return its id."""
+        return self.append_many([result_data], [submission_id], [source_file])[0]
+
+    def append_many(self, results: List[Dict], submission_ids: Optional[List] = None,
+                    source_files: Optional[List] = None) -> List[str]:
+        """Append several submissions in one transaction.
+
+        Raises DuplicateSubmissionError, writing nothing, if any of them is already stored.
+        """
+        submission_ids, rows = self._rows(results, submission_ids, source_files)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(_INSERT, rows)
+        except sqlite3.IntegrityError as exc:
+            raise DuplicateSubmissionError(f"submission already stored ({exc})") from None
+        return submission_ids
+
+    def append_new(self, results: List[Dict], submission_ids: Optional[List] = None,
+                   source_files: Optional[List] = None) -> List[Optional[str]]:
+        """Append the submissions not stored yet in one transaction; None in the slot of each duplicate."""
+        _, rows = self._rows(results, submission_ids, source_files)
+        return self.insert_new(rows)
+
+    def insert_new(self, rows: List[tuple]) -> List[Optional[str]]:
+        """Insert rows built by `row()` in one transaction; their ids, None in the slot of each duplicate."""
+        submission_ids: List[Optional[str]] = [row[0] for row in rows]
+        conn = self._connect()
+        with conn:
+            for i, row in enumerate(rows):
+                try:
+                    conn.execute(_INSERT, row)
+                except sqlite3.IntegrityError:  # only this statement is rolled back
+                    submission_ids[i] = None
+        return submission_ids
+
+    @staticmethod
+    def row(result: Dict, submission_id: Optional[str] = None, source_file: Optional[str] = None) -> tuple:
+        """Table row for a submission; raises KeyError/TypeError/ValueError if it cannot be stored."""
+        submission_id = submission_id or result.get("submission_id") or new_submission_id()
+        payload = dict(result, submission_id=submission_id)
+        for key in ("subject", "package_id"):
+            if not isinstance(payload[key], str) or not payload[key]:
+                raise ValueError(f"{key} must be a non-empty string")
+        return (
+            submission_id,
+            payload["subject"],
+            payload["package_id"],
+            payload.get("timestamp") or datetime.now().isoformat(),
+            payload.get("final_score"),
+            source_file,
+            json.dumps(payload, ensure_ascii=False),
+            payload.get("user_id") or None,
+        )
+
+    @classmethod
+    def _rows(cls, results: List[Dict], submission_ids: Optional[List],
+              source_files: Optional[List]) -> Tuple[List[str], List[tuple]]:
+        submission_ids = list(submission_ids or [None] * len(results))
+        source_files = list(source_files or [None] * len(results))
+        rows = [cls.row(result, submission_ids[i], source_files[i]) for i, result in enumerate(results)]
+        return [row[0] for row in rows], rows
+
+    def replace_many(self, payloads: List[Dict]) -> int:
+        """Rewrite stored submissions in place, keyed by `submission_id` (used by regrading)."""
+        rows = [
+            (payload.get("final_score"), json.dumps(payload, ensure_ascii=False), payload["submission_id"])
+            for payload in payloads
+        ]
+        conn = self._connect()
+        with conn:
+            cursor = conn.executemany(
+                "UPDATE submissions SET final_score = ?, payload = ? WHERE submission_id = ?", rows
+            )
+        return cursor.rowcount
+
+    # ---------- reads ----------
+    def get(self, submission_id: str) -> Optional[Dict]:
+        row = self._connect().execute(
+            "SELECT payload FROM submissions WHERE submission_id = ?", (submission_id,)
+        ).fetchone()
+        return json.loads(row["payload"]) if row else None
+
+    def subjects(self) -> List[str]:
+        rows = self._connect().execute("SELECT DISTINCT subject FROM submissions ORDER BY subject")
+        return [r["subject"] for r in rows]
+
+    def packages(self, subject: str) -> List[str]:
+        rows = self._connect().execute(
+            "SELECT DISTINCT package_id FROM submissions WHERE subject = ? ORDER BY package_id",
+            (subject,),
+        )
+        return [r["package_id"] for r in rows]
+
+    def query(self, subject: Optional[str] = None, package_id: Optional[str] = None,
+              since: Optional[str] = None, until: Optional[str] = None,
+              limit: Optional[int] = None, newest_first: bool = True,
+              user_id: Optional[str] = None) -> List[Dict]:
+        """Submission summaries filtered by subject/package/user and an ISO time range."""
+        clauses, params = [], []
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if subject is not None:
+            clauses.append("subject = ?")
+            params.append(subject)
+        if package_id is not None:
+            clauses.append("package_id = ?")
+            params.append(package_id)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        sql = f"SELECT {_SUMMARY_COLUMNS} FROM submissions"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY timestamp " + ("DESC" if newest_first else "ASC")
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return [dict(r) for r in self._connect().execute(sql, params)]
+
+    def iter_payloads(self, subject: Optional[str] = None,
+                      package_id: Optional[str] = None) -> Iterator[Dict]:
+        """Stream full submissions in insertion order."""
+        clauses, params = [], []
+        if subject is not None:
+            clauses.append("subject = ?")
+            params.append(subject)
+        if package_id is not None:
+            clauses.append("package_id = ?")
+            params.append(package_id)
+        sql = "SELECT payload FROM submissions"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY seq"
+        for row in self._connect().execute(sql, params):
+            yield json.loads(row["payload"])
+
+    def iter_since(self, after_seq: int = 0) -> Iterator[Tuple[int, Dict]]:
+        """Stream (seq, submission) pairs appended after `after_seq`."""
+        rows = self._connect().execute(
+            "SELECT seq, payload FROM submissions WHERE seq > ? ORDER BY seq", (after_seq,)
+        )
+        for row in rows:
+            yield row["seq"], json.loads(row["payload"])
+
+    def count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+
+    # ---------- migration ----------
+    def import_legacy(self, legacy_dir: Path = LEGACY_DIR) -> int:
+        """Import results/user_submissions/*.json once; re-running is a no-op."""
+        legacy_dir = Path(legacy_dir)
+        if not legacy_dir.exists():
+            return 0
+        conn = self._connect()
+        marker = str(legacy_dir.stat().st_mtime_ns)
+        row = conn.execute("SELECT value FROM meta WHERE key = 'legacy_import'").fetchone()
+        if row and row["value"] == marker:
+            return 0
+
+        known = {r[0] for r in conn.execute("SELECT source_file FROM submissions WHERE source_file IS NOT NULL")}
+        results, ids, sources = [], [], []
+        for name in sorted(os.listdir(legacy_dir)):
+            if not name.endswith(".json") or name in known:
+                continue
+            try:
+                with open(legacy_dir / name, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not isinstance(data, dict) or "subject" not in data or "package_id" not in data:
+                continue
+            results.append(data)
+            ids.append(data.get("submission_id") or Path(name).stem)
+            sources.append(name)
+
+        imported = 0
+        if results:
+            imported = sum(1 for i in self.append_new(results, ids, sources) if i is not None)
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_import', ?)", (marker,))
+        return imported
+
+
+class GroupCommitWriter:
+    """Background thread that inserts queued submissions in batched transactions.
+
+    `submit` assigns the submission id immediately and returns a Future that
+    resolves to it once the batch containing it is committed, or fails with
+    DuplicateSubmissionError if that id is already stored. A submission that
+    cannot be stored at all (no subject/package_id, not JSON-serializable)
+    fails its own future at once and never reaches a batch. Hooks added with
+    `add_commit_hook` run on the writer thread once per committed batch; a
+    hook that raises is logged and counted in `hook_errors`.
+    """
+
+    def __init__(self, store: SubmissionStore, window: float = GROUP_COMMIT_WINDOW,
+                 max_batch: int = GROUP_COMMIT_MAX):
+        self.store = store
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.committed = 0
+        self.hook_errors = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._hooks: List[Callable[[], None]] = []
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="submission-writer", daemon=True)
+        self._thread.start()
+
+    def add_commit_hook(self, hook: Callable[[], None]):
+        if hook not in self._hooks:
+            self._hooks.append(hook)
+
+    def submit(self, result_data: Dict) -> Future:
+        if self._closed:
+            raise RuntimeError("submission writer is closed")
+        future: Future = Future()
+        try:
+            row = self.store.row(result_data)
+        except (KeyError, TypeError, ValueError) as exc:
+            future.set_exception(ValueError(f"submission cannot be stored: {exc!r}"))
+            return future
+        self._queue.put((row, future))
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything submitted so far is committed; False on timeout."""
+        marker: Future = Future()
+        self._queue.put((None, marker))
+        try:
+            marker.result(timeout)
+        except TimeoutError:
+            return False
+        return True
+
+    def close(self, timeout: Optional[float] = 10):
+        """Commit what is queued and stop the thread."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _collect(self) -> Optional[List[Tuple[Optional[tuple], Future]]]:
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # stop after this batch
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            rows = [row for row, _ in batch if row is not None]
+            stored: List[Optional[str]] = []
+            error = None
+            try:
+                if rows:
+                    with span("submissions.group_commit"):
+                        stored = self.store.insert_new(rows)
+            except Exception as exc:  # e.g. the database is locked or the disk is full
+                error = exc
+            inserted = sum(1 for submission_id in stored if submission_id is not None)
+            self.batches += 1 if inserted else 0
+            self.committed += inserted
+            stored_ids = iter(stored)
+            for row, future in batch:
+                if row is None:
+                    future.set_result(None)  # flush marker: everything before it is settled
+                elif error is not None:
+                    future.set_exception(error)
+                elif next(stored_ids) is None:
+                    future.set_exception(DuplicateSubmissionError(f"submission {row[0]} is already stored"))
+                else:
+                    future.set_result(row[0])
+            if inserted:
+                for hook in self._hooks:
+                    try:
+                        hook()
+                    except Exception:  # a failing hook must not stop the writer
+                        self.hook_errors += 1
+                        logger.exception("Submission commit hook %s failed", getattr(hook, "__name__", hook))
+
+
+_store: Optional[SubmissionStore] = None
+_writer: Optional[GroupCommitWriter] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> SubmissionStore:
+    """Return the process-wide store, importing legacy files on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = SubmissionStore()
+                store.import_legacy()
+                _store = store
+    return _store
+
+
+def get_writer() -> GroupCommitWriter:
+    """Return the process-wide group-commit writer for the shared store."""
+    global _writer
+    if _writer is None:
+        store = get_store()
+        with _store_lock:
+            if _writer is None:
+                _writer = GroupCommitWriter(store)
+                atexit.register(_writer.close)
+    return _writer
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "import":
+        imported = SubmissionStore().import_legacy()
+        print(f"Imported {imported} legacy submission files into {STORE_FILE}")
+    else:
+        print("Usage: python -m storage.submissions import")
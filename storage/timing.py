@@ -0,0 +1,252 @@
+"""
+Lightweight timing hooks for the app's hot paths.
+
+`@timed("stage")` and `with span("stage"):` record wall-clock durations into
+an in-process ring buffer (the last QB_TIMING_CAPACITY samples), optionally
+appending each sample to a JSONL trace file as well. `start_rerun(page)` /
+`.finish()` bracket one Streamlit script run, so the profiling page can list
+the slowest reruns together with the stages they spent their time in. The
+first finished run of each page is always noted (timing on or off) with the
+time since the process started, for the startup report.
+
+Timing is off unless QB_TIMING=1 (or it is switched on from the profiling
+page). When off, a hook costs one attribute check per call and records
+nothing, so it can stay in production code.
+
+    QB_TIMING=1 QB_TIMING_TRACE=results/timing.jsonl streamlit run app.py
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_CAPACITY = int(os.getenv("QB_TIMING_CAPACITY", 20_000))
+# Where the profiling page's trace toggle writes; only the environment can choose another file.
+TRACE_FILE = Path(os.getenv("QB_TIMING_TRACE") or BASE_DIR / ".cache" / "timing.jsonl")
+RERUN_PREFIX = "rerun:"
+
+logger = logging.getLogger(__name__)
+
+
+def _process_started() -> float:
+    """Wall-clock start of this process (Linux /proc), else the time this module was imported."""
+    try:
+        with open("/proc/self/stat", "rb") as f:
+            ticks = int(f.read().rsplit(b")", 1)[1].split()[19])
+        with open("/proc/uptime", "rb") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - (uptime - ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+PROCESS_STARTED = _process_started()
+
+
+class TimingRecorder:
+    """Ring buffer of (timestamp, stage, seconds, rerun id) samples."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, enabled: bool = False,
+                 trace_path: Optional[str] = None):
+        self.samples: deque = deque(maxlen=capacity)
+        self.enabled = enabled
+        self._local = threading.local()
+        self._trace_lock = threading.Lock()
+        self._trace = None
+        self.trace_path: Optional[Path] = None
+        self.set_trace(trace_path)
+
+    # ---------- configuration ----------
+    def set_trace(self, path: Optional[str]):
+        """Start (or stop, with None) appending samples to a JSONL file.
+
+        Raises OSError if the file cannot be opened; tracing is off afterwards.
+        """
+        with self._trace_lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
+            self.trace_path = None
+            if path:
+                trace_path = Path(path)
+                trace_path.parent.mkdir(parents=True, exist_ok=True)
+                self._trace = open(trace_path, "a", encoding="utf-8", buffering=1)
+                self.trace_path = trace_path
+
+    def clear(self):
+        self.samples.clear()
+
+    # ---------- recording ----------
+    @property
+    def current_rerun(self) -> Optional[str]:
+        return getattr(self._local, "rerun", None)
+
+    def record(self, stage: str, seconds: float, rerun: Optional[str] = None):
+        sample = (time.time(), stage, seconds, rerun if rerun is not None else self.current_rerun)
+        self.samples.append(sample)
+        if self._trace is not None:
+            line = json.dumps({"ts": sample[0], "stage": stage, "ms": seconds * 1000, "rerun": sample[3]})
+            with self._trace_lock:
+                if self._trace is not None:
+                    self._trace.write(line + "\n")
+
+    # ---------- summaries ----------
+    def summary(self) -> List[Dict]:
+        """Per-stage count, p50/p95/p99, max and total, in milliseconds (slowest p95 first)."""
+        import numpy as np  # only the profiling page summarizes; keep it off the import path
+
+        by_stage: Dict[str, List[float]] = {}
+        for _, stage, seconds, _ in list(self.samples):
+            by_stage.setdefault(stage, []).append(seconds)
+        rows = []
+        for stage, values in by_stage.items():
+            ms = np.asarray(values) * 1000
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            rows.append({"stage": stage, "count": len(ms), "p50_ms": float(p50), "p95_ms": float(p95),
+                         "p99_ms": float(p99), "max_ms": float(ms.max()), "total_ms": float(ms.sum())})
+        return sorted(rows, key=lambda row: row["p95_ms"], reverse=True)
+
+    def slowest_reruns(self, limit: int = 10) -> List[Dict]:
+        """The slowest recorded reruns with the time spent per stage inside each."""
+        samples = list(self.samples)
+        reruns = sorted(
+            (s for s in samples if s[1].startswith(RERUN_PREFIX)), key=lambda s: s[2], reverse=True
+        )[:limit]
+        wanted = {s[3] for s in reruns}
+        stages: Dict[str, Dict[str, float]] = {rerun_id: {} for rerun_id in wanted}
+        for _, stage, seconds, rerun_id in samples:
+            if rerun_id in wanted and not stage.startswith(RERUN_PREFIX):
+                stages[rerun_id][stage] = stages[rerun_id].get(stage, 0.0) + seconds * 1000
+        return [
+            {"page": stage[len(RERUN_PREFIX):], "started_at": ts - seconds, "ms": seconds * 1000,
+             "stages": dict(sorted(stages[rerun_id].items(), key=lambda kv: kv[1], reverse=True))}
+            for ts, stage, seconds, rerun_id in reruns
+        ]
+
+
+_recorder = TimingRecorder(enabled=os.getenv("QB_TIMING", "").lower() in ("1", "true", "yes", "on"))
+if os.getenv("QB_TIMING_TRACE"):
+    try:
+        _recorder.set_trace(TRACE_FILE)
+    except OSError as exc:
+        logger.warning("QB_TIMING_TRACE: cannot open %s: %s", TRACE_FILE, exc)
+
+
+def get_recorder() -> TimingRecorder:
+    """Return the process-wide timing recorder."""
+    return _recorder
+
+
+def enable(on: bool = True):
+    _recorder.enabled = on
+
+
+def trace(on: bool = True):
+    """Switch appending samples to TRACE_FILE on or off (raises OSError if it cannot be opened)."""
+    _recorder.set_trace(TRACE_FILE if on else None)
+
+
+# -------------------------------
+# HOOKS
+# -------------------------------
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _recorder.record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def finish(self):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage: str):
+    """Context manager timing a block (a shared no-op when timing is off)."""
+    return _Span(stage) if _recorder.enabled else _NO_SPAN
+
+
+def timed(stage: str):
+    """Decorator timing every call of a function."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _recorder.enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _recorder.record(stage, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+_first_renders: Dict[str, Dict] = {}
+
+
+class _Rerun:
+    __slots__ = ("page", "rerun_id", "start")
+
+    def __init__(self, page: str):
+        self.page = page
+        self.rerun_id = uuid.uuid4().hex[:12]
+        self.start = time.perf_counter()
+        _recorder._local.rerun = self.rerun_id
+
+    def finish(self):
+        seconds = time.perf_counter() - self.start
+        if _recorder.enabled:
+            _recorder.record(RERUN_PREFIX + self.page, seconds, self.rerun_id)
+        _recorder._local.rerun = None
+        if self.page not in _first_renders:
+            _first_renders[self.page] = {
+                "page": self.page,
+                "since_process_start_ms": (time.time() - PROCESS_STARTED) * 1000,
+                "rerun_ms": seconds * 1000,
+            }
+
+
+def start_rerun(page: str):
+    """Mark the start of a script run; call `.finish()` at the end of the page.
+
+    Runs that end early through st.stop() are not recorded as reruns (their
+    stages still are).
+    """
+    if _recorder.enabled or page not in _first_renders:
+        return _Rerun(page)
+    return _NO_SPAN
+
+
+def first_renders() -> List[Dict]:
+    """The first completed run of each page in this process, in the order they happened."""
+    return list(_first_renders.values())
@@ -0,0 +1,61 @@
+"""Attempt history must keep questions that share an id in different packages apart."""
+from evaluation import attempts
+from evaluation.attempts import AttemptIndex, build_review_test
+from storage.submissions import SubmissionStore
+
+# `pkg25_mcq1` names a different question in each of these packages (both keyed "A").
+VISION = ("machine_vision", "package_25")
+MINING = ("towards_data_mining", "package_9")
+QID = "pkg25_mcq1"
+
+
+def _submission(subject, package_id, answers, timestamp):
+    return {"user_id": "u1", "subject": subject, "package_id": package_id,
+            "timestamp": timestamp, "user_answers": answers}
+
+
+def _store(tmp_path, *submissions):
+    store = SubmissionStore(tmp_path / "submissions.sqlite3")
+    store.append_many(list(submissions))
+    return store
+
+
+def test_colliding_ids_are_counted_per_package(tmp_path):
+    store = _store(
+        tmp_path,
+        _submission(*VISION, {QID: "A"}, "2025-01-01T10:00:00"),
+        _submission(*MINING, {}, "2025-01-01T11:00:00"),
+    )
+    index = AttemptIndex(tmp_path / "attempts.sqlite3")
+    index.update(store)
+
+    vision = index.question("u1", *VISION, QID)
+    mining = index.question("u1", *MINING, QID)
+    assert (vision["attempts"], vision["correct"], vision["last_correct"]) == (1, 1, 1)
+    assert (mining["attempts"], mining["correct"], mining["last_correct"]) == (1, 0, 0)
+    assert {(r["subject"], r["package_id"]) for r in index.mistakes("u1") if r["question_id"] == QID} == {MINING}
+
+
+def test_review_test_namespaces_ids_across_subjects(tmp_path, monkeypatch):
+    store = _store(
+        tmp_path,
+        _submission(*VISION, {QID: "B"}, "2025-01-01T10:00:00"),
+        _submission(*MINING, {QID: "C"}, "2025-01-01T11:00:00"),
+    )
+    monkeypatch.setattr(attempts, "_index", AttemptIndex(tmp_path / "attempts.sqlite3"))
+    monkeypatch.setattr(attempts, "get_store", lambda: store)
+
+    review = build_review_test("u1", n_questions=100)
+    ids = [q["id"] for q in review["mcqs"]]
+    assert len(ids) == len(set(ids))
+    assert {"machine_vision/package_25/" + QID, "towards_data_mining/package_9/" + QID} <= set(ids)
+
+    # Answering both in the review folds each answer back into its own package.
+    review_package = {q["id"]: q for q in review["mcqs"]}
+    monkeypatch.setattr(attempts, "load_package", lambda subject, package_id: review)
+    answers = {qid: q["correct_option"] for qid, q in review_package.items() if q["source_id"] == QID}
+    store.append(_submission(attempts.ALL_SUBJECTS, review["package_id"], answers, "2025-01-02T10:00:00"))
+    attempts._index.update(store)
+    for subject, package_id in (VISION, MINING):
+        row = attempts._index.question("u1", subject, package_id, QID)
+        assert (row["attempts"], row["correct"], row["last_correct"]) == (2, 1, 1)
@@ -0,0 +1,43 @@
+"""A regrade for a changed answer key must refresh item statistics and the attempt index."""
+import copy
+from functools import partial
+
+from evaluation import attempts, item_analysis, regrade
+from evaluation.attempts import AttemptIndex
+from storage.submissions import SubmissionStore
+
+PACKAGE = {
+    "package_id": "pkg",
+    "mcqs": [
+        {"id": "q1", "question": "One?", "options": {"A": "a", "B": "b"}, "correct_option": "A"},
+        {"id": "q2", "question": "Two?", "options": {"A": "a", "B": "b"}, "correct_option": "A"},
+    ],
+    "essay": [],
+}
+
+
+def test_regrade_refreshes_stats_and_attempts(tmp_path, monkeypatch):
+    package = copy.deepcopy(PACKAGE)
+    for module in (regrade, item_analysis, attempts):
+        monkeypatch.setattr(module, "load_package", lambda subject, package_id: package)
+    stats_file = tmp_path / "question_performance.json"
+    index = AttemptIndex(tmp_path / "attempts.sqlite3")
+    monkeypatch.setattr(regrade, "update_stats", partial(item_analysis.update_stats, path=stats_file))
+    monkeypatch.setattr(regrade, "get_attempt_index", lambda: index)
+
+    store = SubmissionStore(tmp_path / "submissions.sqlite3")
+    store.append({"user_id": "u1", "subject": "s", "package_id": "pkg", "timestamp": "2025-01-01T10:00:00",
+                  "mcq_score": 1, "mcq_total": 2, "essay_score": 0, "essay_total": 0, "final_score": 25.0,
+                  "user_answers": {"q1": "A", "q2": "B"}})
+    item_analysis.update_stats(store, stats_file)
+    index.update(store)
+
+    # Both questions now expect B: the total stays 1/2 but per-question outcomes flip.
+    package["mcqs"][0]["correct_option"] = "B"
+    package["mcqs"][1]["correct_option"] = "B"
+    report = regrade.regrade(store, workers=1)
+    assert report["changed"] == 0
+
+    rows = {r["question_id"]: r for r in item_analysis.mcq_item_rows(item_analysis.load_stats(stats_file))}
+    assert (rows["q1"]["p_value"], rows["q2"]["p_value"]) == (0.0, 1.0)
+    assert [m["question_id"] for m in index.mistakes("u1")] == ["q1"]
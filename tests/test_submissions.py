@@ -0,0 +1,26 @@
+"""One bad submission must not fail the other submissions of its group commit."""
+import pytest
+
+from storage.submissions import DuplicateSubmissionError, GroupCommitWriter, SubmissionStore
+
+
+def test_bad_submission_fails_only_its_own_future(tmp_path):
+    store = SubmissionStore(tmp_path / "submissions.sqlite3")
+    store.append({"subject": "s", "package_id": "p"}, "taken")
+    writer = GroupCommitWriter(store, window=0.2)
+    try:
+        good = writer.submit({"subject": "s", "package_id": "p"})
+        missing = writer.submit({"package_id": "p"})
+        unserializable = writer.submit({"subject": "s", "package_id": "p", "answers": {1, 2}})
+        duplicate = writer.submit({"subject": "s", "package_id": "p", "submission_id": "taken"})
+        assert writer.flush(5)
+
+        assert store.get(good.result(5)) is not None
+        for future in (missing, unserializable):
+            with pytest.raises(ValueError):
+                future.result(5)
+        with pytest.raises(DuplicateSubmissionError):
+            duplicate.result(5)
+        assert store.count() == 2
+    finally:
+        writer.close()